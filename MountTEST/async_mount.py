@@ -0,0 +1,421 @@
+"""
+asyncio client for the 10Micron TCP protocol.
+
+:class:`AsyncMount` shares one connection to the mount between any number of
+coroutines. The commands are written immediately and the answers are
+assigned in the order of the mount by a single reader task, so concurrent
+awaiters don't need a thread per operation. The state of the mount is
+updated by an async poll task instead of the poll thread of
+:class:`MountTEST.core.mountcom.MountCom`.
+
+Example::
+
+    mount = AsyncMount()
+    await mount.connect()
+    mount.start_polling()
+    ra = await mount.get_sidereal_time()
+    await mount.slew_ra_dec(12, 30, 0., 45, 0, 0.)
+"""
+import asyncio
+from MountTEST.core.mountcom import MountCom
+from MountTEST.coordinates import join_sexagesimal, format_sexagesimal
+from MountTEST.core.tracing import Tracer, COM, DEBUG, ERROR
+from MountTEST.core.protocol import reply_kinds, encode_command, CHAR_REPLY, FRAME_REPLY, SLEW_REPLY, DATE_REPLY, \
+    TERMINATOR
+
+# get-methods which only send a fixed command to the mount
+QUERY_COMMANDS = (
+    ('get_current_slew_rate', ':GMs#'),
+    ('get_min_slew_rate', ':GMsa#'),
+    ('get_max_slew_rate', ':GMsb#'),
+    ('get_current_guide_rate', ':Ggui#'),
+    ('get_telescope_altitude', ':U2#:GA#'),
+    ('get_target_altitude', ':U2#:Ga#'),
+    ('get_date', ':U2#:GC#'),
+    ('get_elevation', ':Gev#'),
+    ('get_utc_offset', ':U2#:GG#'),
+    ('get_longitude', ':U2#:Gg#'),
+    ('get_high_alt_limit', ':U2#:Gh#'),
+    ('get_connection_type', ':GINQ#'),
+    ('get_ip', ':GIP#'),
+    ('get_jd', ':GJD#'),
+    ('get_jd1', ':GJD1#'),
+    ('get_jd2', ':GJD2#'),
+    ('get_local_time', ':U2#:GL#'),
+    ('get_local_time_date', ':U2#:GLDT#'),
+    ('get_utc_time_date', ':U2#:GUDT#'),
+    ('get_leap_sec_date', ':GULEAP#'),
+    ('get_meridian_side', ':GMF#'),
+    ('get_low_alt_limit', ':U2#:Go#'),
+    ('get_guiding_status', ':Gpgc#'),
+    ('get_pressure_in_model', ':GRPRS#'),
+    ('get_temp_in_model', ':GRTMP#'),
+    ('get_sidereal_time', ':U2#:GS#'),
+    ('get_refraction_status', ':GREF#'),
+    ('get_speed_correction_flag', ':GSC#'),
+    ('get_slew_settle_time', ':Gstm#'),
+    ('get_dome_settle_time', ':GDstm#'),
+    ('get_meridian_tracking_limit', ':Glmt#'),
+    ('get_meridian_slew_limit', ':Glms#'),
+    ('get_flip_setting', ':Guaf#'),
+    ('get_tracking_rate', ':GT#'),
+    ('get_latitude', ':Gt#'),
+    ('get_obj_tracking_status', ':GTTRK#'),
+    ('get_destination_side', ':GTsid#'),
+    ('get_firmware_date', ':GVD#'),
+    ('get_firmware_num', ':GVN#'),
+    ('get_product_name', ':GVP#'),
+    ('get_firmware_time', ':GVT#'),
+    ('get_control_box_version', ':GVZ#'),
+    ('get_telescope_azimuth', ':U2#:GZ#'),
+    ('get_target_azimuth', ':U2#:Gz#'),
+    ('get_pier_side', ':pS#'),
+    ('get_log_file', ':getlog#'),
+    ('get_event_log_file', ':evlog#'),
+    ('get_id', ':GETID#'),
+)
+
+# set-methods, the arguments of the method are formatted into the command
+SET_COMMANDS = (
+    ('set_alt', ':Sa{:+03d}*{:02d}:{:04.1f}#'),
+    ('set_az', ':Sz{:03d}*{:02d}:{:04.1f}#'),
+    ('set_ra', ':Sr{:02d}:{:02d}:{:05.2f}#'),
+    ('set_date', ':SC{:04d}-{:02d}-{:02d}#'),
+    ('set_elev', ':Sev{:+07.1f}#'),
+    ('set_long', ':Sg{:+04d}*{:02d}:{:04.1f}#'),
+    ('set_local_offset', ':SG{:+4.1f}#'),
+    ('set_high_alt_limit', ':Sh{:+03d}#'),
+    ('set_jd', ':SJD{}#'),
+    ('set_local_time', ':SL{:02d}:{:02d}:{:05.2f}#'),
+    ('set_local_date_time', ':SLDT{:04d}-{:02d}-{:02d},{:02d}:{:02d}:{:05.2f}#'),
+    ('set_utc_date_time', ':SUDT{:04d}-{:02d}-{:02d},{:02d}:{:02d}:{:05.2f}#'),
+    ('set_meridian_side', ':SMF{}#'),
+    ('set_low_alt_limit', ':So{:+03d}#'),
+    ('set_refraction', ':SREF{}#'),
+    ('set_pressure_in_model', ':SRPRS{:06.1f}#'),
+    ('set_temp_in_model', ':SRTMP{:+06.1f}#'),
+    ('set_speed_corr_flag', ':SSC{}#'),
+    ('set_meridian_track_limit', ':Slmt{}#'),
+    ('set_meridian_slew_limit', ':Slms{}#'),
+    ('set_unattended_flip', ':Suaf{}#'),
+    ('set_lat', ':St{:+03d}*{:02d}:{:04.1f}#'),
+    ('set_max_slew_rate', ':Sw{}#'),
+    ('set_lan_config', ':SIP{}#'),
+)
+
+
+class AsyncMount:
+    """
+    asyncio version of :class:`MountTEST.mount.Mount` for the direct TCP/IP
+    communication with the mount.
+
+    :param address: Address and port of the mount
+    :type address: tuple
+    :param timeout: Maximal time in seconds to wait for an answer of the mount
+    :type timeout: float
+    :param poll_interval: Time in seconds between two updates of the poll task
+    :type poll_interval: float
+    :param debug: Debug-object to collect debug information
+    :type debug: :class:`debug.Debug`
+    """
+    poll_fields = MountCom.poll_fields
+
+    apply_target_pos = MountCom.apply_target_pos
+    apply_telescope_pos = MountCom.apply_telescope_pos
+    apply_mount_status = MountCom.apply_mount_status
+    apply_dome_pos = MountCom.apply_dome_pos
+    apply_shutter_status = MountCom.apply_shutter_status
+    apply_tracking_time = MountCom.apply_tracking_time
+
+    def __init__(self, address=('194.94.209.214', 3490), timeout=3, poll_interval=0.1, debug=None):
+        self.mount_address = address
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.debug = debug
+        self.tracer = Tracer(debug)
+        self.reader = None
+        self.writer = None
+        self.pending = None
+        self.connect_lock = None
+        self.reader_task = None
+        self.poll_task = None
+        self.ok = False
+        self.target_ra = '00:00:00.0'
+        self.target_dec = '+00:00:00.0'
+        self.telescope_ra = '00:00:00.0'
+        self.telescope_dec = '+00:00:00.0'
+        self.status = ''
+        self.dome_pos = ''
+        self.shutter_status = 2
+        self.tracking_time = '100#'
+
+    def add_debug(self, text, *args):
+        """
+        Adds the text to the debug-file, see :meth:`MountTEST.core.mountcom.MountCom.add_debug`.
+
+        :param text: the text or a template for the arguments
+        :type text: str
+        """
+        self.tracer.trace(COM, DEBUG, text, *args)
+
+    def add_error(self, text, *args):
+        """
+        Adds an error to the debug-file, see :meth:`add_debug`.
+        """
+        self.tracer.trace(COM, ERROR, text, *args)
+
+    async def connect(self):
+        """
+        Opens the connection to the mount and starts the reader task.
+
+        :returns: True if there is a connection now, else False
+        :rtype: bool
+        """
+        self.add_debug('AsyncMount connect')
+        try:
+            # the communication log can be up to 256 kB long
+            self.reader, self.writer = await asyncio.wait_for(
+                asyncio.open_connection(*self.mount_address, limit=2 ** 20), self.timeout)
+            self.pending = asyncio.Queue()
+            self.reader_task = asyncio.ensure_future(self.__read_replies__())
+            self.ok = True
+        except (OSError, asyncio.TimeoutError):
+            self.add_debug('AsyncMount no connection to mount')
+            self.ok = False
+        return self.ok
+
+    async def close_connection(self):
+        """
+        Stops the poll task and closes the connection to the mount.
+        """
+        self.add_debug('AsyncMount close_connection')
+        self.stop_polling()
+        self.__disconnect__(ConnectionError('connection closed'))
+
+    def __disconnect__(self, error):
+        """
+        Closes the connection and finishes all waiting commands with the error.
+
+        :param error: The reason for the disconnection
+        :type error: Exception
+        """
+        self.ok = False
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if self.reader_task is not None and self.reader_task is not asyncio.current_task():
+            self.reader_task.cancel()
+        self.reader_task = None
+        if self.pending is not None:
+            while not self.pending.empty():
+                kinds, future = self.pending.get_nowait()
+                if not future.done():
+                    future.set_exception(error)
+
+    async def __read_reply__(self, kind):
+        """
+        Reads the next answer of the given kind from the stream.
+
+        :param kind: The kind of the answer
+        :type kind: int
+        :returns: The answer
+        :rtype: str
+        """
+        if kind == CHAR_REPLY:
+            return (await self.reader.readexactly(1)).decode('latin-1')
+        elif kind == FRAME_REPLY:
+            return (await self.reader.readuntil(TERMINATOR)).decode('latin-1')
+        elif kind == SLEW_REPLY:
+            char = (await self.reader.readexactly(1)).decode('latin-1')
+            if char == '0':
+                return char
+            return char + (await self.reader.readuntil(TERMINATOR)).decode('latin-1')
+        elif kind == DATE_REPLY:
+            char = (await self.reader.readexactly(1)).decode('latin-1')
+            if char == '1':
+                await self.reader.readuntil(TERMINATOR)
+                await self.reader.readuntil(TERMINATOR)
+            return char
+        return ''
+
+    async def __read_replies__(self):
+        """
+        Reader task, assigns the answers of the mount to the waiting commands in
+        the order in which the commands were written.
+        """
+        while True:
+            kinds, future = await self.pending.get()
+            try:
+                replies = []
+                for command_kinds in kinds:
+                    reply = ''
+                    for kind in command_kinds:
+                        reply += await asyncio.wait_for(self.__read_reply__(kind), self.timeout)
+                    replies.append(reply)
+            except (OSError, EOFError, asyncio.IncompleteReadError,
+                    asyncio.LimitOverrunError, asyncio.TimeoutError) as e:
+                # the order of the answers is lost, start with a new connection
+                self.add_debug('AsyncMount lost answer {}', e)
+                if not future.done():
+                    future.set_exception(e)
+                self.__disconnect__(e)
+                return
+            if not future.done():
+                future.set_result(replies)
+
+    async def send_commands(self, commands):
+        """
+        Sends several commands with one write to the mount and returns the answers.
+
+        :param commands: The commands
+        :type commands: list
+        :returns: The answers of the single commands in the same order
+        :rtype: list
+        """
+        if not self.ok:
+            if self.connect_lock is None:
+                self.connect_lock = asyncio.Lock()
+            async with self.connect_lock:
+                if not self.ok and not await self.connect():
+                    return [None] * len(commands)
+        kinds = [reply_kinds(c) for c in commands]
+        future = asyncio.get_event_loop().create_future()
+        if any(kinds):
+            self.pending.put_nowait((kinds, future))
+        else:
+            future.set_result([''] * len(commands))
+        self.writer.write(encode_command(''.join(commands)))
+        try:
+            await self.writer.drain()
+            return await future
+        except (OSError, EOFError, asyncio.IncompleteReadError,
+                asyncio.LimitOverrunError, asyncio.TimeoutError):
+            return [None] * len(commands)
+
+    async def send_command(self, command):
+        """
+        Sends the command to the mount and returns the answer.
+
+        :param command: The command
+        :type command: str
+        :returns: The answer of the mount, None if there is no connection
+        :rtype: str
+        """
+        self.add_debug('AsyncMount send_command {}', command)
+        return (await self.send_commands([command]))[0]
+
+    async def refresh_state(self):
+        """
+        Updates the state of the mount with one round trip.
+        """
+        commands = []
+        for name, queries in self.poll_fields:
+            commands.extend(queries)
+        replies = await self.send_commands(commands)
+        i = 0
+        for name, queries in self.poll_fields:
+            getattr(self, 'apply_' + name)(*replies[i:i + len(queries)])
+            i += len(queries)
+
+    async def __poll__(self):
+        """
+        Poll task, updates the state of the mount every poll_interval seconds.
+        """
+        while True:
+            try:
+                await self.refresh_state()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # a failed refresh must not end the task, the next refresh
+                # opens a new connection, see :meth:`send_commands`
+                self.add_error('AsyncMount poll failed: {!r}', e)
+                if not isinstance(e, ValueError):
+                    self.__disconnect__(e)
+            await asyncio.sleep(self.poll_interval)
+
+    def start_polling(self):
+        """
+        Starts the poll task, which updates the state of the mount.
+        """
+        if self.poll_task is None:
+            self.poll_task = asyncio.ensure_future(self.__poll__())
+
+    def stop_polling(self):
+        """
+        Stops the poll task.
+        """
+        if self.poll_task is not None:
+            self.poll_task.cancel()
+            self.poll_task = None
+
+    async def get_temperature(self, n):
+        """
+        Async version of :meth:`MountTEST.mount.Mount.get_temperature`.
+        """
+        return await self.send_command(':GTMP{}#'.format(n))
+
+    async def slew_ra_dec(self, ra_hour, ra_min, ra_sec, dec_deg, dec_min, dec_sec):
+        """
+        Slew to the equatorial coordinates. The target coordinates are sent with
+        one write, the slew command only if the mount has accepted both of them.
+
+        :returns: The answer of ':MS#', '0' if the slew has started, None if the coordinates are invalid
+        :rtype: str
+        """
+        self.add_debug('AsyncMount slew_ra_dec {}:{}:{} {}:{}:{}', ra_hour, ra_min, ra_sec,
+                       dec_deg, dec_min, dec_sec)
+        ra_ok, dec_ok = await self.send_commands(
+            [':Sr{:02d}:{:02d}:{:05.2f}#'.format(int(ra_hour), int(ra_min), float(ra_sec)),
+             self.__dec_command__(dec_deg, dec_min, dec_sec)])
+        if ra_ok == '1' and dec_ok == '1':
+            # else the mount would slew to the previous target
+            return await self.send_command(':MS#')
+        return None
+
+    async def set_dec(self, dec_deg, dec_min, dec_sec):
+        """
+        Async version of :meth:`MountTEST.mount.Mount.set_dec`.
+        """
+        return await self.send_command(self.__dec_command__(dec_deg, dec_min, dec_sec))
+
+    @staticmethod
+    def __dec_command__(dec_deg, dec_min, dec_sec):
+        # the sign can be carried by any component, ex. -0 30 0
+        dec = join_sexagesimal(dec_deg, dec_min, dec_sec)
+        return ':Sd{}#'.format(format_sexagesimal(dec, sign=True, digits=1, separator='*'))
+
+    async def stop(self):
+        """
+        Async version of :meth:`MountTEST.mount.Mount.stop`.
+        """
+        return await self.send_command(':STOP#')
+
+    async def stop_slew(self):
+        """
+        Halt all current slewing.
+        """
+        return await self.send_command(':Q#')
+
+
+def _query_method(name, command):
+    async def query(self):
+        return await self.send_command(command)
+    query.__name__ = name
+    query.__doc__ = 'Async version of :meth:`MountTEST.mount.Mount.{}`, sends {}'.format(name, command)
+    return query
+
+
+def _set_method(name, template):
+    async def setter(self, *args):
+        return await self.send_command(template.format(*args))
+    setter.__name__ = name
+    setter.__doc__ = 'Async version of :meth:`MountTEST.mount.Mount.{}`, sends {}'.format(name, template)
+    return setter
+
+
+for _name, _command in QUERY_COMMANDS:
+    setattr(AsyncMount, _name, _query_method(_name, _command))
+for _name, _command in SET_COMMANDS:
+    setattr(AsyncMount, _name, _set_method(_name, _command))
+del _name, _command
@@ -1,31 +1,345 @@
-from astropy.table import Table
 from astropy.time import Time
 import numpy as np
+import math
+import os
+
+# corrections closer than RADIUS degrees and younger than MAX_AGE days are used
+RADIUS = 10. / 60
+MAX_AGE = 0.5
+
+CORRECTION_DTYPE = np.dtype([('ra', '<f8'), ('dec', '<f8'), ('delta_ra', '<f8'),
+                             ('delta_dec', '<f8'), ('jd', '<f8')])
+
+# layout of a correction file: the magic bytes, the number of stored
+# corrections as little endian uint64 and the records in CORRECTION_DTYPE
+FILE_MAGIC = b'MTCORR01'
+HEADER_SIZE = 16
+
+
+def unit_vector(ra, dec):
+    """
+    Converts equatorial coordinates to a unit vector.
+
+    :param ra: Right ascension in hours
+    :type ra: float
+    :param dec: Declination in degrees
+    :type dec: float
+    :returns: x, y and z of the unit vector
+    :rtype: tuple
+    """
+    ra = math.radians(ra * 15)
+    dec = math.radians(dec)
+    return math.cos(dec) * math.cos(ra), math.cos(dec) * math.sin(ra), math.sin(dec)
+
+
+class SphericalIndex:
+    """
+    Spatial index of positions on the sphere. The positions are stored as unit
+    vectors in the cells of a cubic grid, whose cell size is the chord length
+    of the search radius. All neighbours of a position are in the 27 cells
+    around it, so a query doesn't depend on the number of stored positions and
+    there are no problems at RA 0h/24h or at the poles.
+
+    :param radius: Search radius in degrees
+    :type radius: float
+    """
+    def __init__(self, radius=RADIUS):
+        self.radius = radius
+        self.chord = 2 * math.sin(math.radians(radius) / 2)
+        self.cells = {}
+        self.vectors = []
+
+    def __key__(self, vector):
+        return (int(math.floor(vector[0] / self.chord)),
+                int(math.floor(vector[1] / self.chord)),
+                int(math.floor(vector[2] / self.chord)))
+
+    def add(self, ra, dec):
+        """
+        Adds a new position to the index.
+
+        :param ra: Right ascension in hours
+        :type ra: float
+        :param dec: Declination in degrees
+        :type dec: float
+        :returns: The index of the position
+        :rtype: int
+        """
+        vector = unit_vector(ra, dec)
+        index = len(self.vectors)
+        self.vectors.append(vector)
+        self.cells.setdefault(self.__key__(vector), []).append(index)
+        return index
+
+    def add_many(self, ra, dec):
+        """
+        Adds several positions to the index.
+
+        :param ra: Right ascensions in hours
+        :type ra: numpy.ndarray
+        :param dec: Declinations in degrees
+        :type dec: numpy.ndarray
+        """
+        ra = np.radians(np.asarray(ra, dtype=float) * 15)
+        dec = np.radians(np.asarray(dec, dtype=float))
+        vectors = np.column_stack((np.cos(dec) * np.cos(ra), np.cos(dec) * np.sin(ra), np.sin(dec)))
+        keys = np.floor(vectors / self.chord).astype(int)
+        start = len(self.vectors)
+        self.vectors.extend([tuple(v) for v in vectors.tolist()])
+        for i, key in enumerate(keys.tolist()):
+            self.cells.setdefault(tuple(key), []).append(start + i)
+
+    def query(self, ra, dec):
+        """
+        Returns all positions within the search radius.
+
+        :param ra: Right ascension in hours
+        :type ra: float
+        :param dec: Declination in degrees
+        :type dec: float
+        :returns: The indices of the positions
+        :rtype: list
+        """
+        vector = unit_vector(ra, dec)
+        kx, ky, kz = self.__key__(vector)
+        limit = self.chord ** 2
+        found = []
+        for x in (kx - 1, kx, kx + 1):
+            for y in (ky - 1, ky, ky + 1):
+                for z in (kz - 1, kz, kz + 1):
+                    for index in self.cells.get((x, y, z), ()):
+                        v = self.vectors[index]
+                        d = ((v[0] - vector[0]) ** 2 + (v[1] - vector[1]) ** 2 +
+                             (v[2] - vector[2]) ** 2)
+                        if d < limit:
+                            found.append(index)
+        return found
 
 
 class CoordinateCorrection:
-    correction = None
+    """
+    Collection of the pointing corrections. The corrections are stored in a
+    preallocated structured array, which doubles its capacity if it is full,
+    so adding a correction costs O(1) amortized.
+
+    If a path is given, the array is a memory map of an append-only file. New
+    corrections are flushed to the file as they arrive and a new instance maps
+    the existing corrections without parsing them, so a restart keeps the
+    corrections of the night.
+
+    :param path: Path of the correction file, None to keep the corrections only in memory
+    :type path: str
+    :param capacity: Initial number of corrections which can be stored
+    :type capacity: int
+    """
     delta_ra = 0
     delta_dec = 0
 
-    def __init__(self):
-        pass
+    def __init__(self, path=None, capacity=1024):
+        self.path = path
+        self.header = None
+        self.size = 0
+        self.index = SphericalIndex()
+        if path is None:
+            self.data = np.zeros(capacity, dtype=CORRECTION_DTYPE)
+        else:
+            self.__open_file__(capacity)
+
+    def __open_file__(self, capacity):
+        """
+        Maps the correction file and creates it, if it doesn't exist.
+
+        :param capacity: Number of corrections for which space is reserved in a new file
+        :type capacity: int
+        """
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < HEADER_SIZE:
+            with open(self.path, 'wb') as f:
+                f.write(FILE_MAGIC)
+                f.write(np.zeros(1, dtype='<u8').tobytes())
+                f.truncate(HEADER_SIZE + capacity * CORRECTION_DTYPE.itemsize)
+        else:
+            with open(self.path, 'rb') as f:
+                if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+                    raise ValueError('{} is not a correction file'.format(self.path))
+        self.__map_file__()
+        self.size = min(int(self.header[0]), len(self.data))
+        self.index.add_many(self.data['ra'][:self.size], self.data['dec'][:self.size])
+
+    def __map_file__(self):
+        """
+        Maps the number of corrections and the records of the correction file.
+        """
+        records = (os.path.getsize(self.path) - HEADER_SIZE) // CORRECTION_DTYPE.itemsize
+        self.header = np.memmap(self.path, dtype='<u8', mode='r+', offset=len(FILE_MAGIC), shape=(1,))
+        self.data = np.memmap(self.path, dtype=CORRECTION_DTYPE, mode='r+', offset=HEADER_SIZE,
+                              shape=(max(records, 1),))
+
+    def __unmap_file__(self):
+        """
+        Flushes and releases both maps of the correction file. On Windows a
+        mapped file can't be resized or replaced.
+        """
+        self.flush()
+        self.header = None
+        self.data = None
+
+    def flush(self):
+        """
+        Writes the new corrections to the correction file. The records are written
+        before the number of corrections, so the file never counts unwritten records.
+        """
+        if self.header is not None:
+            self.data.flush()
+            self.header[0] = self.size
+            self.header.flush()
+
+    def close(self):
+        """
+        Flushes and unmaps the correction file.
+        """
+        if self.header is not None:
+            self.flush()
+            self.header = None
+            self.data = np.array(self.data[:self.size])
+
+    @property
+    def correction(self):
+        """
+        The stored corrections with the columns ra, dec, delta_ra, delta_dec and jd.
+        """
+        return self.data[:self.size]
+
+    def __reserve__(self, n):
+        """
+        Makes sure that n more corrections can be stored.
+
+        :param n: Number of new corrections
+        :type n: int
+        """
+        if self.size + n > len(self.data):
+            capacity = max(2 * len(self.data), self.size + n)
+            if self.header is None:
+                data = np.zeros(capacity, dtype=CORRECTION_DTYPE)
+                data[:self.size] = self.data[:self.size]
+                self.data = data
+            else:
+                # the maps must be released before the file can grow
+                self.__unmap_file__()
+                with open(self.path, 'r+b') as f:
+                    f.truncate(HEADER_SIZE + capacity * CORRECTION_DTYPE.itemsize)
+                self.__map_file__()
 
     def add_correction(self, ra, dec, delta_ra, delta_dec, jd):
-        if self.correction is None:
-            self.correction = Table(rows=(ra, dec, delta_ra, delta_dec, jd),
-                                    names=['ra', 'dec', 'delta_ra', 'delta_dec', 'jd'])
+        """
+        Adds a new correction.
+
+        :param ra: Right ascension of the position in hours
+        :type ra: float
+        :param dec: Declination of the position in degrees
+        :type dec: float
+        :param delta_ra: Correction in right ascension
+        :type delta_ra: float
+        :param delta_dec: Correction in declination
+        :type delta_dec: float
+        :param jd: Julian date of the measurement
+        :type jd: float
+        """
+        self.__reserve__(1)
+        self.data[self.size] = (ra, dec, delta_ra, delta_dec, jd)
+        self.size += 1
+        self.index.add(ra, dec)
+        self.flush()
+
+    def add_corrections(self, ra, dec, delta_ra, delta_dec, jd):
+        """
+        Adds several corrections at once, ex. the plate-solve results of a night.
+        Scalars are broadcast to the length of the arrays.
+
+        :param ra: Right ascensions of the positions in hours
+        :type ra: numpy.ndarray
+        :param dec: Declinations of the positions in degrees
+        :type dec: numpy.ndarray
+        :param delta_ra: Corrections in right ascension
+        :type delta_ra: numpy.ndarray
+        :param delta_dec: Corrections in declination
+        :type delta_dec: numpy.ndarray
+        :param jd: Julian dates of the measurements
+        :type jd: numpy.ndarray
+        """
+        ra, dec, delta_ra, delta_dec, jd = np.broadcast_arrays(ra, dec, delta_ra, delta_dec, jd)
+        ra = np.ravel(ra)
+        n = len(ra)
+        self.__reserve__(n)
+        rows = self.data[self.size:self.size + n]
+        rows['ra'] = ra
+        rows['dec'] = np.ravel(dec)
+        rows['delta_ra'] = np.ravel(delta_ra)
+        rows['delta_dec'] = np.ravel(delta_dec)
+        rows['jd'] = np.ravel(jd)
+        self.size += n
+        self.index.add_many(rows['ra'], rows['dec'])
+        self.flush()
+
+    def remove_old_corrections(self, max_age=MAX_AGE):
+        """
+        Removes all corrections which are older than max_age days.
+
+        :param max_age: Maximal age of the corrections in days
+        :type max_age: float
+        """
+        kept = self.correction[Time.now().jd - self.correction['jd'] < max_age]
+        if self.header is None:
+            self.data[:len(kept)] = kept
         else:
-            self.correction.add_row((ra, dec, delta_ra, delta_dec, jd))
+            self.__rewrite_file__(kept)
+        self.size = len(kept)
+        self.index = SphericalIndex(self.index.radius)
+        self.index.add_many(kept['ra'], kept['dec'])
+        self.flush()
+
+    def __rewrite_file__(self, records):
+        """
+        Writes the records into a new correction file, which replaces the old one
+        at once, so after a crash the file holds either the old or the new records.
+
+        :param records: The records of the new file
+        :type records: numpy.ndarray
+        """
+        capacity = max(len(self.data), len(records))
+        new_path = self.path + '.new'
+        with open(new_path, 'wb') as f:
+            f.write(FILE_MAGIC)
+            f.write(np.array([len(records)], dtype='<u8').tobytes())
+            f.write(np.asarray(records, dtype=CORRECTION_DTYPE).tobytes())
+            f.truncate(HEADER_SIZE + capacity * CORRECTION_DTYPE.itemsize)
+            f.flush()
+            os.fsync(f.fileno())
+        self.__unmap_file__()
+        os.replace(new_path, self.path)
+        self.__map_file__()
 
     def get_correction(self, ra, dec):
-        if self.correction is None:
+        """
+        Returns the median correction of the corrections close to the position,
+        which are younger than half a day.
+
+        :param ra: Right ascension in hours
+        :type ra: float
+        :param dec: Declination in degrees
+        :type dec: float
+        :returns: The corrections in right ascension and declination
+        :rtype: tuple
+        """
+        if self.size == 0:
             return 0, 0
-        r = np.hypot(self.correction['ra']-ra,
-                     self.correction['dec']-dec)
-        p = np.where((r < 10./60) &
-                     (np.abs(Time.now().jd-self.correction['jd']) < 0.5))[0]
-        correction_estimator = self.correction[p]
+        p = np.array(self.index.query(ra, dec), dtype=int)
+        if len(p) > 0:
+            p = p[np.abs(Time.now().jd - self.data['jd'][p]) < MAX_AGE]
+        if len(p) == 0:
+            self.delta_ra = 0
+            self.delta_dec = 0
+            return self.delta_ra, self.delta_dec
+        correction_estimator = self.data[p]
         self.delta_ra = np.median(correction_estimator['delta_ra'])
         self.delta_dec = np.median(correction_estimator['delta_dec'])
         return self.delta_ra, self.delta_dec
@@ -0,0 +1,242 @@
+"""
+Vectorized conversion of coordinates between decimal hours or degrees, the
+sexagesimal components and the string formats of the mount.
+
+All functions accept scalars or arrays, so a whole target list is converted
+with a few NumPy operations instead of a Python loop::
+
+    ra = parse_sexagesimal(['12:30:00.00', '01:02:03.04'])
+    dec = format_sexagesimal([-0.5, 45.25], sign=True, digits=1, separator='*')
+"""
+import numpy as np
+
+# character classes of the parser
+DIGIT = 0
+SEPARATOR = 1
+POINT = 2
+SIGN = 3
+END = 4
+INVALID = 5
+
+SEPARATORS = (ord(':'), ord('*'), 223)
+
+
+def split_sexagesimal(values, digits=None):
+    """
+    Splits decimal hours or degrees into the sign and the unsigned sexagesimal
+    components. If digits is given, the seconds are rounded to digits decimal
+    places and carried into the minutes, so there are never 60 seconds.
+
+    :param values: The values in hours or degrees
+    :type values: numpy.ndarray
+    :param digits: Number of decimal places of the seconds, None to keep them unrounded
+    :type digits: int
+    :returns: sign (1 or -1), hours or degrees, minutes and seconds
+    :rtype: tuple
+    """
+    values = np.asarray(values, dtype=float)
+    sign = np.where(values < 0, -1, 1)
+    if digits is None:
+        rest = np.abs(values)
+        first = np.floor(rest)
+        rest = (rest - first) * 60
+        minutes = np.floor(rest)
+        return sign, first.astype(np.int64), minutes.astype(np.int64), (rest - minutes) * 60
+    first, minutes, seconds = __split_units__(values, digits)
+    return sign, first, minutes, seconds / float(10 ** digits)
+
+
+def __split_units__(values, digits):
+    """
+    Splits the absolute values into the first component, the minutes and the
+    seconds in units of 10**-digits seconds.
+    """
+    scale = 3600 * 10 ** digits
+    total = np.rint(np.abs(values) * scale).astype(np.int64)
+    first, rest = np.divmod(total, scale)
+    minutes, seconds = np.divmod(rest, scale // 60)
+    return first, minutes, seconds
+
+
+def join_sexagesimal(first, minutes, seconds, sign=None):
+    """
+    Joins sexagesimal components to decimal hours or degrees.
+
+    :param first: Hours or degrees
+    :type first: numpy.ndarray
+    :param minutes: Minutes
+    :type minutes: numpy.ndarray
+    :param seconds: Seconds
+    :type seconds: numpy.ndarray
+    :param sign: Sign (1 or -1) of the values, None if the sign is carried by the components
+    :type sign: numpy.ndarray
+    :returns: The values in hours or degrees
+    :rtype: numpy.ndarray
+    """
+    first = np.asarray(first, dtype=float)
+    minutes = np.asarray(minutes, dtype=float)
+    seconds = np.asarray(seconds, dtype=float)
+    if sign is None:
+        sign = np.where((first < 0) | (minutes < 0) | (seconds < 0), -1, 1)
+    return sign * (np.abs(first) + np.abs(minutes) / 60 + np.abs(seconds) / 3600)
+
+
+def signed_components(values):
+    """
+    Splits decimal hours or degrees into hours or degrees, minutes and seconds.
+    The sign is carried by the first nonzero component, so -0.5 degrees are
+    (0, -30, 0.0) and not (0, 30, 0.0).
+
+    :param values: The values in hours or degrees
+    :type values: numpy.ndarray
+    :returns: hours or degrees, minutes and seconds
+    :rtype: tuple
+    """
+    sign, first, minutes, seconds = split_sexagesimal(values)
+    negative_first = (sign < 0) & (first != 0)
+    negative_minutes = (sign < 0) & (first == 0) & (minutes != 0)
+    negative_seconds = (sign < 0) & (first == 0) & (minutes == 0)
+    return (np.where(negative_first, -first, first),
+            np.where(negative_minutes, -minutes, minutes),
+            np.where(negative_seconds, -seconds, seconds))
+
+
+def format_sexagesimal(values, sign=False, digits=2, width=2, separator=':'):
+    """
+    Formats decimal hours or degrees to the format of the mount, ex. HH:MM:SS.SS
+    or sDD*MM:SS.S.
+
+    :param values: The values in hours or degrees
+    :type values: numpy.ndarray
+    :param sign: True if the sign should be written, else False
+    :type sign: bool
+    :param digits: Number of decimal places of the seconds
+    :type digits: int
+    :param width: Width of the first field
+    :type width: int
+    :param separator: Separator between the first field and the minutes
+    :type separator: str
+    :returns: The formatted values, a str if values is a scalar
+    :rtype: numpy.ndarray
+    """
+    values = np.asarray(values, dtype=float)
+    first, minutes, seconds = __split_units__(values, digits)
+    whole, fraction = np.divmod(seconds, 10 ** digits)
+    out = np.char.add(np.char.zfill(first.astype(str), width), separator)
+    out = np.char.add(out, np.char.zfill(minutes.astype(str), 2))
+    out = np.char.add(out, ':')
+    out = np.char.add(out, np.char.zfill(whole.astype(str), 2))
+    if digits > 0:
+        out = np.char.add(out, '.')
+        out = np.char.add(out, np.char.zfill(fraction.astype(str), digits))
+    if sign:
+        out = np.char.add(np.where(values < 0, '-', '+'), out)
+    if out.ndim == 0:
+        return str(out)
+    return out
+
+
+def __classify__(codes):
+    """
+    Returns the character class of every character code.
+    """
+    classes = np.full(codes.shape, INVALID, dtype=np.int8)
+    classes[(codes >= ord('0')) & (codes <= ord('9'))] = DIGIT
+    classes[np.isin(codes, SEPARATORS)] = SEPARATOR
+    classes[codes == ord('.')] = POINT
+    classes[(codes == ord('+')) | (codes == ord('-'))] = SIGN
+    classes[(codes == 0) | (codes == ord('#')) | (codes == ord(' '))] = END
+    return classes
+
+
+def __parse_layout__(codes, layout):
+    """
+    Parses rows of character codes which all have the same layout of character classes.
+    """
+    n = len(layout)
+    end = int(np.argmax(layout == END)) if (layout == END).any() else n
+    if (layout[end:] != END).any() or (layout[:end] == INVALID).any() \
+            or (layout[1:end] == SIGN).any():
+        raise ValueError('invalid sexagesimal value')
+    start = 1 if end > 0 and layout[0] == SIGN else 0
+    if start == end:
+        raise ValueError('invalid sexagesimal value')
+    digits = codes[:, :end].astype(np.int64) - ord('0')
+    weights = np.zeros(end)
+    field = 0
+    i = start
+    while i < end:
+        j = i
+        while j < end and layout[j] != SEPARATOR:
+            j += 1
+        point = [k for k in range(i, j) if layout[k] == POINT]
+        if len(point) > 1 or i == j:
+            raise ValueError('invalid sexagesimal value')
+        integer_end = point[0] if point else j
+        scale = 60. ** -field
+        for k in range(i, integer_end):
+            weights[k] = scale * 10. ** (integer_end - 1 - k)
+        for k in range(integer_end + 1, j):
+            weights[k] = scale * 10. ** (integer_end - k)
+        field += 1
+        i = j + 1
+    digits[:, layout[:end] != DIGIT] = 0
+    values = digits.dot(weights)
+    if start == 1:
+        values[codes[:, 0] == ord('-')] *= -1
+    return values
+
+
+def __group_layouts__(classes):
+    """
+    Groups the rows by their layout of character classes.
+
+    :returns: The mask of the rows and the layout of every group
+    :rtype: list
+    """
+    if classes.shape[1] <= 21:
+        # three bits per class, so the layout of a row is packed into one integer
+        keys = classes.astype(np.int64).dot(8 ** np.arange(classes.shape[1], dtype=np.int64))
+        layouts, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        layouts = classes[first]
+    else:
+        layouts, inverse = np.unique(classes, axis=0, return_inverse=True)
+    inverse = np.ravel(inverse)
+    return [(inverse == i, layout) for i, layout in enumerate(layouts)]
+
+
+def parse_sexagesimal(texts):
+    """
+    Parses values in the formats of the mount like '12:30:00.00#', '+45*30:00'
+    or '-05:30' to decimal hours or degrees. The strings are parsed as a matrix
+    of character codes, the strings with the same layout at once.
+
+    :param texts: The values
+    :type texts: numpy.ndarray
+    :returns: The values in hours or degrees, a float if texts is a scalar
+    :rtype: numpy.ndarray
+    """
+    texts = np.asarray(texts)
+    scalar = texts.ndim == 0
+    texts = np.atleast_1d(texts).ravel()
+    if texts.dtype.kind == 'U':
+        codes = texts.view(np.uint32)
+    elif texts.dtype.kind == 'S':
+        codes = texts.view(np.uint8)
+    else:
+        texts = texts.astype(str)
+        codes = texts.view(np.uint32)
+    codes = codes.reshape(len(texts), -1)
+    values = np.zeros(len(texts))
+    if len(texts) > 0 and codes.shape[1] > 0:
+        classes = __classify__(codes)
+        if (classes == classes[0]).all():
+            values = __parse_layout__(codes, classes[0])
+        else:
+            for rows, layout in __group_layouts__(classes):
+                values[rows] = __parse_layout__(codes[rows], layout)
+    elif len(texts) > 0:
+        raise ValueError('invalid sexagesimal value')
+    if scalar:
+        return float(values[0])
+    return values
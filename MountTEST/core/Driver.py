@@ -11,12 +11,14 @@ as a direct interaction to comtype drivers.
 
 from datetime import datetime
 from threading import Lock
+import time
 try:
     from comtypes import COMError
 except ImportError:
     COMError = AttributeError
 from comtypes.client import CreateObject
 import os
+from MountTEST.core.logwriter import LogWriter
 
 
 class DriverLog:
@@ -25,17 +27,34 @@ class DriverLog:
     It collects the changes/calls of the different method and if active_log 
     enabled it will save the information in a log file.
     With this class you can track the driver interactions to find ex. an error.
+
+    The log file is written by a :class:`MountTEST.core.logwriter.LogWriter`
+    in the background, so a driver call doesn't wait for the disk.
+
+    :param log_file: Path to the log file, an empty string for no log file
+    :type log_file: str
+    :param binary: True to write the compact binary format, see :func:`MountTEST.core.logwriter.read_binary_log`
+    :type binary: bool
+    :param max_bytes: Size in bytes, at which the log file is rotated
+    :type max_bytes: int
+    :param backups: Number of kept rotated log files
+    :type backups: int
+    :param tracer: The tracer of failed writes of the log file, None for no tracing
+    :type tracer: :class:`MountTEST.core.tracing.Tracer`
     """
-    def __init__(self, log_file=''):
+    def __init__(self, log_file='', binary=False, max_bytes=10 * 1024 * 1024, backups=5, tracer=None):
         self.last_update_time = datetime.now()
         self.last_update = 'ini'
         self.log_file = log_file
         self.active_log = False
-        if self.log_file is not '':
-            path = log_file.split('/')[-1]
-            path = log_file.split(path)[0]
-            if not os.path.exists(path):
+        self.writer = None
+        if self.log_file != '':
+            path = os.path.dirname(log_file)
+            if path != '' and not os.path.exists(path):
                 os.makedirs(os.path.abspath(path))
+            self.writer = LogWriter(log_file, binary=binary, max_bytes=max_bytes, backups=backups,
+                                    tracer=tracer)
+            self.writer.start()
             self.active_log = True
         
     def set_new_update(self, update_kind):
@@ -65,12 +84,19 @@ class DriverLog:
         
     def write_log(self):
         """
-        Adds the last update to the log file.
+        Adds the last update to the log file. The update is only queued, the
+        writer commits it together with the following updates.
+        """
+        self.writer.write(self.last_update, time.mktime(self.last_update_time.timetuple()) +
+                          self.last_update_time.microsecond / 1e6)
+
+    def close(self):
+        """
+        Writes the queued updates and closes the log file.
         """
-        f = open(self.log_file, 'a')
-        f.write(self.last_update + '\t' +
-                self.last_update_time.strftime("%Y-%m-%d %H:%M:%S") + '\n')
-        f.close()
+        if self.writer is not None:
+            self.writer.close()
+        self.active_log = False
         
         
 class Driver:
@@ -0,0 +1,132 @@
+"""
+Connections to the mount with distinct roles.
+
+The mount accepts several TCP/IP connections at the same time, so the
+telemetry polling, the interactive commands and the stop/abort commands
+each get their own connection with its own framing and timeout. A command
+doesn't wait behind the poll traffic and a stop isn't delayed by a slow
+command.
+"""
+import socket
+import time
+from threading import Lock
+
+from MountTEST.core.protocol import FrameReader
+from MountTEST.core.transport import open_transport
+
+POLL = 'poll'
+COMMAND = 'command'
+PRIORITY = 'priority'
+
+# timeouts of the connections in seconds
+TIMEOUTS = {POLL: 3., COMMAND: 5., PRIORITY: 1.}
+
+# commands which stop the mount and are sent with the priority connection
+PRIORITY_COMMANDS = (':Q#', ':Qe#', ':Qw#', ':Qn#', ':Qs#', ':STOP#')
+
+
+def is_priority(command):
+    """
+    :param command: The command or a list of commands
+    :type command: str, list
+    :returns: True if the command stops the mount, else False
+    :rtype: bool
+    """
+    if isinstance(command, list):
+        return any(c in PRIORITY_COMMANDS for c in command)
+    return command in PRIORITY_COMMANDS
+
+
+class Channel:
+    """
+    A TCP/IP connection to the mount. The connection can be used by several
+    threads, the commands are serialized by a lock. The connection is closed
+    after an error other than a timeout, so it can be opened again by the
+    :class:`MountTEST.core.supervisor.ConnectionSupervisor`.
+
+    :param role: Role of the connection, 'poll', 'command' or 'priority'
+    :type role: str
+    :param address: Address of the mount, see :func:`MountTEST.core.transport.open_transport`
+    :type address: tuple, str, function
+    :param timeout: Timeout of the connection in seconds, None for the default timeout of the role
+    :type timeout: float
+    """
+    def __init__(self, role, address, timeout=None):
+        self.role = role
+        self.address = address
+        if timeout is None:
+            timeout = TIMEOUTS.get(role, 3.)
+        self.timeout = timeout
+        self.client = None
+        self.reader = None
+        self.ok = False
+        self.last_use = time.time()
+        self.last_error = None
+        self.lock = Lock()
+
+    def open(self):
+        """
+        Opens the connection.
+
+        :returns: True if there is a connection now, else False
+        :rtype: bool
+        """
+        self.close()
+        try:
+            self.client = open_transport(self.address, self.timeout)
+            self.reader = FrameReader(self.client)
+            self.last_use = time.time()
+            self.ok = True
+        except socket.error as e:
+            self.last_error = e
+            self.ok = False
+        return self.ok
+
+    def close(self):
+        """
+        Closes the connection.
+        """
+        self.ok = False
+        if self.client is not None:
+            try:
+                self.client.close()
+            except socket.error:
+                pass
+
+    def __call__(self, method, *args):
+        """
+        Calls a method of the :class:`MountTEST.core.protocol.FrameReader` with the lock.
+        A late answer after an error is discarded, so it isn't taken as the answer
+        of the next command.
+        """
+        with self.lock:
+            if not self.ok:
+                raise socket.error('{} connection is closed'.format(self.role))
+            try:
+                data = getattr(self.reader, method)(*args)
+                self.last_use = time.time()
+                return data
+            except socket.error as e:
+                self.last_error = e
+                self.reader.discard()
+                if not isinstance(e, socket.timeout):
+                    self.close()
+                raise
+
+    def send_command(self, command):
+        """
+        See :meth:`MountTEST.core.protocol.FrameReader.send_command`.
+        """
+        return self('send_command', command)
+
+    def send_commands(self, commands):
+        """
+        See :meth:`MountTEST.core.protocol.FrameReader.send_commands`.
+        """
+        return self('send_commands', commands)
+
+    def send_query(self, command, decoder):
+        """
+        See :meth:`MountTEST.core.protocol.FrameReader.send_query`.
+        """
+        return self('send_query', command, decoder)
@@ -0,0 +1,213 @@
+"""
+Decoders of the answers of the mount.
+
+Every query of the LX200/10Micron protocol is mapped to a decoder, which
+converts the answer into a typed value: floats, ints, booleans, angles in
+radians or the :class:`MountStatus` of ':Gstat#'. The decoders accept the
+answer as str, bytes or as a memoryview of the receive buffer, with or
+without the terminator '#'. Numbers are converted directly from the
+memoryview, without a copy or a decoded string.
+"""
+import math
+from enum import IntEnum
+
+from MountTEST.core.protocol import split_command
+
+TERMINATOR = ord('#')
+
+
+class MountStatus(IntEnum):
+    """
+    Status of the mount, the answer of ':Gstat#'.
+    """
+    TRACKING = 0
+    STOPPED = 1
+    PARKING = 2
+    UNPARKING = 3
+    HOMING = 4
+    PARKED = 5
+    SLEWING = 6
+    TRACKING_OFF = 7
+    INHIBITED = 8
+    OUTSIDE_LIMITS = 9
+    SATELLITE = 10
+    NEEDS_USEROK = 11
+    UNKNOWN = 98
+    ERROR = 99
+
+
+def __strip__(data):
+    """
+    Removes the terminator from the answer.
+    """
+    if isinstance(data, str):
+        return data.rstrip('#')
+    if len(data) > 0 and data[-1] == TERMINATOR:
+        return data[:-1]
+    return data
+
+
+def decode_text(data):
+    """
+    :returns: The answer as string without the terminator
+    :rtype: str
+    """
+    data = __strip__(data)
+    if isinstance(data, str):
+        return data
+    return bytes(data).decode('latin-1')
+
+
+def decode_float(data):
+    """
+    :returns: The answer as float, ex. '+0012.5#' is 12.5
+    :rtype: float
+    """
+    return float(__strip__(data))
+
+
+def decode_int(data):
+    """
+    :returns: The answer as int, ex. '0042#' is 42
+    :rtype: int
+    """
+    return int(__strip__(data))
+
+
+def decode_bool(data):
+    """
+    :returns: True if the answer is '1', else False
+    :rtype: bool
+    """
+    return decode_int(data) == 1
+
+
+def decode_status(data):
+    """
+    :returns: The status of the mount, MountStatus.UNKNOWN for unknown values
+    :rtype: :class:`MountStatus`
+    """
+    try:
+        return MountStatus(decode_int(data))
+    except ValueError:
+        return MountStatus.UNKNOWN
+
+
+def decode_sexagesimal(data):
+    """
+    Decodes a sexagesimal answer like '12:30:00.00#' or '-05*30:00#'.
+
+    :returns: The value in hours or degrees
+    :rtype: float
+    """
+    text = decode_text(data).strip()
+    sign = -1 if text.startswith('-') else 1
+    parts = text.lstrip('+-').replace('*', ':').replace('\xdf', ':').split(':')
+    value = 0.
+    for i, part in enumerate(parts):
+        value += float(part) / 60 ** i
+    return sign * value
+
+
+def decode_hours_radians(data):
+    """
+    :returns: A sexagesimal answer in hours as angle in radians
+    :rtype: float
+    """
+    return math.radians(decode_sexagesimal(data) * 15)
+
+
+def decode_degrees_radians(data):
+    """
+    :returns: A sexagesimal answer in degrees as angle in radians
+    :rtype: float
+    """
+    return math.radians(decode_sexagesimal(data))
+
+
+# decoders of the single queries, the answers of other commands are decoded as text
+DECODERS = {
+    ':Gstat#': decode_status,
+    ':GR#': decode_hours_radians,
+    ':Gr#': decode_hours_radians,
+    ':GS#': decode_hours_radians,
+    ':GD#': decode_degrees_radians,
+    ':Gd#': decode_degrees_radians,
+    ':GA#': decode_degrees_radians,
+    ':Ga#': decode_degrees_radians,
+    ':GZ#': decode_degrees_radians,
+    ':Gz#': decode_degrees_radians,
+    ':Gg#': decode_degrees_radians,
+    ':Gt#': decode_degrees_radians,
+    ':GL#': decode_sexagesimal,
+    ':GG#': decode_float,
+    ':Gev#': decode_float,
+    ':GJD#': decode_float,
+    ':GJD1#': decode_float,
+    ':GJD2#': decode_float,
+    ':GRPRS#': decode_float,
+    ':GRTMP#': decode_float,
+    ':Gstm#': decode_float,
+    ':GDstm#': decode_float,
+    ':GMs#': decode_float,
+    ':GMsa#': decode_float,
+    ':GMsb#': decode_float,
+    ':Ggui#': decode_float,
+    ':GT#': decode_float,
+    ':GDA#': decode_float,
+    ':Gh#': decode_int,
+    ':Go#': decode_int,
+    ':Glmt#': decode_int,
+    ':Glms#': decode_int,
+    ':Gmte#': decode_int,
+    ':GMF#': decode_int,
+    ':GINQ#': decode_int,
+    ':Gpgc#': decode_int,
+    ':GSC#': decode_int,
+    ':GTRK#': decode_int,
+    ':GTTRK#': decode_int,
+    ':GTsid#': decode_int,
+    ':GDS#': decode_int,
+    ':GDW#': decode_int,
+    ':GDw#': decode_int,
+    ':GDH#': decode_int,
+    ':GREF#': decode_bool,
+    ':Guaf#': decode_bool,
+}
+
+_decoder_cache = {}
+
+
+def decoder(command):
+    """
+    Returns the decoder of the answer of the command. The answer of a compound
+    command like ':U2#:GR#' is decoded by the decoder of its last query.
+
+    :param command: The command, ex. ':U2#:GR#'
+    :type command: str
+    :returns: The decoder, :func:`decode_text` if there is no special decoder
+    :rtype: function
+    """
+    try:
+        return _decoder_cache[command]
+    except KeyError:
+        commands = split_command(command)
+        decode = DECODERS.get(commands[-1], decode_text) if commands else decode_text
+        if len(_decoder_cache) < 4096:
+            _decoder_cache[command] = decode
+        return decode
+
+
+def decode_reply(command, reply):
+    """
+    Decodes the answer of the command.
+
+    :param command: The command, ex. ':GJD#'
+    :type command: str
+    :param reply: The answer of the mount, None if there is no connection
+    :type reply: str
+    :returns: The typed answer or None if there is no answer
+    """
+    if reply is None:
+        return None
+    return decoder(command)(reply)
@@ -0,0 +1,278 @@
+"""
+Access to an ASCOM driver from one thread.
+
+A COM driver, which lives in a single threaded apartment, may only be used by
+the thread which created it. :class:`ComDispatcher` creates the driver in its
+own thread and executes all property reads, property writes and method calls
+for the other threads. The requests are queued as futures; the requests which
+are waiting together are executed as one batch, in which repeated reads of
+the same property are answered with one COM call.
+
+:class:`DriverProxy` is used like the driver itself::
+
+    dispatcher = ComDispatcher(lambda: CreateObject('ASCOM.Simulator.Telescope'))
+    dispatcher.start()
+    mount = DriverProxy(dispatcher)
+    mount.Tracking = True
+    mount.SlewToCoordinatesAsync(12.5, 45.)
+"""
+from threading import Thread, Lock, current_thread
+try:
+    from queue import Queue, Empty
+except ImportError:
+    from Queue import Queue, Empty
+
+from MountTEST.core.mountcom import Command
+
+GET = 0
+SET = 1
+CALL = 2
+RUN = 3
+
+
+class Method:
+    """
+    Marker for the answer of a read, which found a method of the driver.
+    """
+    pass
+
+
+METHOD = Method()
+
+
+def co_initialize():
+    """
+    Initializes COM for the current thread, if comtypes is available.
+    """
+    try:
+        import comtypes
+        comtypes.CoInitialize()
+    except (ImportError, AttributeError, OSError):
+        pass
+
+
+class ComCall(Command):
+    """
+    A request to the driver and its result.
+
+    :param kind: GET, SET, CALL or RUN
+    :type kind: int
+    :param name: Name of the property or method, the function for RUN
+    :type name: str, function
+    :param args: Value of SET, arguments of CALL and RUN
+    :type args: tuple
+    """
+    def __init__(self, kind, name, args=()):
+        Command.__init__(self, 0, name)
+        self.kind = kind
+        self.args = args
+
+
+class ComDispatcher(Thread):
+    """
+    Owner thread of an ASCOM driver.
+
+    :param factory: Function, which creates the driver, it is called in the owner thread
+    :type factory: function
+    :param max_batch: Maximal number of requests, which are executed as one batch
+    :type max_batch: int
+    """
+    def __init__(self, factory, max_batch=64):
+        Thread.__init__(self)
+        self.daemon = True
+        self.factory = factory
+        self.max_batch = max_batch
+        self.driver = None
+        self.error = None
+        self.requests = Queue()
+        self.active = True
+        # guards the queue against the shutdown, no request is queued after the stop marker
+        self.lock = Lock()
+        self.calls = 0
+        self.batches = 0
+        self.merged = 0
+
+    def start(self):
+        """
+        Starts the thread and waits until the driver is created.
+
+        :raises Exception: The error of the factory, if the driver can't be created
+        """
+        ready = ComCall(RUN, None)
+        self.requests.put(ready)
+        Thread.start(self)
+        ready.wait()
+
+    def stop(self, timeout=5.):
+        """
+        Executes the waiting requests and stops the thread.
+        """
+        if self.is_alive():
+            with self.lock:
+                if self.active:
+                    self.active = False
+                    self.requests.put(None)
+            self.join(timeout)
+
+    def run(self):
+        co_initialize()
+        ready = self.requests.get()
+        try:
+            self.driver = self.factory()
+            ready.set_output(None)
+        except Exception as e:
+            self.error = e
+            with self.lock:
+                self.active = False
+            ready.set_error(e)
+            return
+        stop = False
+        while not stop:
+            batch = [self.requests.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.requests.get_nowait())
+                except Empty:
+                    break
+            if None in batch:
+                stop = True
+                batch = [call for call in batch if call is not None]
+            self.__execute__(batch)
+        # a request, which came in during the shutdown, must not wait forever
+        while True:
+            try:
+                call = self.requests.get_nowait()
+            except Empty:
+                break
+            if call is not None:
+                call.set_error(RuntimeError('COM dispatcher is stopped'))
+
+    def __execute__(self, batch):
+        """
+        Executes a batch of requests in their order. The reads between two
+        changes of the driver are only executed once per property.
+        """
+        self.batches += 1
+        reads = {}
+        for call in batch:
+            try:
+                if call.kind == GET:
+                    if call.command in reads:
+                        self.merged += 1
+                        call.set_output(reads[call.command])
+                        continue
+                    value = self.__execute_call__(call)
+                    if callable(value):
+                        value = METHOD
+                    else:
+                        reads[call.command] = value
+                    call.set_output(value)
+                else:
+                    reads.clear()
+                    call.set_output(self.__execute_call__(call))
+            except Exception as e:
+                call.set_error(e)
+
+    def __execute_call__(self, call):
+        self.calls += 1
+        if call.kind == GET:
+            return getattr(self.driver, call.command)
+        elif call.kind == SET:
+            setattr(self.driver, call.command, call.args[0])
+            return None
+        elif call.kind == CALL:
+            return getattr(self.driver, call.command)(*call.args)
+        return call.command(self.driver, *call.args)
+
+    def submit(self, kind, name, *args):
+        """
+        Queues a request. A request of the owner thread itself is executed at once.
+
+        :param kind: GET, SET, CALL or RUN
+        :type kind: int
+        :param name: Name of the property or method, the function for RUN
+        :type name: str, function
+        :returns: The request, which can be waited for
+        :rtype: :class:`ComCall`
+        """
+        call = ComCall(kind, name, args)
+        if current_thread() is self:
+            try:
+                call.set_output(self.__execute_call__(call))
+            except Exception as e:
+                call.set_error(e)
+        else:
+            with self.lock:
+                queued = self.active and self.is_alive()
+                if queued:
+                    self.requests.put(call)
+            if not queued:
+                call.set_error(RuntimeError('COM dispatcher is stopped'))
+        return call
+
+    def get(self, name):
+        """
+        :returns: The value of a property of the driver, METHOD if it is a method
+        """
+        return self.submit(GET, name).wait()
+
+    def set(self, name, value):
+        """
+        Writes a property of the driver.
+        """
+        self.submit(SET, name, value).wait()
+
+    def call(self, name, *args):
+        """
+        :returns: The result of a method of the driver
+        """
+        return self.submit(CALL, name, *args).wait()
+
+    def execute(self, function, *args):
+        """
+        Executes a function with the driver in the owner thread, ex. to read
+        several properties with one request.
+
+        :param function: The function, it gets the driver and the args
+        :type function: function
+        :returns: The result of the function
+        """
+        return self.submit(RUN, function, *args).wait()
+
+    def stats(self):
+        """
+        :returns: Number of COM calls, of batches and of merged reads
+        :rtype: dict
+        """
+        return {'calls': self.calls, 'batches': self.batches, 'merged_reads': self.merged}
+
+
+class DriverProxy:
+    """
+    Stand-in for the driver, which sends every access through the dispatcher.
+
+    :param dispatcher: The dispatcher of the driver
+    :type dispatcher: :class:`ComDispatcher`
+    """
+    def __init__(self, dispatcher):
+        object.__setattr__(self, '_dispatcher', dispatcher)
+        object.__setattr__(self, '_methods', set())
+
+    def __getattr__(self, name):
+        if name in self._methods:
+            return self.__method__(name)
+        value = self._dispatcher.get(name)
+        if value is METHOD:
+            self._methods.add(name)
+            return self.__method__(name)
+        return value
+
+    def __setattr__(self, name, value):
+        self._dispatcher.set(name, value)
+
+    def __method__(self, name):
+        dispatcher = self._dispatcher
+
+        def call(*args):
+            return dispatcher.call(name, *args)
+        return call
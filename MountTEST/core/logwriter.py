@@ -0,0 +1,238 @@
+"""
+Background writer of log files.
+
+The records are handed to a writer thread through a bounded queue, so the
+caller never waits for the disk. The writer keeps the file open and commits
+the records in groups: a group is written with one write call, when it has
+reached its size or when the oldest record waited too long. The file is
+rotated by size and at the change of the date, and the remaining records
+are written when the writer is closed or the interpreter exits.
+
+The records are written as text lines, ``text<TAB>YYYY-MM-DD HH:MM:SS``, or
+in a compact binary format: a little endian double with the time stamp, an
+unsigned short with the length and the UTF-8 encoded text. Binary logs are
+read with :func:`read_binary_log`.
+"""
+import atexit
+import os
+import struct
+import time
+from datetime import datetime, date
+from threading import Thread
+from MountTEST.core.tracing import LOG, ERROR
+try:
+    from queue import Queue, Empty, Full
+except ImportError:
+    from Queue import Queue, Empty, Full
+
+RECORD_HEADER = struct.Struct('<dH')
+MAX_TEXT = 0xffff
+
+
+def encode_text(stamp, text):
+    """
+    :returns: The record as text line
+    :rtype: bytes
+    """
+    line = '{}\t{}\n'.format(text, datetime.fromtimestamp(stamp).strftime("%Y-%m-%d %H:%M:%S"))
+    return line.encode('utf-8')
+
+
+def encode_binary(stamp, text):
+    """
+    :returns: The record in the binary format
+    :rtype: bytes
+    """
+    data = text.encode('utf-8')[:MAX_TEXT]
+    return RECORD_HEADER.pack(stamp, len(data)) + data
+
+
+def read_binary_log(path):
+    """
+    Reads a binary log file.
+
+    :param path: Path to the log file
+    :type path: str
+    :returns: The time stamps and texts of the records
+    :rtype: generator
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    i = 0
+    while i + RECORD_HEADER.size <= len(data):
+        stamp, length = RECORD_HEADER.unpack_from(data, i)
+        i += RECORD_HEADER.size
+        yield stamp, data[i:i + length].decode('utf-8')
+        i += length
+
+
+class LogWriter(Thread):
+    """
+    Thread, which writes the records of a log file.
+
+    :param path: Path to the log file
+    :type path: str
+    :param binary: True for the binary format, False for text lines
+    :type binary: bool
+    :param max_bytes: Size in bytes, at which the file is rotated, 0 for no limit
+    :type max_bytes: int
+    :param daily: True if the file is rotated at the change of the date
+    :type daily: bool
+    :param backups: Number of kept rotated files, path.1 is the latest one
+    :type backups: int
+    :param group_size: Number of records, which are committed together
+    :type group_size: int
+    :param group_time: Maximal time in seconds, which a record waits for its commit
+    :type group_time: float
+    :param queue_size: Maximal number of waiting records, further records are dropped
+    :type queue_size: int
+    :param tracer: The tracer of the failed writes, see :mod:`MountTEST.core.tracing`, None for no tracing
+    :type tracer: :class:`MountTEST.core.tracing.Tracer`
+    """
+    def __init__(self, path, binary=False, max_bytes=10 * 1024 * 1024, daily=True, backups=5,
+                 group_size=64, group_time=1., queue_size=10000, tracer=None):
+        Thread.__init__(self)
+        self.daemon = True
+        self.path = path
+        self.encode = encode_binary if binary else encode_text
+        self.max_bytes = max_bytes
+        self.daily = daily
+        self.backups = backups
+        self.group_size = group_size
+        self.group_time = group_time
+        self.queue = Queue(queue_size)
+        self.file = None
+        self.size = 0
+        self.day = None
+        self.tracer = tracer
+        self.dropped = 0
+        self.lost = 0
+        self.last_error = None
+        self.written = 0
+        self.active = True
+        atexit.register(self.close)
+
+    def write(self, text, stamp=None):
+        """
+        Hands a record to the writer, without waiting for the disk. If the
+        queue is full, the record is dropped and counted in :attr:`dropped`.
+
+        :param text: The text of the record
+        :type text: str
+        :param stamp: Time of the record, None for time.time()
+        :type stamp: float
+        """
+        if stamp is None:
+            stamp = time.time()
+        try:
+            self.queue.put_nowait((stamp, text))
+        except Full:
+            self.dropped += 1
+
+    def close(self, timeout=5.):
+        """
+        Writes the waiting records and closes the file.
+
+        :param timeout: Maximal time in seconds to wait for the writer
+        :type timeout: float
+        """
+        if not self.active:
+            return
+        self.active = False
+        if self.is_alive():
+            # the sentinel must be delivered, even if the queue is full
+            self.queue.put(None)
+            self.join(timeout)
+        else:
+            self.__commit__(self.__drain__([]))
+            self.__close_file__()
+
+    def __open_file__(self):
+        self.file = open(self.path, 'ab')
+        self.size = self.file.tell()
+        self.day = date.fromtimestamp(os.path.getmtime(self.path)) if self.size > 0 else date.today()
+
+    def __close_file__(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __rotate__(self):
+        """
+        Renames the file to path.1 and the older files to path.2 and so on.
+        """
+        self.__close_file__()
+        if self.backups > 0:
+            for i in range(self.backups - 1, 0, -1):
+                older = '{}.{}'.format(self.path, i)
+                if os.path.exists(older):
+                    os.replace(older, '{}.{}'.format(self.path, i + 1))
+            os.replace(self.path, self.path + '.1')
+        else:
+            os.remove(self.path)
+        self.__open_file__()
+
+    def __commit__(self, records):
+        """
+        Writes a group of records with one write call.
+        """
+        if len(records) == 0:
+            return
+        if self.file is None:
+            self.__open_file__()
+        if self.daily and date.fromtimestamp(records[0][0]) != self.day and self.size > 0:
+            self.__rotate__()
+        data = b''.join([self.encode(stamp, text) for stamp, text in records])
+        if 0 < self.max_bytes < self.size + len(data) and self.size > 0:
+            self.__rotate__()
+        self.file.write(data)
+        self.file.flush()
+        self.size += len(data)
+        self.written += len(records)
+
+    def __drain__(self, records):
+        """
+        Moves all waiting records into the group.
+
+        :returns: The group
+        :rtype: list
+        """
+        while True:
+            try:
+                record = self.queue.get_nowait()
+            except Empty:
+                return records
+            if record is not None:
+                records.append(record)
+
+    def run(self):
+        group = []
+        deadline = None
+        stop = False
+        while not stop:
+            timeout = None if deadline is None else max(deadline - time.time(), 0.)
+            try:
+                record = self.queue.get(timeout=timeout)
+                if record is None:
+                    stop = True
+                else:
+                    group.append(record)
+                    if deadline is None:
+                        deadline = time.time() + self.group_time
+            except Empty:
+                pass
+            if stop or len(group) >= self.group_size or (deadline is not None and time.time() >= deadline):
+                if stop:
+                    group = self.__drain__(group)
+                try:
+                    self.__commit__(group)
+                except (IOError, OSError) as e:
+                    # the group is lost, it is counted like the dropped records
+                    self.lost += len(group)
+                    self.last_error = e
+                    if self.tracer is not None:
+                        self.tracer.trace(LOG, ERROR, 'writing {} records to {} failed: {}',
+                                          len(group), self.path, e)
+                group = []
+                deadline = None
+        self.__close_file__()
@@ -0,0 +1,252 @@
+"""
+Planning of the meridian flip.
+
+The time when the mount reaches its meridian limit for tracking follows from
+the local sidereal time, the right ascension of the telescope and the limit,
+so it is computed once after every slew instead of polling ':Gmte#' all the
+time. The information, the flip and the stop are scheduled on a
+:class:`TimerWheel` with exact deadlines; ':Gmte#' is only polled rarely to
+verify the plan.
+"""
+import time
+
+SIDEREAL_RATE = 1.00273790935
+
+PIER_EAST = 'East'
+PIER_WEST = 'West'
+
+# minutes before the tracking limit, at which the actions are executed
+INFO_TIME = 75
+FLIP_TIME = 60
+STOP_TIME = 30
+
+
+class Timer:
+    """
+    A scheduled action of a :class:`TimerWheel`.
+    """
+    def __init__(self, deadline, action, args):
+        self.deadline = deadline
+        self.action = action
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel. The timers are stored in the slot of their deadline,
+    so scheduling and cancelling a timer is O(1) and an advance only looks at
+    the slots which have passed since the last advance.
+
+    :param resolution: Duration of a slot in seconds
+    :type resolution: float
+    :param slots: Number of slots, timers further in the future wait for more turns of the wheel
+    :type slots: int
+    """
+    def __init__(self, resolution=1., slots=512):
+        self.resolution = resolution
+        self.wheel = [[] for i in range(slots)]
+        self.tick = None
+        self.timers = set()
+
+    def schedule(self, deadline, action, *args):
+        """
+        Schedules an action. Deadlines in the past are executed with the next advance.
+
+        :param deadline: Time of the action, like time.time()
+        :type deadline: float
+        :param action: The action
+        :type action: function
+        :returns: The timer, which can be cancelled
+        :rtype: :class:`Timer`
+        """
+        timer = Timer(deadline, action, args)
+        tick = int(deadline // self.resolution)
+        if self.tick is not None:
+            tick = max(tick, self.tick)
+        self.wheel[tick % len(self.wheel)].append(timer)
+        self.timers.add(timer)
+        return timer
+
+    def cancel(self, timer):
+        """
+        Cancels a scheduled action.
+
+        :param timer: The timer of the action
+        :type timer: :class:`Timer`
+        """
+        timer.cancel()
+        self.timers.discard(timer)
+
+    def next_deadline(self):
+        """
+        :returns: The deadline of the next action, None if there is none
+        :rtype: float
+        """
+        if len(self.timers) == 0:
+            return None
+        return min(t.deadline for t in self.timers)
+
+    def advance(self, now=None):
+        """
+        Executes all actions whose deadline has passed, in the order of their deadlines.
+
+        :param now: The current time, None for time.time()
+        :type now: float
+        :returns: Number of executed actions
+        :rtype: int
+        """
+        if now is None:
+            now = time.time()
+        tick = int(now // self.resolution)
+        start = tick - len(self.wheel) + 1
+        if self.tick is not None:
+            start = max(self.tick, start)
+        due = []
+        for t in range(start, tick + 1):
+            slot = self.wheel[t % len(self.wheel)]
+            if len(slot) == 0:
+                continue
+            waiting = []
+            for timer in slot:
+                if timer.cancelled:
+                    continue
+                if timer.deadline <= now:
+                    due.append(timer)
+                else:
+                    waiting.append(timer)
+            self.wheel[t % len(self.wheel)] = waiting
+        # the current slot is checked again, it may contain later deadlines
+        self.tick = tick
+        due.sort(key=lambda x: x.deadline)
+        for timer in due:
+            self.timers.discard(timer)
+            if not timer.cancelled:
+                timer.action(*timer.args)
+        return len(due)
+
+
+def time_to_limit(lst, ra, limit, pier_side):
+    """
+    Computes the time until the mount reaches its meridian limit for tracking.
+
+    :param lst: Local sidereal time in hours
+    :type lst: float
+    :param ra: Right ascension of the telescope in hours
+    :type ra: float
+    :param limit: Meridian limit for tracking in degrees
+    :type limit: float
+    :param pier_side: The pier side, 'East' or 'West' (answer of ':pS#')
+    :type pier_side: str
+    :returns: The time in seconds, None if the telescope doesn't move towards the meridian
+    :rtype: float
+    """
+    if pier_side != PIER_WEST:
+        # the telescope looks west, the next limit is the horizon
+        return None
+    ha = (lst - ra + 12) % 24 - 12
+    return max(limit / 15. - ha, 0) * 3600 / SIDEREAL_RATE
+
+
+class MeridianPlanner:
+    """
+    Schedules the actions before the meridian limit for tracking.
+
+    :param wheel: The timer wheel, on which the actions are scheduled
+    :type wheel: :class:`TimerWheel`
+    :param info: Action 75 minutes before the limit
+    :type info: function
+    :param flip: Action 60 minutes before the limit, or as soon as the flip is allowed
+    :type flip: function
+    :param stop: Action 30 minutes before the limit
+    :type stop: function
+    :param tolerance: Allowed difference in seconds between the plan and ':Gmte#'
+    :type tolerance: float
+    """
+    def __init__(self, wheel, info, flip, stop, tolerance=120.):
+        self.wheel = wheel
+        self.info = info
+        self.flip = flip
+        self.stop = stop
+        self.tolerance = tolerance
+        self.limit_time = None
+        self.timers = []
+
+    def cancel(self):
+        """
+        Cancels the scheduled actions.
+        """
+        for timer in self.timers:
+            self.wheel.cancel(timer)
+        self.timers = []
+        self.limit_time = None
+
+    def plan(self, limit_time, flip_time=None):
+        """
+        Schedules the actions for a new limit.
+
+        :param limit_time: Time when the tracking limit is reached, None if there is no limit
+        :type limit_time: float
+        :param flip_time: Earliest time of the flip, None if the flip is always allowed
+        :type flip_time: float
+        """
+        self.cancel()
+        if limit_time is None:
+            return
+        self.limit_time = limit_time
+        stop_time = limit_time - STOP_TIME * 60
+        flip = limit_time - FLIP_TIME * 60
+        if flip_time is not None:
+            flip = min(max(flip, flip_time), stop_time)
+        self.timers = [self.wheel.schedule(limit_time - INFO_TIME * 60, self.info),
+                       self.wheel.schedule(flip, self.flip),
+                       self.wheel.schedule(stop_time, self.stop)]
+
+    def plan_position(self, lst, ra, tracking_limit, slew_limit, pier_side, now=None):
+        """
+        Schedules the actions for the current position of the telescope.
+
+        :param lst: Local sidereal time in hours
+        :type lst: float
+        :param ra: Right ascension of the telescope in hours
+        :type ra: float
+        :param tracking_limit: Meridian limit for tracking in degrees
+        :type tracking_limit: float
+        :param slew_limit: Meridian limit for slews in degrees, a flip is possible after it
+        :type slew_limit: float
+        :param pier_side: The pier side, 'East' or 'West'
+        :type pier_side: str
+        :param now: Time of the sidereal time, None for time.time()
+        :type now: float
+        """
+        if now is None:
+            now = time.time()
+        limit = time_to_limit(lst, ra, tracking_limit, pier_side)
+        if limit is None:
+            self.plan(None)
+            return
+        flip = time_to_limit(lst, ra, slew_limit, pier_side)
+        self.plan(now + limit, now + flip)
+
+    def verify(self, minutes, now=None):
+        """
+        Compares the plan with the estimated tracking time of the mount. If they
+        differ, the mount is right and the actions are planned from its value.
+
+        :param minutes: Estimated tracking time of the mount (answer of ':Gmte#') in minutes
+        :type minutes: int
+        :param now: Time of the answer, None for time.time()
+        :type now: float
+        :returns: True if the plan was changed, else False
+        :rtype: bool
+        """
+        if now is None:
+            now = time.time()
+        limit_time = now + minutes * 60
+        if self.limit_time is not None and abs(self.limit_time - limit_time) <= self.tolerance:
+            return False
+        self.plan(limit_time)
+        return True
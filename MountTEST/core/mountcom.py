@@ -4,22 +4,200 @@ Created on Mon Feb 15 20:49:32 2016
 
 @author: Patrick Rauer
 """
-from threading import Thread
+from threading import Thread, Event, Lock
+from MountTEST.core.channel import Channel, POLL, COMMAND, PRIORITY, is_priority
+from MountTEST.core.supervisor import ConnectionSupervisor, HEARTBEAT_COMMAND
+from MountTEST.core.decoders import decoder, decode_float, decode_int, decode_sexagesimal, decode_text
+from MountTEST.core.meridian import MeridianPlanner, TimerWheel
+from MountTEST.core.response_cache import ResponseCache
+from MountTEST.core.scheduler import PollScheduler
+from MountTEST.core.state import create_state
+from MountTEST.core.tracing import Tracer, COM, DEBUG, ERROR
+from MountTEST.coordinates import signed_components
+try:
+    from queue import Queue, Empty
+except ImportError:
+    from Queue import Queue, Empty
+import socket
 import time
 
+MOUNT_ADDRESS = ('194.94.209.214', 3490)
+# seconds after a meridian flip, when the new tracking time is verified
+FLIP_VERIFY_TIME = 120.
+# number of timeouts in a row, after which the poll connection is taken as dead
+MAX_TIMEOUTS = 3
+# seconds, which a caller waits at most for the answer of a command
+COMMAND_TIMEOUT = 60.
+SLEWING_STATUS = '6#'
+# seconds, within which the mount must report a slew, a slew which isn't
+# reported in this time was already finished before the first poll
+SLEW_START_TIME = 2.
+
 
 class Command:
-    def __init__(self, id_number, command, output):
+    """
+    A command for the mount and its result. Commands which are submitted to
+    the poll thread are finished by it and the caller can wait for the
+    output with :meth:`wait`.
+
+    :param id_number: ID of the command
+    :type id_number: int
+    :param command: The command for the mount
+    :type command: str
+    :param output: The output of the mount, if it is already known
+    :type output: str
+    :param decoder: Decoder of the output, see :mod:`MountTEST.core.decoders`, None for the raw output
+    :type decoder: function
+    """
+    def __init__(self, id_number, command, output=None, decoder=None):
         self.ID = id_number
         self.command = command
         self.output = output
+        self.decoder = decoder
+        self.error = None
         self.time = time.time()
+        self.finished = Event()
+        # generation of the response cache at the submission, see :meth:`MountCom.submit_command`
+        self.generation = None
+
+    def set_output(self, output):
+        """
+        Sets the output of the mount and wakes up all waiting callers.
+
+        :param output: The output of the mount
+        :type output: str
+        """
+        self.output = output
+        self.finished.set()
+
+    def set_error(self, error):
+        """
+        Finishes the command with an error, which will be raised in the
+        waiting callers.
+
+        :param error: The error which occurred during the execution
+        :type error: Exception
+        """
+        self.error = error
+        self.finished.set()
+
+    def done(self):
+        """
+        :returns: True if the mount has answered, else False
+        :rtype: bool
+        """
+        return self.finished.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Waits until the command is executed and returns the output of the mount.
+
+        :param timeout: Maximal time to wait in seconds, None to wait without a limit
+        :type timeout: float
+        :returns: The output of the mount or None if there is no output (yet)
+        :rtype: str
+        """
+        self.finished.wait(timeout)
+        if self.error is not None:
+            raise self.error
+        return self.output
 
     def __str__(self):
         try:
             return str(self.ID)+' '+self.command+' '+self.output
         except TypeError:
-            return str(self.ID)+' '+self.command
+            return str(self.ID)+' '+str(self.command)
+
+
+class SlewHandle(Command):
+    """
+    A running slew. It is finished by the poll thread, as soon as the polled
+    status of the mount isn't slewing anymore, so any number of callers can
+    wait for the end of the slew without sending a command. The output is
+    the answer of the slew command, ex. '0' if the slew was successful.
+
+    :param id_number: ID of the slew
+    :type id_number: int
+    :param command: The command or method, which started the slew
+    :type command: str
+    :param answer: The answer of the slew command
+    :type answer: str
+    :param start_time: Seconds, within which the mount must report the slew
+    :type start_time: float
+    :param executor: Function, which calls its first argument with the other arguments
+        in another thread, None to run the callbacks in the thread which finishes the slew
+    :type executor: function
+    :param on_error: Function, which gets the handle and the error of a failed callback
+    :type on_error: function
+    """
+    def __init__(self, id_number, command, answer='0', start_time=SLEW_START_TIME, executor=None,
+                 on_error=None):
+        Command.__init__(self, id_number, command)
+        self.answer = answer
+        self.started = False
+        self.start_deadline = self.time + start_time
+        self.executor = executor
+        self.on_error = on_error
+        self.callbacks = []
+        self.callback_errors = []
+        self.lock = Lock()
+
+    def add_done_callback(self, callback):
+        """
+        Adds a function, which is called with the handle when the slew is
+        finished. If the slew is already finished, it is called at once.
+
+        :param callback: The function
+        :type callback: function
+        """
+        with self.lock:
+            if not self.done():
+                self.callbacks.append(callback)
+                return
+        callback(self)
+
+    def set_output(self, output):
+        Command.set_output(self, output)
+        self.__run_callbacks__()
+
+    def set_error(self, error):
+        Command.set_error(self, error)
+        self.__run_callbacks__()
+
+    def __run_callbacks__(self):
+        with self.lock:
+            callbacks = self.callbacks
+            self.callbacks = []
+        for callback in callbacks:
+            if self.executor is not None:
+                self.executor(self.__call_back__, callback)
+            else:
+                self.__call_back__(callback)
+
+    def __call_back__(self, callback):
+        # a failing callback must not stop its thread or the other callbacks
+        try:
+            callback(self)
+        except Exception as e:
+            self.callback_errors.append(e)
+            if self.on_error is not None:
+                self.on_error(self, e)
+
+    def update(self, status, now):
+        """
+        Compares the slew with the polled status of the mount.
+
+        :param status: The status of the mount, ex. '6#' while slewing
+        :type status: str
+        :param now: The time of the poll
+        :type now: float
+        :returns: True if the slew is finished, else False
+        :rtype: bool
+        """
+        if status == SLEWING_STATUS:
+            self.started = True
+            return False
+        return self.started or now >= self.start_deadline
 
 
 class MountCom(Thread):
@@ -28,14 +206,45 @@ class MountCom(Thread):
     
     :param debug: Debug-object to collect debug information
     :type debug: :class:`debug.Debug`
+    :param address: Address and port of the mount, ex. of a :class:`MountTEST.simulator.MountSimulator`,
+        the name of a serial port or a function which creates a transport, see
+        :func:`MountTEST.core.transport.open_transport`
+    :type address: tuple, str, function
     """
-    def __init__(self, debug=None):
+    # the fields which are updated by the poll thread and the queries of the
+    # fields, the answers are handed to the apply-method of the field
+    poll_fields = (('target_pos', (':U1#:Gr#', ':U2#:Gd#')),
+                   ('telescope_pos', (':U1#:GR#', ':U2#:GD#')),
+                   ('mount_status', (':Gstat#',)),
+                   ('dome_pos', (':GDA#',)),
+                   ('shutter_status', (':GDS#',)),
+                   ('tracking_time', (':Gmte#',)))
+
+    # subsystem of the debug messages, see :mod:`MountTEST.core.tracing`
+    trace_subsystem = COM
+
+    def __init__(self, debug=None, address=MOUNT_ADDRESS):
         """
         """
         Thread.__init__(self)
         
         self.debug = debug
+        self.tracer = Tracer(debug)
         self.add_debug('Mount_Com ini')
+        self.mount_address = address
+        self.client = None
+        self.reader = None
+        self.ok = False
+        self.poll_channel = None
+        self.timeouts = 0
+        self.channels = {}
+        self.supervisor = ConnectionSupervisor(self)
+        self.responses = ResponseCache()
+        self.slews = []
+        self.slew_lock = Lock()
+        self.callback_queue = Queue()
+        self.callback_thread = None
+        self.last_send = time.time()
         self.target_ra = '00:00:00.0'
         self.target_dec = '+00:00:00.0'
         self.telescope_ra = '00:00:00.0'
@@ -55,30 +264,103 @@ class MountCom(Thread):
         self.information_flip = False
         self.tracking_status = 0
         self.tracking_time = '100#'
-        self.command_outside_wait = False
-        self.interrupted_run = False
+        self.command_queue = Queue()
+        # guards the command queue against the shutdown of the poll thread
+        self.queue_lock = Lock()
+        self.stopped = False
+        self.poll_scheduler = PollScheduler()
+        self.timer_wheel = TimerWheel()
+        self.meridian = MeridianPlanner(self.timer_wheel, self.meridian_info, self.meridian_flip,
+                                        self.meridian_stop)
+        self.meridian_ra = None
+        self.state = create_state(self, 0, time.time(), {})
 
-    def add_debug(self, text):
+    def add_debug(self, text, *args):
         """
-        Adds the text to the debug-file.
+        Adds the text to the debug-file. The text is only formatted with the
+        arguments, if the tracing of the subsystem is enabled.
         
-        :param text: the text
+        :param text: the text or a template like 'mount set_ra {}:{}:{}'
         :type text: str
         """
-        try:
-            if self.debug is not None:
-                self.debug.add(text)
-        except AttributeError:
-            pass
+        self.tracer.trace(self.trace_subsystem, DEBUG, text, *args)
 
-    def outside_command(self):
-        
-        #   proof of the command from outside and sending the command to the mount
-        #   and put the output into the output queue
-        while self.command_outside_wait:
-            self.interrupted_run = True
-            time.sleep(self.time_dif)
-        self.interrupted_run = False
+    def add_error(self, text, *args):
+        """
+        Adds an error to the debug-file, see :meth:`add_debug`.
+        """
+        self.tracer.trace(self.trace_subsystem, ERROR, text, *args)
+
+    def set_trace_level(self, level, subsystem=None):
+        """
+        Sets the lowest traced level, see :mod:`MountTEST.core.tracing`.
+
+        :param level: The level, DEBUG, INFO, ERROR or OFF
+        :type level: int
+        :param subsystem: The subsystem, ex. 'com' or 'mount', None for all subsystems
+        :type subsystem: str
+        """
+        self.tracer.set_level(level, subsystem)
+
+    def dump_trace(self, last=None):
+        """
+        :param last: Number of the latest events, None for all recorded events
+        :type last: int
+        :returns: The recently traced events, the oldest first
+        :rtype: list
+        """
+        return self.tracer.dump(last)
+
+    def outside_command(self, timeout=0):
+        """
+        Executes the commands from outside which are waiting in the command queue.
+        If timeout is larger than zero, it will wait up to timeout seconds for
+        new commands and execute them immediately, so the waiting time between
+        two updates can be used for the commands.
+
+        :param timeout: Time in seconds to wait for new commands
+        :type timeout: float
+        """
+        end = time.time() + timeout
+        while True:
+            remaining = end - time.time()
+            try:
+                if remaining > 0:
+                    command = self.command_queue.get(timeout=remaining)
+                else:
+                    command = self.command_queue.get_nowait()
+            except Empty:
+                return
+            self.execute_command(command)
+
+    def execute_command(self, command, channel=None):
+        """
+        Sends a queued command to the mount and finishes it with the output.
+
+        :param command: The queued command
+        :type command: :class:`Command`
+        :param channel: The connection for the command, None for the poll connection
+        :type channel: :class:`MountTEST.core.channel.Channel`
+        """
+        generation = command.generation
+        if generation is None:
+            generation = self.responses.generation
+        try:
+            if isinstance(command.command, list):
+                output = self.send_commands_to_mount(command.command, channel)
+            elif command.decoder is not None:
+                output = self.send_query_to_mount(command.command, command.decoder, channel)
+            else:
+                output = self.send_command_to_mount(command.command, channel)
+        except Exception as e:
+            output = None
+            command.set_error(e)
+        # a query, which was answered before the set command reached the mount,
+        # must not stay in the cache
+        self.responses.invalidate_command(command.command)
+        if command.error is None:
+            self.responses.store(command.command, command.decoder, output, generation)
+            command.set_output(output)
 
     def run(self):
         """
@@ -86,76 +368,313 @@ class MountCom(Thread):
         Interacting with the mount directly
         """
         self.add_debug('start run-method in Mount_Com')
-        while self.active:
+        names = [name for name, queries in self.poll_fields]
+        try:
+            while self.active:
+                try:
+                    self.__poll_cycle__(names)
+                except Exception as e:
+                    # a failed cycle (ex. a COM error of an action) must not stop the thread
+                    self.add_error('poll cycle failed: {!r}', e)
+                    self.outside_command(self.time_dif)
+            # finish the commands which came in during the shutdown
+            self.outside_command()
+        finally:
+            with self.queue_lock:
+                # no command can be queued after this point
+                self.stopped = True
+                self.active = False
+            error = RuntimeError('poll thread is stopped')
+            self.fail_commands(error)
+            self.cancel_slews(error)
+
+    def __poll_cycle__(self, names):
+        """
+        Polls the due fields, executes the due actions and serves the commands
+        until the next field is due.
+        """
+        now = time.time()
+        due = self.poll_scheduler.due(names, now)
+        if len(due) > 0:
+            self.refresh_state(due)
+            self.poll_scheduler.polled(due, now)
+            self.poll_scheduler.set_state(self.status, self.has_dome())
+            self.outside_command()
+        if 'telescope_pos' in due or 'mount_status' in due:
+            self.update_meridian_plan()
+        if 'tracking_time' in due:
+            self.save_mount()
+        self.timer_wheel.advance()
+        # serve the commands until the next field must be polled or the next action is due
+        next_time = self.poll_scheduler.next_due(names)
+        next_action = self.timer_wheel.next_deadline()
+        if next_action is not None:
+            next_time = min(next_time, next_action)
+        self.outside_command(max(next_time - time.time(), self.time_dif))
+
+    def fail_commands(self, error):
+        """
+        Finishes all commands in the command queue with an error.
+
+        :param error: The error, which is raised in the waiting callers
+        :type error: Exception
+        """
+        while True:
             try:
-                # print self.active
-                # self.outside_command()
-                self.update_target_pos()
-                # time.sleep(0.1)
-                self.outside_command()
-                self.update_telescope_pos()
-                time.sleep(self.time_dif)
-                self.outside_command()
-                self.update_mount_status()
-                time.sleep(self.time_dif)
-                self.update_dome_pos()
-                time.sleep(self.time_dif)
-                self.update_shutter_status()
-                time.sleep(self.time_dif)
-                self.update_tracking_time()
-                time.sleep(self.time_dif)
-                # print self
-                self.save_mount()
-                time.sleep(self.time_dif)
-            except ValueError:
-                pass
+                command = self.command_queue.get_nowait()
+            except Empty:
+                return
+            command.set_error(error)
+
+    def refresh_state(self, names=None):
+        """
+        Updates the state of the mount. The queries of all fields in :attr:`poll_fields`
+        are sent with one write to the mount, so a full refresh needs only one round trip.
+        Fields without queries are updated by their update-method.
+
+        :param names: Names of the fields which should be updated, None for all fields
+        :type names: list
+        """
+        commands = []
+        fields = []
+        field_times = dict(self.state.field_times)
+        for name, queries in self.poll_fields:
+            if names is not None and name not in names:
+                continue
+            if len(queries) == 0:
+                getattr(self, 'update_' + name)()
+                field_times[name] = time.time()
+            else:
+                fields.append((name, len(queries)))
+                commands.extend(queries)
+        if len(commands) > 0:
+            replies = self.send_commands_to_mount(commands)
+            now = time.time()
+            i = 0
+            for name, n in fields:
+                getattr(self, 'apply_' + name)(*replies[i:i + n])
+                field_times[name] = now
+                i += n
+        self.publish_state(field_times)
+
+    def publish_state(self, field_times=None):
+        """
+        Publishes the current values as a new :class:`MountTEST.core.state.MountState`.
+        The snapshot is swapped in with one assignment, so readers get all values
+        of the same poll cycle without a lock.
+
+        :param field_times: Acquisition times of the polled fields, None to keep the previous times
+        :type field_times: dict
+        :returns: The new snapshot
+        :rtype: :class:`MountTEST.core.state.MountState`
+        """
+        if field_times is None:
+            field_times = self.state.field_times
+        state = create_state(self, self.state.sequence + 1, time.time(), field_times)
+        self.state = state
+        self.signal_slews(state.time)
+        return state
+
+    def track_slew(self, command, answer='0'):
+        """
+        Returns a handle of a slew, which was just started. The handle is
+        finished by the poll thread, when the mount doesn't slew anymore.
+
+        :param command: The command or method, which started the slew
+        :type command: str
+        :param answer: The answer of the slew command, a failed slew is finished at once
+        :type answer: str
+        :rtype: :class:`SlewHandle`
+        """
+        self.current_id += 1
+        handle = SlewHandle(self.current_id, command, answer, executor=self.run_callback,
+                            on_error=self.__callback_failed__)
+        if answer != '0':
+            handle.set_output(answer)
+            return handle
+        with self.slew_lock:
+            self.slews.append(handle)
+        return handle
+
+    def signal_slews(self, now):
+        """
+        Finishes the slews, which are finished according to the current status.
+
+        :param now: The time of the poll
+        :type now: float
+        """
+        if len(self.slews) == 0:
+            return
+        with self.slew_lock:
+            finished = [handle for handle in self.slews if handle.update(self.status, now)]
+            self.slews = [handle for handle in self.slews if handle not in finished]
+        # the callbacks run in the callback thread, they may start the next slew
+        for handle in finished:
+            self.add_debug('slew {} finished', handle.command)
+            handle.set_output(handle.answer)
+
+    def run_callback(self, function, *args):
+        """
+        Calls the function in the callback thread, so a slow callback (ex. the
+        dome lights on the serial port) doesn't delay the polling.
+
+        :param function: The function
+        :type function: function
+        """
+        if self.callback_thread is None or not self.callback_thread.is_alive():
+            self.callback_thread = Thread(target=self.__callback_loop__)
+            self.callback_thread.daemon = True
+            self.callback_thread.start()
+        self.callback_queue.put((function, args))
+
+    def __callback_loop__(self):
+        while True:
+            function, args = self.callback_queue.get()
+            try:
+                function(*args)
+            except Exception as e:
+                self.add_error('callback {} failed: {!r}', function, e)
+
+    def __callback_failed__(self, handle, error):
+        self.add_error('callback of slew {} failed: {!r}', handle.command, error)
+
+    def cancel_slews(self, error):
+        """
+        Finishes all waiting slews with an error.
+
+        :param error: The error, which is raised in the waiting callers
+        :type error: Exception
+        """
+        with self.slew_lock:
+            slews = self.slews
+            self.slews = []
+        for handle in slews:
+            handle.set_error(error)
+
+    def get_state(self):
+        """
+        Returns the latest snapshot of the state of the mount. The snapshot doesn't
+        change, compare its sequence number to find out if there is a newer one.
+
+        :rtype: :class:`MountTEST.core.state.MountState`
+        """
+        return self.state
+
+    def has_dome(self):
+        """
+        :returns: True if the mount reports a dome, else False
+        :rtype: bool
+        """
+        # the mount reports the dome azimuth 9999 if there is no dome
+        return self.dome_pos != 9999/10
 
     def save_mount(self):
         """
-        Checks if the mount can track without problems
+        Checks if the mount can track without problems. The estimated tracking time
+        of the mount verifies the plan of the meridian flip, if they differ the
+        actions are planned from the estimation of the mount.
         """
+        if self.status != '0#':
+            return
         estimated_time = self.get_estimate_tracking_time()
         if estimated_time is not None:
-            estimated_time = estimated_time.split('#')[0]
-            estimated_time = int(estimated_time)
-            # If the mount can only 60 minutes more
-            if estimated_time < 60:
-                flip = self.flip_mount()
-                # If the flip wasn't successful
-                if flip == 0:
-                    self.warning = 'Warning: telescope can be damaged in max. ' + str(estimated_time) + ' minutes'
-                    self.warning_read = False
-                else:
-                    self.information_flip = False
-                # If the mount can only track 30 minutes more, stop tracking
-                if estimated_time < 30:
-                    self.stop()
-                    self.warning = 'Telescope stops'
-                    self.warning_read = False
-                    self.information_flip = False
-            elif estimated_time <= 75 and not self.information_flip:
-                self.information = 'telescope will flip in 15 min'
-                self.information_read = False
-                self.information_flip = True
+            self.meridian.verify(decode_int(estimated_time))
+
+    def telescope_ra_hours(self):
+        """
+        :returns: The right ascension of the telescope in hours, None if it is unknown
+        :rtype: float
+        """
+        try:
+            return decode_sexagesimal(self.telescope_ra)
+        except (TypeError, ValueError):
+            return None
+
+    def telescope_dec_degrees(self):
+        """
+        :returns: The declination of the telescope in degrees, None if it is unknown
+        :rtype: float
+        """
+        try:
+            return decode_sexagesimal(self.telescope_dec)
+        except (TypeError, ValueError):
+            return None
+
+    def update_meridian_plan(self):
+        """
+        Plans the meridian flip from the local sidereal time, the right ascension of
+        the telescope and the meridian limits. The mount is only asked, if the
+        telescope has moved, ex. after a slew.
+        """
+        if self.status != '0#':
+            self.meridian.cancel()
+            self.meridian_ra = None
+            return
+        ra = self.telescope_ra_hours()
+        if ra is None:
+            return
+        if self.meridian_ra is not None and abs((ra - self.meridian_ra + 12) % 24 - 12) < 1 / 60.:
+            return
+        lst, tracking_limit, slew_limit, pier_side = self.send_commands_to_mount(
+            [':U2#:GS#', ':Glmt#', ':Glms#', ':pS#'])
+        if None in (lst, tracking_limit, slew_limit, pier_side):
+            return
+        self.meridian_ra = ra
+        self.meridian.plan_position(decode_sexagesimal(lst), ra, decode_float(tracking_limit),
+                                    decode_float(slew_limit), decode_text(pier_side))
+
+    def meridian_info(self):
+        """
+        Informs that the mount will flip soon.
+        """
+        if not self.information_flip:
+            self.information = 'telescope will flip in 15 min'
+            self.information_read = False
+            self.information_flip = True
+
+    def meridian_flip(self):
+        """
+        Flips the mount before it reaches the meridian limit.
+        """
+        flip = self.flip_mount()
+        # If the flip wasn't successful
+        if flip == 0:
+            minutes = int((self.meridian.limit_time - time.time()) / 60)
+            self.warning = 'Warning: telescope can be damaged in max. ' + str(minutes) + ' minutes'
+            self.warning_read = False
+        else:
+            self.information_flip = False
+            # the right ascension doesn't change with the flip, so the mount
+            # verifies the new plan after the flip
+            self.meridian.cancel()
+            self.poll_scheduler.poll_at('tracking_time', time.time() + FLIP_VERIFY_TIME)
+
+    def meridian_stop(self):
+        """
+        Stops tracking, because the mount reaches the meridian limit.
+        """
+        self.stop()
+        self.warning = 'Telescope stops'
+        self.warning_read = False
+        self.information_flip = False
 
     def flip_mount(self):
         """
         Flips the mount
         """
-        ra = self.telescope_ra.split('#')[0]
-        dec = self.telescope_dec.split('#')[0]
-        ra = ra.split(':')
-        dec = dec.split(':')
-        try:
-            self.slew_ra_dec(int(ra[0]), int(ra[1]), float(ra[2]),
-                             int(dec[0]), int(dec[1]), float(dec[2]))
-        except IndexError:
-            pass
+        ra = self.telescope_ra_hours()
+        dec = self.telescope_dec_degrees()
+        if ra is not None and dec is not None:
+            ra_hour, ra_min, ra_sec = signed_components(ra)
+            dec_deg, dec_min, dec_sec = signed_components(dec)
+            self.slew_ra_dec(int(ra_hour), int(ra_min), float(ra_sec),
+                             int(dec_deg), int(dec_min), float(dec_sec))
         return -1
 
     def slew_ra_dec(self, ra_hour, ra_min, ra_sec, dec_deg, dec_min, dec_sec):
         """
-        Slew to coordinates. This method is empty an must overwrite.
+        Slew to coordinates. This method is empty an must overwrite, it should
+        return the :class:`SlewHandle` of :meth:`track_slew`.
         
         :param ra_hour: hourangle
         :type ra_hour: int
@@ -176,7 +695,45 @@ class MountCom(Thread):
         return -1
 
     def get_estimate_tracking_time(self):
-        return ''
+        return self.state.tracking_time
+
+    def submit_command(self, command, decoder=None):
+        """
+        Sends the command with its own connection, if :meth:`open_channels` has opened
+        one, so it doesn't wait for the polling. Stop commands use the priority
+        connection. Without an own connection, the command is put into the command
+        queue of the poll thread, which will send it between two update steps. If
+        the poll thread isn't running, the command will be sent directly.
+
+        :param command: The command or a list of commands, which are sent with one write
+        :type command: str, list
+        :param decoder: Decoder of the output of a single command, None for the raw output
+        :type decoder: function
+
+        :return: The queued command, use :meth:`Command.wait` to get the output
+        :rtype: :class:`Command`
+        """
+        self.current_id += 1
+        queued = Command(self.current_id, command, decoder=decoder)
+        # answers of rarely changing queries come from the cache, see :mod:`MountTEST.core.response_cache`
+        found, output = self.responses.get(command, decoder)
+        if found:
+            queued.set_output(output)
+            return queued
+        # the answer is only cached, if no set command was submitted after this query
+        queued.generation = self.responses.generation
+        self.responses.invalidate_command(command)
+        channel = self.channel_for(command)
+        if channel is not None:
+            self.execute_command(queued, channel)
+        else:
+            with self.queue_lock:
+                queue = self.is_alive() and self.active and not self.stopped
+                if queue:
+                    self.command_queue.put(queued)
+            if not queue:
+                self.execute_command(queued)
+        return queued
 
     def set_command(self, command):
         """
@@ -186,25 +743,56 @@ class MountCom(Thread):
         :param command: The command
         :type command: str
         
-        :return: The return value from the mount if the mount gives something back else None
-        """
-        self.command_outside_wait = True
-        time.sleep(0.1)
-        while not self.interrupted_run:
-            time.sleep(0.1)
-        output = self.send_command_to_mount(command)
-        time.sleep(0.1)
-        self.command_outside_wait = False
-        return output
+        :return: The return value from the mount if the mount gives something back, None if
+            there is no answer within COMMAND_TIMEOUT seconds
+        """
+        return self.submit_command(command).wait(COMMAND_TIMEOUT)
+
+    def set_commands(self, commands):
+        """
+        Sends several commands with one write to the mount and waits until the mount
+        has answered all of them.
+
+        :param commands: The commands
+        :type commands: list
+
+        :return: The return values of the single commands, None for every command without an answer in time
+        :rtype: list
+        """
+        commands = list(commands)
+        replies = self.submit_command(commands).wait(COMMAND_TIMEOUT)
+        if replies is None:
+            return [None] * len(commands)
+        return replies
+
+    def set_query(self, command):
+        """
+        Sends a query to the mount and waits for the decoded answer, ex. a float
+        for ':GJD#' or a :class:`MountTEST.core.decoders.MountStatus` for ':Gstat#'.
+
+        :param command: The query
+        :type command: str
+
+        :return: The decoded answer, None if there is no connection
+        """
+        return self.submit_command(command, decoder(command)).wait(COMMAND_TIMEOUT)
     
     def update_shutter_status(self):
         """
         Updates the shutter position if there is a connection to the mount.
         If not it will set the default value 1 which implies that the shutter is closed.
         """
-        shutter_status = self.send_command_to_mount(':GDS#')
+        self.apply_shutter_status(self.send_command_to_mount(':GDS#'))
+
+    def apply_shutter_status(self, shutter_status):
+        """
+        Sets the shutter status from the answer of the mount.
+
+        :param shutter_status: The answer of ':GDS#' or None if there is no connection
+        :type shutter_status: str
+        """
         if shutter_status is not None:
-            self.shutter_status = int(shutter_status.split('#')[0])
+            self.shutter_status = decode_int(shutter_status)
         else:
             self.shutter_status = 1
 #        self.shutter_status = 2
@@ -254,8 +842,20 @@ class MountCom(Thread):
         Updates the target position which is stored in the mount if there is a connection to the mount.
         If not it will set the default values to the target positions.
         """
-        self.target_ra = self.send_command_to_mount(':U1#:Gr#')
-        self.target_dec = self.send_command_to_mount(':U2#:Gd#')
+        self.apply_target_pos(self.send_command_to_mount(':U1#:Gr#'),
+                              self.send_command_to_mount(':U2#:Gd#'))
+
+    def apply_target_pos(self, ra, dec):
+        """
+        Sets the target position from the answers of the mount.
+
+        :param ra: The answer of ':Gr#' or None if there is no connection
+        :type ra: str
+        :param dec: The answer of ':Gd#' or None if there is no connection
+        :type dec: str
+        """
+        self.target_ra = ra
+        self.target_dec = dec
         if self.target_ra is None:
             self.target_ra = '00:00:00.0'
         if self.target_dec is None:
@@ -266,8 +866,20 @@ class MountCom(Thread):
         Updates the telescope position if there is a connection to the mount.
         If not then it will set the default values to the telescope position.
         """
-        self.telescope_ra = self.send_command_to_mount(':U1#:GR#')
-        self.telescope_dec = self.send_command_to_mount(':U2#:GD#')
+        self.apply_telescope_pos(self.send_command_to_mount(':U1#:GR#'),
+                                 self.send_command_to_mount(':U2#:GD#'))
+
+    def apply_telescope_pos(self, ra, dec):
+        """
+        Sets the telescope position from the answers of the mount.
+
+        :param ra: The answer of ':GR#' or None if there is no connection
+        :type ra: str
+        :param dec: The answer of ':GD#' or None if there is no connection
+        :type dec: str
+        """
+        self.telescope_ra = ra
+        self.telescope_dec = dec
         if self.telescope_ra is None:
             self.telescope_ra = '00:00:00.0'
         if self.telescope_dec is None:
@@ -278,14 +890,19 @@ class MountCom(Thread):
         Updates the dome position if there is a connection to the mount.
         If not it will set the default values to the dome position.
         """
-        dome_pos = self.send_command_to_mount(':GDA#')
-        if dome_pos is not None:
-            dome_pos = dome_pos.split('#')[0]
-            if dome_pos != '':
-                dome_pos = float(dome_pos)
-            else:
-                dome_pos = 9999
-        else:
+        self.apply_dome_pos(self.send_command_to_mount(':GDA#'))
+
+    def apply_dome_pos(self, dome_pos):
+        """
+        Sets the dome position from the answer of the mount.
+
+        :param dome_pos: The answer of ':GDA#' or None if there is no connection
+        :type dome_pos: str
+        """
+        try:
+            dome_pos = decode_float(dome_pos)
+        except (TypeError, ValueError):
+            # no connection or an empty answer
             dome_pos = 9999
         self.dome_pos = dome_pos/10
 
@@ -294,7 +911,16 @@ class MountCom(Thread):
         Updates the mount status if there is a connection to the mount.
         If not it will set the default value '-1' which means that there is no connection.
         """
-        self.status = self.send_command_to_mount(':Gstat#')
+        self.apply_mount_status(self.send_command_to_mount(':Gstat#'))
+
+    def apply_mount_status(self, status):
+        """
+        Sets the mount status from the answer of the mount.
+
+        :param status: The answer of ':Gstat#' or None if there is no connection
+        :type status: str
+        """
+        self.status = status
         if self.status is None:
             self.status = '-1'
 
@@ -305,10 +931,7 @@ class MountCom(Thread):
         """
         status = self.send_command_to_mount(':GTRK#')
         if status is not None:
-            try:
-                self.tracking_status = int(status)
-            except ValueError:
-                self.tracking_status = int(status.split('#')[0])
+            self.tracking_status = decode_int(status)
         else:
             self.tracking_status = 0
 
@@ -317,22 +940,288 @@ class MountCom(Thread):
         Updates time to the meridian. If there is no connection the mount if 
         will set the tracking time to 100.
         """
-        tracking_time = self.send_command_to_mount(':Gmte#')
+        self.apply_tracking_time(self.send_command_to_mount(':Gmte#'))
+
+    def apply_tracking_time(self, tracking_time):
+        """
+        Sets the time to the meridian from the answer of the mount.
+
+        :param tracking_time: The answer of ':Gmte#' or None if there is no connection
+        :type tracking_time: str
+        """
         if tracking_time is not None:
             self.tracking_time = tracking_time
         else:
             self.tracking_time = '100#'
 
-    def send_command_to_mount(self, command):
+    def open_connection(self, timeout=3):
+        """
+        Opens the TCP/IP connection to the mount at :attr:`mount_address`.
+
+        :param timeout: Timeout of the connection in seconds
+        :type timeout: float
+        :returns: True if there is a connection now, else False
+        :rtype: bool
+        """
+        channel = Channel(POLL, self.mount_address, timeout)
+        if channel.open():
+            self.__use_poll_channel__(channel)
+        else:
+            self.ok = False
+            self.supervisor.report(channel.last_error)
+        return self.ok
+
+    def __use_poll_channel__(self, channel):
+        """
+        Uses the opened connection for the polling.
+        """
+        self.poll_channel = channel
+        self.client = channel.client
+        self.reader = channel.reader
+        self.timeouts = 0
+        # the mount may have been restarted, the answers of the last session are invalid
+        self.responses.new_session()
+        self.ok = True
+
+    def open_channels(self, roles=(COMMAND, PRIORITY)):
+        """
+        Opens additional connections to the mount for the commands, so the commands
+        don't share the connection of the polling.
+
+        :param roles: Roles of the connections, 'command' and/or 'priority'
+        :type roles: tuple
+        :returns: The roles of the opened connections
+        :rtype: list
+        """
+        if isinstance(self.mount_address, str):
+            # a serial port has only one connection
+            return []
+        for role in roles:
+            channel = Channel(role, self.mount_address)
+            # a connection which can't be opened now, is opened by the supervisor later
+            if channel.open():
+                self.setup_session(channel)
+            self.channels[role] = channel
+        return [role for role in roles if self.channels[role].ok]
+
+    def close_channels(self):
+        """
+        Closes the additional connections.
+        """
+        for channel in self.channels.values():
+            channel.close()
+        self.channels = {}
+
+    def channel_for(self, command):
+        """
+        Returns the connection for the command.
+
+        :param command: The command or a list of commands
+        :type command: str, list
+        :returns: The connection, None if the command must use the poll connection
+        :rtype: :class:`MountTEST.core.channel.Channel`
+        """
+        channel = None
+        if is_priority(command):
+            channel = self.channels.get(PRIORITY)
+        if channel is None or not channel.ok:
+            channel = self.channels.get(COMMAND)
+        if channel is None or not channel.ok:
+            return None
+        return channel
+
+    def __send_channel__(self, method, *args):
+        """
+        Sends with the method of an additional connection.
+
+        :return: The answer of the mount, None if the connection failed
+        """
+        try:
+            data = method(*args)
+            self.last_send = time.time()
+            return data
+        except socket.error as e:
+            self.supervisor.report(e)
+            return None
+
+    def __connection_error__(self, error):
+        """
+        Handles an error of the poll connection. After an error other than a
+        timeout or after several timeouts in a row, the connection is closed and
+        the supervisor opens a new one.
+
+        :param error: The error
+        :type error: socket.error
+        """
+        # a late answer must not be read as the answer of the next command
+        self.reader.discard()
+        self.add_error('poll connection error: {}', error)
+        if isinstance(error, socket.timeout):
+            self.timeouts += 1
+            if self.timeouts < MAX_TIMEOUTS:
+                return
+        self.ok = False
+        if self.poll_channel is not None:
+            self.poll_channel.close()
+        self.supervisor.report(error)
+
+    def session_commands(self):
+        """
+        :returns: The commands which set up a new connection, they must be idempotent
+        :rtype: list
+        """
+        return [':U2#']
+
+    def setup_session(self, channel):
+        """
+        Sends the session setup with a new connection.
+
+        :param channel: The new connection
+        :type channel: :class:`MountTEST.core.channel.Channel`
+        :returns: True if the setup was sent, else False
+        :rtype: bool
+        """
+        try:
+            channel.send_commands(self.session_commands())
+            return True
+        except socket.error as e:
+            self.supervisor.report(e)
+            return False
+
+    def reconnect(self):
+        """
+        Opens a new poll connection and sets up the session. Called by the supervisor.
+
+        :returns: True if there is a connection now, else False
+        :rtype: bool
+        """
+        timeout = self.poll_channel.timeout if self.poll_channel is not None else 3
+        channel = Channel(POLL, self.mount_address, timeout)
+        if not channel.open():
+            self.supervisor.report(channel.last_error)
+            return False
+        if not self.setup_session(channel):
+            return False
+        self.__use_poll_channel__(channel)
+        return True
+
+    def reconnect_channel(self, channel):
+        """
+        Opens an additional connection again and sets up the session. Called by the supervisor.
+
+        :param channel: The closed connection
+        :type channel: :class:`MountTEST.core.channel.Channel`
+        :returns: True if there is a connection now, else False
+        :rtype: bool
+        """
+        if not channel.open():
+            self.supervisor.report(channel.last_error)
+            return False
+        return self.setup_session(channel)
+
+    def heartbeat(self):
+        """
+        Checks the idle poll connection with a query. The query is sent by the
+        poll thread, so it doesn't interfere with the polling.
+        """
+        if self.is_alive() and self.active:
+            self.current_id += 1
+            command = Command(self.current_id, HEARTBEAT_COMMAND)
+            self.command_queue.put(command)
+            command.wait(self.poll_channel.timeout if self.poll_channel is not None else 3)
+
+    def start_supervisor(self):
+        """
+        Starts the supervisor, which opens broken connections again.
+        """
+        if not self.supervisor.is_alive():
+            self.supervisor.start()
+
+    def response_cache_stats(self):
+        """
+        :returns: Hits, misses and hit rate of the cached answers,
+            see :meth:`MountTEST.core.response_cache.ResponseCache.stats`
+        :rtype: dict
+        """
+        return self.responses.stats()
+
+    def connection_health(self):
+        """
+        :returns: Connected, uptime, number of reconnects and last error of the connections
+        :rtype: dict
+        """
+        return self.supervisor.metrics()
+
+    def send_command_to_mount(self, command, channel=None):
         """
         Sends a command to the mount
 
         :param command: The command for the mount
         :type command: str
-        :return: The answer of the mount
+        :param channel: The connection for the command, None for the poll connection
+        :type channel: :class:`MountTEST.core.channel.Channel`
+        :return: The answer of the mount, None if there is no connection
         :rtype: str
         """
-        return ''
+        if channel is not None:
+            return self.__send_channel__(channel.send_command, command)
+        if self.ok:
+            try:
+                data = self.reader.send_command(command)
+                self.last_send = time.time()
+                self.timeouts = 0
+                return data
+            except socket.error as e:
+                self.__connection_error__(e)
+        return None
+
+    def send_query_to_mount(self, command, decoder, channel=None):
+        """
+        Sends a query to the mount and decodes the answer directly from the receive buffer.
+
+        :param command: The query for the mount
+        :type command: str
+        :param decoder: Decoder of the answer
+        :type decoder: function
+        :param channel: The connection for the query, None for the poll connection
+        :type channel: :class:`MountTEST.core.channel.Channel`
+        :return: The decoded answer, None if there is no connection
+        """
+        if channel is not None:
+            return self.__send_channel__(channel.send_query, command, decoder)
+        if self.ok:
+            try:
+                value = self.reader.send_query(command, decoder)
+                self.last_send = time.time()
+                self.timeouts = 0
+                return value
+            except socket.error as e:
+                self.__connection_error__(e)
+        return None
+
+    def send_commands_to_mount(self, commands, channel=None):
+        """
+        Sends several commands with one write to the mount and splits the answers.
+
+        :param commands: The commands for the mount
+        :type commands: list
+        :param channel: The connection for the commands, None for the poll connection
+        :type channel: :class:`MountTEST.core.channel.Channel`
+        :return: The answers of the mount in the same order as the commands, None if there is no connection
+        :rtype: list
+        """
+        if channel is not None:
+            data = self.__send_channel__(channel.send_commands, commands)
+            return data if data is not None else [None] * len(commands)
+        if self.ok:
+            try:
+                data = self.reader.send_commands(commands)
+                self.last_send = time.time()
+                self.timeouts = 0
+                return data
+            except socket.error as e:
+                self.__connection_error__(e)
+        return [None] * len(commands)
 
     def __str__(self):
         try:
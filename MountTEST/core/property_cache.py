@@ -0,0 +1,197 @@
+"""
+Cache of the properties of an ASCOM driver.
+
+Every property read of an ASCOM driver is a call into the COM server of the
+driver. :class:`PropertyCache` wraps the driver and keeps the values of the
+slowly changing properties for a short time (their TTL), so a GUI, which
+asks for the status many times a second, doesn't saturate the COM server.
+Our own writes go through to the driver and invalidate the cached value at
+once, and the methods which move the mount invalidate the properties which
+they change.
+"""
+import time
+from threading import Lock
+
+# seconds for which a property value is used again, properties which aren't
+# listed here are always read from the driver
+DEFAULT_TTLS = {'Connected': 1.,
+                'Tracking': 0.5,
+                'AtPark': 1.,
+                'Slewing': 0.2,
+                'RightAscension': 0.2,
+                'Declination': 0.2,
+                'TargetRightAscension': 1.,
+                'TargetDeclination': 1.,
+                'Target_declination': 1.,
+                'SiteLatitude': 3600.,
+                'SiteLongitude': 3600.}
+
+# properties which are changed by the methods of the driver
+MOVES = ('Slewing', 'Tracking', 'AtPark', 'RightAscension', 'Declination')
+INVALIDATES = {'Park': MOVES,
+               'Unpark': MOVES,
+               'FindHome': MOVES,
+               'AbortSlew': MOVES,
+               'SlewToCoordinatesAsync': MOVES + ('TargetRightAscension', 'TargetDeclination',
+                                                  'Target_declination'),
+               'SlewToTargetAsync': MOVES,
+               'SlewToAltAzAsync': MOVES,
+               'SyncToCoordinates': MOVES,
+               'MoveAxis': MOVES}
+
+# LX200 commands, which move the mount or change its tracking past the driver
+MOVING_COMMANDS = (':M', ':Q', ':AP', ':RT', ':KA', ':PO', ':hP', ':hF', ':STOP', ':FLIP')
+
+
+class PropertyCache:
+    """
+    Wrapper of an ASCOM driver, which caches the property reads. The wrapper
+    is used like the driver itself::
+
+        mount = PropertyCache(CreateObject('ASCOM.Simulator.Telescope'))
+        mount.Tracking          # read from the driver
+        mount.Tracking          # read from the cache
+        mount.Tracking = False  # written to the driver, the cached value is invalid
+
+    :param driver: The ASCOM driver
+    :type driver: object
+    :param ttls: The TTL of the cached properties in seconds, None for :data:`DEFAULT_TTLS`
+    :type ttls: dict
+    """
+    def __init__(self, driver, ttls=None):
+        object.__setattr__(self, '_driver', driver)
+        object.__setattr__(self, '_ttls', dict(DEFAULT_TTLS if ttls is None else ttls))
+        object.__setattr__(self, '_values', {})
+        object.__setattr__(self, '_hits', {})
+        object.__setattr__(self, '_misses', {})
+        object.__setattr__(self, '_lock', Lock())
+        object.__setattr__(self, '_generation', [0])
+
+    def __getattr__(self, name):
+        # only called for names which aren't attributes of the wrapper
+        ttl = self._ttls.get(name)
+        if ttl is None:
+            value = getattr(self._driver, name)
+            if name in INVALIDATES and callable(value):
+                return self.__invalidating__(value, INVALIDATES[name])
+            return value
+        now = time.time()
+        entry = self._values.get(name)
+        if entry is not None and entry[1] > now:
+            self._hits[name] = self._hits.get(name, 0) + 1
+            return entry[0]
+        self._misses[name] = self._misses.get(name, 0) + 1
+        generation = self._generation[0]
+        value = getattr(self._driver, name)
+        with self._lock:
+            # a write during the read may have made the value invalid already
+            if generation == self._generation[0]:
+                self._values[name] = (value, now + ttl)
+        return value
+
+    def read(self, name):
+        """
+        Reads a property from the driver, without looking at the cache. The
+        value replaces the cached value.
+
+        :param name: Name of the property
+        :type name: str
+        :returns: The value of the property
+        """
+        generation = self._generation[0]
+        value = getattr(self._driver, name)
+        ttl = self._ttls.get(name)
+        if ttl is not None:
+            with self._lock:
+                if generation == self._generation[0]:
+                    self._values[name] = (value, time.time() + ttl)
+        return value
+
+    def generation(self):
+        """
+        :returns: Number of the invalidations, compare it before and after a read
+        :rtype: int
+        """
+        return self._generation[0]
+
+    def store(self, values, generation=None):
+        """
+        Uses values, which were read from the driver at once, as cached values.
+
+        :param values: The values by the names of the properties
+        :type values: dict
+        :param generation: Value of :meth:`generation` before the read, None to store the values anyway
+        :type generation: int
+        :returns: True if the values are stored, False if a write or an
+            invalidation during the read made them invalid
+        :rtype: bool
+        """
+        now = time.time()
+        with self._lock:
+            if generation is not None and generation != self._generation[0]:
+                return False
+            for name, value in values.items():
+                ttl = self._ttls.get(name)
+                if ttl is not None:
+                    self._values[name] = (value, now + ttl)
+        return True
+
+    def __setattr__(self, name, value):
+        setattr(self._driver, name, value)
+        self.invalidate(name)
+
+    def __invalidating__(self, method, names):
+        """
+        :returns: The method, which invalidates the properties after the call
+        :rtype: function
+        """
+        def call(*args):
+            try:
+                return method(*args)
+            finally:
+                self.invalidate(*names)
+        return call
+
+    def invalidate(self, *names):
+        """
+        Removes cached values, so they are read from the driver again.
+
+        :param names: Names of the properties, all properties if no name is given
+        :type names: str
+        """
+        with self._lock:
+            self._generation[0] += 1
+            if len(names) == 0:
+                self._values.clear()
+            for name in names:
+                self._values.pop(name, None)
+
+    def invalidate_command(self, command):
+        """
+        Invalidates the properties, which are changed by an LX200 command sent
+        directly to the mount.
+
+        :param command: The command, ex. ':MS#' or ':U2#:MS#'
+        :type command: str
+        """
+        if any(part.startswith(MOVING_COMMANDS) for part in command.split('#')):
+            self.invalidate(*MOVES)
+
+    def stats(self):
+        """
+        :returns: Hits, misses and hit rate of the cache in total and of every property
+        :rtype: dict
+        """
+        hits = dict(self._hits)
+        misses = dict(self._misses)
+        properties = {}
+        for name in set(hits) | set(misses):
+            h = hits.get(name, 0)
+            m = misses.get(name, 0)
+            properties[name] = {'hits': h, 'misses': m, 'hit_rate': h / float(h + m)}
+        total_hits = sum(hits.values())
+        total = total_hits + sum(misses.values())
+        return {'hits': total_hits,
+                'misses': total - total_hits,
+                'hit_rate': total_hits / float(total) if total > 0 else 0.,
+                'properties': properties}
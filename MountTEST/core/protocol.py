@@ -0,0 +1,312 @@
+"""
+Framing of the LX200/10Micron protocol.
+
+The mount answers a command in one of the following ways:
+
+* nothing at all (ex. :U2#, :Me#, :Q#),
+* a single character without terminator (ex. :Sr..., :Sd... returns 0 or 1),
+* a string terminated by '#' (ex. :GR#, :Gstat#, :getlog#),
+* a slew answer, which is the single character 0 if the slew starts or a
+  '#'-terminated error message (:MS#, :MA#, :MSfs),
+* a date answer, the character 1 followed by two '#'-terminated frames
+  ("Updating Planetary Data#" and a line of blanks) or the single character 0
+  if the date is invalid (:SC).
+
+A compound command like ':U2#:GR#' produces the answers of all of its
+sub-commands in the same order.
+"""
+import socket
+
+NO_REPLY = 0
+CHAR_REPLY = 1
+FRAME_REPLY = 2
+SLEW_REPLY = 3
+DATE_REPLY = 4
+
+TERMINATOR = b'#'
+
+# reply kinds of the command prefixes, the longest matching prefix wins
+REPLY_KINDS = {
+    ':G': FRAME_REPLY,
+    ':U': NO_REPLY,
+    ':M': NO_REPLY,
+    ':MS': SLEW_REPLY,
+    ':MA': SLEW_REPLY,
+    ':Q': NO_REPLY,
+    ':AP': NO_REPLY,
+    ':AL': NO_REPLY,
+    ':KA': NO_REPLY,
+    ':PO': NO_REPLY,
+    ':S': CHAR_REPLY,
+    ':SC': DATE_REPLY,
+    ':SIP': FRAME_REPLY,
+    ':SDH': NO_REPLY,
+    ':R': NO_REPLY,
+    ':RR': CHAR_REPLY,
+    ':RA': CHAR_REPLY,
+    ':RE': CHAR_REPLY,
+    ':D': FRAME_REPLY,
+    ':T': NO_REPLY,
+    ':p': NO_REPLY,
+    ':pS': FRAME_REPLY,
+    ':$Q': NO_REPLY,
+    ':h': NO_REPLY,
+    ':EW': NO_REPLY,
+    ':NS': NO_REPLY,
+    ':EMU': NO_REPLY,
+    ':FLIP': CHAR_REPLY,
+    ':STOP': NO_REPLY,
+    ':shutdown': CHAR_REPLY,
+    ':startlog': CHAR_REPLY,
+    ':stoplog': CHAR_REPLY,
+    ':getlog': FRAME_REPLY,
+    ':evlog': FRAME_REPLY,
+    ':USEROK': CHAR_REPLY,
+    ':USERWAIT': NO_REPLY,
+    ':NUtim': FRAME_REPLY,
+}
+MAX_PREFIX = max(len(p) for p in REPLY_KINDS)
+
+_kind_cache = {}
+_encoded_cache = {}
+
+
+def split_command(command):
+    """
+    Splits a compound command into its sub-commands.
+
+    :param command: The command, ex. ':U2#:GR#'
+    :type command: str
+    :returns: The sub-commands, ex. [':U2#', ':GR#']
+    :rtype: list
+    """
+    parts = command.split('#')
+    commands = [p + '#' for p in parts[:-1] if p != '']
+    if parts[-1] != '':
+        commands.append(parts[-1])
+    return commands
+
+
+def command_reply_kind(command):
+    """
+    Returns the kind of the answer of a single command.
+
+    :param command: A single command, ex. ':GR#'
+    :type command: str
+    :returns: The kind of the reply, one of NO_REPLY, CHAR_REPLY, FRAME_REPLY, SLEW_REPLY or DATE_REPLY
+    :rtype: int
+    """
+    for length in range(min(len(command), MAX_PREFIX), 1, -1):
+        kind = REPLY_KINDS.get(command[:length])
+        if kind is not None:
+            return kind
+    return FRAME_REPLY
+
+
+def reply_kinds(command):
+    """
+    Returns the kinds of the answers, which the mount will send for the command.
+
+    :param command: The command, ex. ':U2#:GR#'
+    :type command: str
+    :returns: The kinds of the answers in the order of the mount, commands without an answer are skipped
+    :rtype: tuple
+    """
+    try:
+        return _kind_cache[command]
+    except KeyError:
+        kinds = tuple(k for k in (command_reply_kind(c) for c in split_command(command))
+                      if k != NO_REPLY)
+        if len(_kind_cache) < 4096:
+            _kind_cache[command] = kinds
+        return kinds
+
+
+def encode_command(command):
+    """
+    Returns the bytes of the command. The polled commands are the same in every
+    cycle, so the bytes are cached and not encoded again.
+
+    :param command: The command, ex. ':U2#:GR#'
+    :type command: str
+    :rtype: bytes
+    """
+    try:
+        return _encoded_cache[command]
+    except KeyError:
+        data = command.encode('latin-1')
+        if len(_encoded_cache) < 4096:
+            _encoded_cache[command] = data
+        return data
+
+
+class FrameReader:
+    """
+    Buffered reader for the answers of the mount. The received data is written
+    with recv_into into a preallocated buffer and split into the single answers,
+    so answers which are split over several reads or which are merged into one
+    read are framed correctly.
+
+    :param client: The connected socket or transport to the mount, see :mod:`MountTEST.core.transport`
+    :type client: socket.socket
+    :param size: Initial size of the receive buffer in bytes
+    :type size: int
+    """
+    def __init__(self, client, size=4096):
+        self.client = client
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.start = 0
+        self.end = 0
+
+    def discard(self):
+        """
+        Drops all buffered data, ex. after a timeout, so that a late answer
+        can't be taken as the answer of the next command.
+        """
+        self.start = 0
+        self.end = 0
+
+    def __fill__(self):
+        """
+        Reads new data from the socket into the buffer.
+        """
+        if self.start == self.end:
+            self.start = 0
+            self.end = 0
+        elif self.end == len(self.buffer):
+            pending = self.end - self.start
+            if self.start == 0:
+                # the buffer is full with one answer, double its size
+                self.view.release()
+                self.buffer = self.buffer + bytearray(len(self.buffer))
+                self.view = memoryview(self.buffer)
+            else:
+                self.buffer[:pending] = self.buffer[self.start:self.end]
+            self.start = 0
+            self.end = pending
+        n = self.client.recv_into(self.view[self.end:])
+        if n == 0:
+            raise socket.error('connection closed by the mount')
+        self.end += n
+
+    def read_char(self):
+        """
+        Reads a single character answer.
+
+        :returns: The character
+        :rtype: str
+        """
+        while self.start == self.end:
+            self.__fill__()
+        char = chr(self.buffer[self.start])
+        self.start += 1
+        return char
+
+    def __find_terminator__(self):
+        """
+        Reads until the buffer contains the terminator of the next answer.
+
+        :returns: The position of the terminator in the buffer
+        :rtype: int
+        """
+        pos = self.start
+        while True:
+            i = self.buffer.find(TERMINATOR, pos, self.end)
+            if i >= 0:
+                return i
+            pos = self.end - self.start
+            self.__fill__()
+            pos += self.start
+
+    def read_frame(self):
+        """
+        Reads an answer which is terminated by '#'.
+
+        :returns: The answer including the terminator
+        :rtype: str
+        """
+        i = self.__find_terminator__()
+        frame = self.buffer[self.start:i + 1].decode('latin-1')
+        self.start = i + 1
+        return frame
+
+    def read_reply(self, kind):
+        """
+        Reads the next answer of the given kind. The frames of a date answer
+        carry no information, only its character is returned.
+
+        :param kind: The kind of the answer
+        :type kind: int
+        :returns: The answer
+        :rtype: str
+        """
+        if kind == CHAR_REPLY:
+            return self.read_char()
+        elif kind == FRAME_REPLY:
+            return self.read_frame()
+        elif kind == SLEW_REPLY:
+            char = self.read_char()
+            if char == '0':
+                return char
+            return char + self.read_frame()
+        elif kind == DATE_REPLY:
+            char = self.read_char()
+            if char == '1':
+                self.read_frame()
+                self.read_frame()
+            return char
+        return ''
+
+    def send_command(self, command):
+        """
+        Sends the command to the mount and reads all answers which the mount will
+        send for it.
+
+        :param command: The command, ex. ':U2#:GR#'
+        :type command: str
+        :returns: The answers of the mount, an empty string if the command has no answer
+        :rtype: str
+        """
+        self.client.sendall(encode_command(command))
+        return ''.join([self.read_reply(k) for k in reply_kinds(command)])
+
+    def send_query(self, command, decode):
+        """
+        Sends a query to the mount and decodes its answer. A '#'-terminated answer
+        is handed to the decoder as memoryview of the receive buffer (without the
+        terminator), so it isn't copied or decoded to a string before.
+
+        :param command: The query, ex. ':U2#:GR#'
+        :type command: str
+        :param decode: The decoder of the answer, see :mod:`MountTEST.core.decoders`
+        :type decode: function
+        :returns: The decoded answer of the last sub-command
+        """
+        self.client.sendall(encode_command(command))
+        kinds = reply_kinds(command)
+        if len(kinds) == 0:
+            return decode('')
+        for kind in kinds[:-1]:
+            self.read_reply(kind)
+        if kinds[-1] != FRAME_REPLY:
+            return decode(self.read_reply(kinds[-1]))
+        i = self.__find_terminator__()
+        try:
+            with self.view[self.start:i] as frame:
+                return decode(frame)
+        finally:
+            self.start = i + 1
+
+    def send_commands(self, commands):
+        """
+        Sends several commands with one write to the mount and reads the answers
+        afterwards, so all commands together need only one round trip.
+
+        :param commands: The commands, ex. [':GR#', ':GD#', ':Gstat#']
+        :type commands: list
+        :returns: The answers of the single commands in the same order
+        :rtype: list
+        """
+        self.client.sendall(encode_command(''.join(commands)))
+        return [''.join([self.read_reply(k) for k in reply_kinds(c)]) for c in commands]
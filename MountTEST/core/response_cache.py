@@ -0,0 +1,188 @@
+"""
+Cache of the answers of queries, which change rarely.
+
+The firmware, the product name and the site information are asked often,
+but they change only if they are set again. Every cacheable query has a
+lifetime:
+
+* STATIC, the answer never changes (ex. the firmware version),
+* SESSION, the answer is valid until the connection to the mount is opened again,
+* a number of seconds, after which the answer is asked again.
+
+The answer of a query is removed from the cache, when the matching set
+command is sent (ex. ':Sg...' removes the longitude ':Gg#').
+"""
+import time
+from threading import Lock
+
+from MountTEST.core.protocol import split_command
+
+STATIC = 'static'
+SESSION = 'session'
+
+# lifetimes of the answers of the queries
+LIFETIMES = {':GVD#': STATIC,
+             ':GVN#': STATIC,
+             ':GVP#': STATIC,
+             ':GVT#': STATIC,
+             ':GVZ#': STATIC,
+             ':Gg#': SESSION,
+             ':Gt#': SESSION,
+             ':Gev#': SESSION,
+             ':GG#': SESSION,
+             ':Gh#': SESSION,
+             ':Go#': SESSION,
+             ':Glmt#': SESSION,
+             ':Glms#': SESSION,
+             ':GREF#': SESSION,
+             ':GIP#': SESSION,
+             ':GRPRS#': 60.,
+             ':GRTMP#': 60.}
+
+# queries, whose answers are changed by the set commands
+INVALIDATED_BY = {':Sg': (':Gg#',),
+                  ':St': (':Gt#',),
+                  ':Sev': (':Gev#',),
+                  ':SG': (':GG#',),
+                  ':Sh': (':Gh#',),
+                  ':So': (':Go#',),
+                  ':Slmt': (':Glmt#',),
+                  ':Slms': (':Glms#',),
+                  ':SREF': (':GREF#',),
+                  ':SRPRS': (':GRPRS#',),
+                  ':SRTMP': (':GRTMP#',),
+                  ':SIP': (':GIP#',)}
+MAX_PREFIX = max(len(p) for p in INVALIDATED_BY)
+
+# commands without an answer, which may precede a cached query
+MODE_COMMANDS = (':U1#', ':U2#')
+
+
+class ResponseCache:
+    """
+    Answers of the queries with a lifetime in :data:`LIFETIMES`.
+
+    :param lifetimes: Lifetimes of the queries, None for :data:`LIFETIMES`
+    :type lifetimes: dict
+    """
+    def __init__(self, lifetimes=None):
+        self.lifetimes = dict(LIFETIMES if lifetimes is None else lifetimes)
+        self.entries = {}
+        self.queries = {}
+        self.hits = {}
+        self.misses = {}
+        self.generation = 0
+        self.lock = Lock()
+
+    def __query__(self, command):
+        """
+        :returns: The cached query of the command, None if the answer isn't cached
+        :rtype: str
+        """
+        try:
+            return self.queries[command]
+        except KeyError:
+            query = None
+            if isinstance(command, str):
+                commands = split_command(command)
+                if len(commands) > 0 and commands[-1] in self.lifetimes and \
+                        all(c in MODE_COMMANDS for c in commands[:-1]):
+                    query = commands[-1]
+            if len(self.queries) < 4096:
+                self.queries[command] = query
+            return query
+
+    def get(self, command, decoder=None):
+        """
+        :param command: The command, ex. ':U2#:Gg#'
+        :type command: str
+        :param decoder: The decoder of the answer, None for the raw answer
+        :type decoder: function
+        :returns: Found and the cached answer, (False, None) if there is no valid answer
+        :rtype: tuple
+        """
+        if isinstance(command, list) or self.__query__(command) is None:
+            return False, None
+        entry = self.entries.get((command, decoder))
+        if entry is not None and (entry[1] is None or entry[1] > time.time()):
+            self.hits[command] = self.hits.get(command, 0) + 1
+            return True, entry[0]
+        self.misses[command] = self.misses.get(command, 0) + 1
+        return False, None
+
+    def store(self, command, decoder, answer, generation):
+        """
+        Stores the answer of a cacheable command.
+
+        :param generation: Value of :attr:`generation` before the command was sent,
+            an answer from before an invalidation isn't stored
+        :type generation: int
+        """
+        if answer is None or isinstance(command, list):
+            return
+        query = self.__query__(command)
+        if query is None:
+            return
+        lifetime = self.lifetimes[query]
+        expires = time.time() + lifetime if not isinstance(lifetime, str) else None
+        with self.lock:
+            if generation == self.generation:
+                self.entries[(command, decoder)] = (answer, expires, query)
+
+    def invalidate_command(self, command):
+        """
+        Removes the answers, which are changed by the set commands in the command.
+
+        :param command: The command or a list of commands
+        :type command: str, list
+        """
+        commands = command if isinstance(command, list) else [command]
+        for c in commands:
+            if ':S' not in c:
+                continue
+            for sub in split_command(c):
+                for length in range(min(len(sub), MAX_PREFIX), 2, -1):
+                    queries = INVALIDATED_BY.get(sub[:length])
+                    if queries is not None:
+                        self.invalidate(*queries)
+                        break
+
+    def invalidate(self, *queries):
+        """
+        Removes the answers of the queries.
+
+        :param queries: The queries, ex. ':Gg#', all answers if no query is given
+        :type queries: str
+        """
+        with self.lock:
+            self.generation += 1
+            self.entries = dict((key, entry) for key, entry in self.entries.items()
+                                if len(queries) > 0 and entry[2] not in queries)
+
+    def new_session(self):
+        """
+        Removes the answers with the lifetime SESSION, after the connection is opened again.
+        """
+        with self.lock:
+            self.generation += 1
+            self.entries = dict((key, entry) for key, entry in self.entries.items()
+                                if self.lifetimes[entry[2]] != SESSION)
+
+    def stats(self):
+        """
+        :returns: Hits, misses and hit rate in total and of every command
+        :rtype: dict
+        """
+        hits = dict(self.hits)
+        misses = dict(self.misses)
+        commands = {}
+        for command in set(hits) | set(misses):
+            h = hits.get(command, 0)
+            m = misses.get(command, 0)
+            commands[command] = {'hits': h, 'misses': m, 'hit_rate': h / float(h + m)}
+        total_hits = sum(hits.values())
+        total = total_hits + sum(misses.values())
+        return {'hits': total_hits,
+                'misses': total - total_hits,
+                'hit_rate': total_hits / float(total) if total > 0 else 0.,
+                'commands': commands}
@@ -0,0 +1,166 @@
+"""
+Scheduler for the fields which are polled by :class:`MountTEST.core.mountcom.MountCom`.
+
+Every field has its own poll interval, which depends on the state of the
+mount. During a slew the position is polled fast, if the mount is parked
+only rarely and the dome queries are nearly skipped if there is no dome.
+"""
+import time
+
+# status of the mount (answer of ':Gstat#') in which the mount moves
+MOVING_STATUS = ('2#', '3#', '4#', '6#')
+PARKED_STATUS = ('5#',)
+
+TRACKING = 'tracking'
+SLEWING = 'slewing'
+PARKED = 'parked'
+
+DOME_FIELDS = ('dome_pos', 'shutter_status')
+
+
+class PollScheduler:
+    """
+    Decides which fields must be polled in the next poll cycle.
+
+    :param intervals: Poll intervals in seconds of the fields in the normal state
+    :type intervals: dict
+    :param slewing_intervals: Poll intervals which replace the normal intervals during a slew
+    :type slewing_intervals: dict
+    :param parked_intervals: Poll intervals which replace the normal intervals if the mount is parked
+    :type parked_intervals: dict
+    :param no_dome_interval: Poll interval of the dome fields if there is no dome
+    :type no_dome_interval: float
+    """
+    def __init__(self, intervals=None, slewing_intervals=None, parked_intervals=None,
+                 no_dome_interval=300.):
+        self.intervals = {TRACKING: {'target_pos': 1.,
+                                     'telescope_pos': 0.5,
+                                     'mount_status': 0.5,
+                                     'dome_pos': 2.,
+                                     'shutter_status': 30.,
+                                     # only verifies the plan of the meridian flip
+                                     'tracking_time': 300.},
+                          SLEWING: {'target_pos': 0.5,
+                                    'telescope_pos': 0.05,
+                                    'mount_status': 0.1,
+                                    'dome_pos': 0.5},
+                          PARKED: {'target_pos': 10.,
+                                   'telescope_pos': 10.,
+                                   'mount_status': 2.,
+                                   'dome_pos': 10.,
+                                   'tracking_time': 300.}}
+        if intervals is not None:
+            self.intervals[TRACKING].update(intervals)
+        if slewing_intervals is not None:
+            self.intervals[SLEWING].update(slewing_intervals)
+        if parked_intervals is not None:
+            self.intervals[PARKED].update(parked_intervals)
+        self.no_dome_interval = no_dome_interval
+        self.state = TRACKING
+        self.has_dome = True
+        self.next_poll = {}
+
+    def set_interval(self, name, interval, state=TRACKING):
+        """
+        Sets a new poll interval of a field.
+
+        :param name: Name of the field
+        :type name: str
+        :param interval: The new interval in seconds
+        :type interval: float
+        :param state: The state for which the interval is used, 'tracking', 'slewing' or 'parked'
+        :type state: str
+        """
+        self.intervals[state][name] = interval
+        self.next_poll.pop(name, None)
+
+    def interval(self, name):
+        """
+        Returns the poll interval of the field in the current state.
+
+        :param name: Name of the field
+        :type name: str
+        :returns: The interval in seconds
+        :rtype: float
+        """
+        if not self.has_dome and name in DOME_FIELDS:
+            return self.no_dome_interval
+        try:
+            return self.intervals[self.state][name]
+        except KeyError:
+            return self.intervals[TRACKING].get(name, 1.)
+
+    def set_state(self, status, has_dome=True):
+        """
+        Adapts the intervals to the current state of the mount. If the new intervals
+        are shorter, the fields are polled earlier.
+
+        :param status: The status of the mount, the answer of ':Gstat#'
+        :type status: str
+        :param has_dome: True if a dome is connected to the mount, else False
+        :type has_dome: bool
+        """
+        if status in MOVING_STATUS:
+            state = SLEWING
+        elif status in PARKED_STATUS:
+            state = PARKED
+        else:
+            state = TRACKING
+        if state == self.state and has_dome == self.has_dome:
+            return
+        self.state = state
+        self.has_dome = has_dome
+        now = time.time()
+        for name, next_poll in self.next_poll.items():
+            self.next_poll[name] = min(next_poll, now + self.interval(name))
+
+    def due(self, names, now=None):
+        """
+        Returns the fields which must be polled now.
+
+        :param names: Names of all fields
+        :type names: list
+        :param now: The current time, None for time.time()
+        :type now: float
+        :returns: The names of the fields which must be polled
+        :rtype: list
+        """
+        if now is None:
+            now = time.time()
+        return [name for name in names if self.next_poll.get(name, 0) <= now]
+
+    def polled(self, names, now=None):
+        """
+        Marks the fields as polled.
+
+        :param names: Names of the polled fields
+        :type names: list
+        :param now: The time of the poll, None for time.time()
+        :type now: float
+        """
+        if now is None:
+            now = time.time()
+        for name in names:
+            self.next_poll[name] = now + self.interval(name)
+
+    def poll_at(self, name, when):
+        """
+        Polls the field at the given time, independent of its interval.
+
+        :param name: Name of the field
+        :type name: str
+        :param when: Time of the next poll
+        :type when: float
+        """
+        self.next_poll[name] = when
+
+    def next_due(self, names):
+        """
+        Returns the time when the next field must be polled.
+
+        :param names: Names of all fields
+        :type names: list
+        :returns: The time of the next poll
+        :rtype: float
+        """
+        return min([self.next_poll.get(name, 0) for name in names])
@@ -0,0 +1,95 @@
+"""
+Snapshot of the state of the mount.
+
+The poll thread of :class:`MountTEST.core.mountcom.MountCom` creates a new
+:class:`MountState` after every refresh and publishes it with one reference
+assignment. A reader gets all values from the same poll cycle without a
+lock, and can skip its work if the sequence number hasn't changed.
+
+:class:`AscomState` is the same for the properties of the ASCOM driver: the
+poll thread reads them once per cycle, and the status methods of
+:class:`MountTEST.mount.Mount` answer from the snapshot without a COM call.
+"""
+import time
+from collections import namedtuple
+
+STATE_FIELDS = ('target_ra', 'target_dec', 'telescope_ra', 'telescope_dec', 'status',
+                'dome_pos', 'shutter_status', 'tracking_time')
+
+MountState = namedtuple('MountState', ('sequence', 'time') + STATE_FIELDS + ('field_times',))
+MountState.__doc__ = """
+Immutable snapshot of the state of the mount.
+
+:param sequence: Number of the snapshot, increases with every published snapshot
+:param time: Time when the snapshot was published
+:param field_times: Time of the last acquisition of every polled field, must not be changed
+"""
+
+
+def freeze(value):
+    """
+    Converts a list into a tuple, so the value in the snapshot can't be changed.
+    """
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+
+def create_state(source, sequence, now, field_times):
+    """
+    Creates a new snapshot from the attributes of the source.
+
+    :param source: Object with the attributes in STATE_FIELDS, ex. a :class:`MountTEST.core.mountcom.MountCom`
+    :param sequence: Number of the snapshot
+    :type sequence: int
+    :param now: Time of the snapshot
+    :type now: float
+    :param field_times: Acquisition time of every polled field
+    :type field_times: dict
+    :rtype: :class:`MountState`
+    """
+    return MountState(sequence, now, *[freeze(getattr(source, name)) for name in STATE_FIELDS],
+                      field_times=field_times)
+
+
+# properties of the ASCOM driver, which are read once per poll cycle
+ASCOM_FIELDS = ('Connected', 'Tracking', 'AtPark', 'Slewing', 'RightAscension', 'Declination',
+                'TargetRightAscension', 'Target_declination')
+
+AscomState = namedtuple('AscomState', ('time',) + ASCOM_FIELDS)
+AscomState.__doc__ = """
+Immutable snapshot of the properties of the ASCOM driver.
+
+:param time: Time when the snapshot was read
+"""
+
+EMPTY_ASCOM_STATE = AscomState(0., False, False, False, False, 0., 0., 0., 0.)
+
+
+def read_ascom_state(read, previous=EMPTY_ASCOM_STATE, costs=None, smoothing=0.1):
+    """
+    Reads all properties in ASCOM_FIELDS into one snapshot. A property, which
+    can't be read (ex. the target before the first slew), keeps its previous value.
+
+    :param read: Function, which reads a property of the driver by its name
+    :type read: function
+    :param previous: The previous snapshot
+    :type previous: :class:`AscomState`
+    :param costs: Average duration of the reads in seconds by property, updated by the reads
+    :type costs: dict
+    :param smoothing: Weight of the new duration in the average
+    :type smoothing: float
+    :rtype: :class:`AscomState`
+    """
+    values = []
+    for name in ASCOM_FIELDS:
+        start = time.perf_counter()
+        try:
+            values.append(read(name))
+        except Exception:
+            # COM errors have no common base class without comtypes
+            values.append(getattr(previous, name))
+        if costs is not None:
+            duration = time.perf_counter() - start
+            costs[name] = duration if name not in costs else costs[name] + smoothing * (duration - costs[name])
+    return AscomState(time.time(), *values)
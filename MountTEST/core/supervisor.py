@@ -0,0 +1,189 @@
+"""
+Supervision of the connections to the mount.
+
+The supervisor runs in its own thread. It detects dead connections by
+errors of the senders and by heartbeat queries on idle connections, and it
+opens them again with exponential backoff and jitter. Neither the poll
+thread nor a caller waits for a reconnect: while a connection is down, the
+commands return None at once. After a reconnect the session setup of the
+mount (ex. the high precision mode) is sent again.
+"""
+import random
+import socket
+import time
+from threading import Thread, Event
+
+# query which is sent on idle connections, the mount always answers it
+HEARTBEAT_COMMAND = ':GVP#'
+
+
+class Backoff:
+    """
+    Exponential backoff with jitter for the reconnects of one connection.
+
+    :param base: Delay after the first failure in seconds
+    :type base: float
+    :param maximum: Maximal delay in seconds
+    :type maximum: float
+    :param jitter: Relative jitter of the delay, 0.5 means 50% to 150% of the delay
+    :type jitter: float
+    """
+    def __init__(self, base=0.5, maximum=30., jitter=0.5):
+        self.base = base
+        self.maximum = maximum
+        self.jitter = jitter
+        self.failures = 0
+        self.next_try = 0.
+
+    def failed(self, now):
+        """
+        Registers a failed attempt and computes the time of the next attempt.
+        """
+        delay = min(self.maximum, self.base * 2 ** self.failures)
+        delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        self.failures += 1
+        self.next_try = now + delay
+
+    def reset(self):
+        self.failures = 0
+        self.next_try = 0.
+
+    def due(self, now):
+        return now >= self.next_try
+
+
+class ConnectionSupervisor(Thread):
+    """
+    Background thread, which keeps the connections of a
+    :class:`MountTEST.core.mountcom.MountCom` alive.
+
+    :param com: The supervised connection to the mount
+    :type com: :class:`MountTEST.core.mountcom.MountCom`
+    :param heartbeat_interval: Idle time of a connection in seconds, after which it is checked with a query
+    :type heartbeat_interval: float
+    :param base_delay: First delay between two reconnects in seconds
+    :type base_delay: float
+    :param max_delay: Maximal delay between two reconnects in seconds
+    :type max_delay: float
+    """
+    def __init__(self, com, heartbeat_interval=5., base_delay=0.5, max_delay=30.):
+        Thread.__init__(self)
+        self.daemon = True
+        self.com = com
+        self.heartbeat_interval = heartbeat_interval
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.active = True
+        self.wake = Event()
+        self.backoff = {}
+        self.reconnects = 0
+        self.last_error = None
+        self.last_error_time = None
+        self.connected_since = None
+
+    def report(self, error):
+        """
+        Reports an error of a connection and wakes up the supervisor.
+
+        :param error: The error
+        :type error: Exception
+        """
+        self.last_error = error
+        self.last_error_time = time.time()
+        self.wake.set()
+
+    def stop(self):
+        """
+        Stops the supervisor.
+        """
+        self.active = False
+        self.wake.set()
+
+    def uptime(self):
+        """
+        :returns: Time in seconds since the poll connection is up, 0 if it is down
+        :rtype: float
+        """
+        if not self.com.ok or self.connected_since is None:
+            return 0.
+        return time.time() - self.connected_since
+
+    def metrics(self):
+        """
+        :returns: Health of the connections: connected, uptime, number of reconnects,
+            last error and the state of the additional connections
+        :rtype: dict
+        """
+        return {'connected': self.com.ok,
+                'uptime_s': self.uptime(),
+                'reconnects': self.reconnects,
+                'last_error': None if self.last_error is None else str(self.last_error),
+                'last_error_time': self.last_error_time,
+                'channels': dict((role, channel.ok) for role, channel in self.com.channels.items())}
+
+    def __backoff__(self, role):
+        if role not in self.backoff:
+            self.backoff[role] = Backoff(self.base_delay, self.max_delay)
+        return self.backoff[role]
+
+    def __reconnect__(self, role, connect, now):
+        """
+        Tries a reconnect, if the backoff of the connection allows it.
+
+        :returns: True if the connection is up again, else False
+        :rtype: bool
+        """
+        backoff = self.__backoff__(role)
+        if not backoff.due(now):
+            return False
+        if connect():
+            backoff.reset()
+            self.reconnects += 1
+            return True
+        backoff.failed(now)
+        return False
+
+    def check(self, now=None):
+        """
+        Checks all connections once: reconnects the broken ones and sends a
+        heartbeat on the idle ones.
+        """
+        if now is None:
+            now = time.time()
+        com = self.com
+        if not com.ok:
+            if self.__reconnect__('poll', com.reconnect, now):
+                self.connected_since = time.time()
+        elif now - com.last_send > self.heartbeat_interval:
+            com.heartbeat()
+        for role, channel in list(com.channels.items()):
+            if not channel.ok:
+                self.__reconnect__(role, lambda: com.reconnect_channel(channel), now)
+            elif now - channel.last_use > self.heartbeat_interval:
+                try:
+                    channel.send_command(HEARTBEAT_COMMAND)
+                except socket.error as e:
+                    self.report(e)
+
+    def next_check(self):
+        """
+        :returns: Time in seconds until the next check
+        :rtype: float
+        """
+        wait = min(1., self.heartbeat_interval)
+        now = time.time()
+        for backoff in self.backoff.values():
+            if backoff.failures > 0:
+                wait = min(wait, max(backoff.next_try - now, 0.))
+        return wait
+
+    def run(self):
+        if self.com.ok:
+            self.connected_since = time.time()
+        while self.active:
+            try:
+                self.check()
+            except Exception as e:
+                self.report(e)
+            self.wake.wait(self.next_check())
+            self.wake.clear()
@@ -0,0 +1,132 @@
+"""
+Lazy tracing of the mount communication.
+
+A trace event is a template and its arguments, like
+``add_debug('mount set_ra {}:{}:{}', hh, mm, ss)``. The event is only
+formatted when it is written to the debug file or dumped, and it is only
+recorded when its level is enabled for its subsystem, so a disabled event
+costs one dictionary lookup and a comparison. The recorded events are kept
+in a bounded ring buffer, which can be dumped on demand or after an error.
+"""
+import time
+from collections import deque
+
+DEBUG = 10
+INFO = 20
+ERROR = 40
+OFF = 100
+
+# subsystems of the tracer
+COM = 'com'
+MOUNT = 'mount'
+DOME = 'dome'
+LOG = 'log'
+
+
+def render(template, args):
+    """
+    Formats a trace event.
+
+    :param template: The template, ex. 'mount set_ra {}:{}:{}'
+    :type template: str
+    :param args: The arguments of the template
+    :type args: tuple
+    :returns: The message
+    :rtype: str
+    """
+    if len(args) == 0:
+        return template
+    try:
+        return template.format(*args)
+    except (IndexError, KeyError, ValueError):
+        return ' '.join([template] + [str(a) for a in args])
+
+
+class Tracer:
+    """
+    Records trace events of several subsystems in a ring buffer and writes
+    them to the debug file.
+
+    The ring buffer is a deque with a maximal length: appending is atomic,
+    so the poll thread and the callers record their events without a lock.
+
+    :param sink: The debug file, an object with an add(text) method, None for no debug file
+    :type sink: object
+    :param level: Lowest recorded level of all subsystems, None for DEBUG with a
+        debug file and ERROR without one
+    :type level: int
+    :param size: Number of events in the ring buffer
+    :type size: int
+    """
+    def __init__(self, sink=None, level=None, size=2048):
+        self.sink = sink
+        if level is None:
+            level = DEBUG if sink is not None else ERROR
+        self.level = level
+        self.levels = {}
+        self.events = deque(maxlen=size)
+        self.on_error = None
+
+    def set_level(self, level, subsystem=None):
+        """
+        Sets the lowest recorded level.
+
+        :param level: The level, DEBUG, INFO, ERROR or OFF
+        :type level: int
+        :param subsystem: The subsystem, None for the default of all subsystems
+        :type subsystem: str
+        """
+        if subsystem is None:
+            self.level = level
+        else:
+            self.levels[subsystem] = level
+
+    def enabled(self, subsystem, level=DEBUG):
+        """
+        :returns: True if events of the level are recorded for the subsystem, else False
+        :rtype: bool
+        """
+        return level >= self.levels.get(subsystem, self.level)
+
+    def trace(self, subsystem, level, template, *args):
+        """
+        Records an event, if its level is enabled for the subsystem.
+
+        :param subsystem: The subsystem, ex. 'mount'
+        :type subsystem: str
+        :param level: The level of the event
+        :type level: int
+        :param template: Template of the message, formatted with args only when it is needed
+        :type template: str
+        """
+        if level < self.levels.get(subsystem, self.level):
+            return
+        self.events.append((time.time(), subsystem, level, template, args))
+        if self.sink is not None:
+            try:
+                self.sink.add(render(template, args))
+            except (AttributeError, ValueError):
+                pass
+        if level >= ERROR and self.on_error is not None:
+            self.on_error(self.dump())
+
+    def dump(self, last=None):
+        """
+        Formats the recorded events.
+
+        :param last: Number of the latest events, None for all events
+        :type last: int
+        :returns: The events, the oldest first
+        :rtype: list
+        """
+        events = list(self.events)
+        if last is not None:
+            events = events[-last:]
+        return ['{:.3f} {} {}'.format(t, subsystem, render(template, args))
+                for t, subsystem, level, template, args in events]
+
+    def clear(self):
+        """
+        Removes the recorded events.
+        """
+        self.events.clear()
@@ -0,0 +1,199 @@
+"""
+Transports of the LX200 commands.
+
+The :class:`MountTEST.core.protocol.FrameReader` only needs sendall and
+recv_into of its connection, so the commands can be sent over several
+transports:
+
+* :class:`TcpTransport`, the TCP/IP connection to the mount with TCP_NODELAY
+  and keepalive,
+* :class:`SerialTransport`, the RS-232 port of the mount (needs pyserial),
+* :class:`LoopbackTransport`, an in-process connection to a function which
+  answers the commands, ex. :meth:`MountTEST.simulator.SimulatedMount.execute`.
+
+All transports send bytes or memoryviews and receive into the buffer of the
+reader. :func:`open_transport` chooses the transport by the address.
+"""
+import socket
+from functools import partial
+try:
+    import serial
+except ImportError:
+    serial = None
+
+from MountTEST.core.protocol import split_command
+
+
+def enable_keepalive(client, idle=5, interval=2, count=3):
+    """
+    Enables TCP keepalive, so a dead connection is detected by the operating
+    system after idle + interval * count seconds without an answer.
+
+    :param client: The socket
+    :type client: socket.socket
+    """
+    client.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    for option, value in (('TCP_KEEPIDLE', idle), ('TCP_KEEPINTVL', interval), ('TCP_KEEPCNT', count)):
+        if hasattr(socket, option):
+            client.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+
+
+class TcpTransport:
+    """
+    TCP/IP connection to the mount. The commands are short, so Nagle's
+    algorithm is disabled and every command is sent at once.
+
+    :param address: Host and port of the mount
+    :type address: tuple
+    :param timeout: Timeout of the connection in seconds
+    :type timeout: float
+    """
+    def __init__(self, address, timeout=3.):
+        self.address = address
+        self.timeout = timeout
+        self.client = None
+
+    def open(self):
+        self.client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            self.client.settimeout(self.timeout)
+            self.client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            enable_keepalive(self.client)
+            self.client.connect(self.address)
+        except socket.error:
+            self.client.close()
+            raise
+        return self
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+
+    def sendall(self, data):
+        self.client.sendall(data)
+
+    def recv_into(self, buffer):
+        return self.client.recv_into(buffer)
+
+
+class SerialTransport:
+    """
+    RS-232 connection to the mount. A read without data within the timeout
+    raises socket.timeout, like the TCP/IP connection.
+
+    :param port: The serial port, ex. 'COM3' or '/dev/ttyUSB0'
+    :type port: str
+    :param baudrate: Baud rate of the port
+    :type baudrate: int
+    :param timeout: Timeout of a read in seconds
+    :type timeout: float
+    """
+    def __init__(self, port, baudrate=9600, timeout=3.):
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.serial = None
+
+    def open(self):
+        if serial is None:
+            raise socket.error('pyserial is needed for the serial port {}'.format(self.port))
+        try:
+            self.serial = serial.Serial(self.port, self.baudrate, bytesize=serial.EIGHTBITS,
+                                        parity=serial.PARITY_NONE, stopbits=serial.STOPBITS_ONE,
+                                        timeout=self.timeout, write_timeout=self.timeout)
+        except (serial.SerialException, ValueError) as e:
+            raise socket.error(str(e))
+        return self
+
+    def close(self):
+        if self.serial is not None:
+            self.serial.close()
+
+    def sendall(self, data):
+        try:
+            self.serial.write(data)
+        except serial.SerialException as e:
+            raise socket.error(str(e))
+
+    def recv_into(self, buffer):
+        # readinto would wait until the whole buffer is full, so only the
+        # first byte is waited for and then the bytes which have arrived are taken
+        view = memoryview(buffer)
+        try:
+            n = self.serial.readinto(view[:1])
+            if n:
+                waiting = min(self.serial.in_waiting, len(view) - 1)
+                if waiting > 0:
+                    n += self.serial.readinto(view[1:1 + waiting])
+        except serial.SerialException as e:
+            raise socket.error(str(e))
+        if not n:
+            raise socket.timeout('no answer on {}'.format(self.port))
+        return n
+
+
+class LoopbackTransport:
+    """
+    In-process connection to a function, which answers the commands.
+
+    :param respond: Function, which gets a single command like ':GR#' and returns the answer as str
+    :type respond: function
+    """
+    def __init__(self, respond):
+        self.respond = respond
+        self.pending = bytearray()
+        self.closed = False
+
+    def open(self):
+        self.closed = False
+        return self
+
+    def close(self):
+        self.closed = True
+        del self.pending[:]
+
+    def sendall(self, data):
+        if self.closed:
+            raise socket.error('loopback connection is closed')
+        for command in split_command(bytes(data).decode('latin-1')):
+            self.pending += self.respond(command).encode('latin-1')
+
+    def recv_into(self, buffer):
+        if self.closed:
+            raise socket.error('loopback connection is closed')
+        n = min(len(buffer), len(self.pending))
+        if n == 0:
+            raise socket.timeout('no answer in the loopback connection')
+        buffer[:n] = self.pending[:n]
+        del self.pending[:n]
+        return n
+
+
+def loopback(mount):
+    """
+    :param mount: The simulated mount, ex. a :class:`MountTEST.simulator.SimulatedMount`
+    :returns: Address for :func:`open_transport`, which opens in-process connections to the mount
+    :rtype: function
+    """
+    return partial(LoopbackTransport, mount.execute)
+
+
+def open_transport(address, timeout=3.):
+    """
+    Opens the transport of an address.
+
+    :param address: Host and port for TCP/IP, the name of a serial port, or a
+        function which creates a new transport, ex. :func:`loopback`
+    :type address: tuple, str, function
+    :param timeout: Timeout of the connection in seconds
+    :type timeout: float
+    :returns: The opened transport
+    :raises socket.error: If the transport can't be opened
+    """
+    if callable(address):
+        transport = address()
+    elif isinstance(address, str):
+        transport = SerialTransport(address, timeout=timeout)
+    else:
+        transport = TcpTransport(tuple(address), timeout)
+    return transport.open()
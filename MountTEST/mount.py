@@ -17,57 +17,87 @@ import socket
 import serial
 import time
 import numpy as np
-from MountTEST.core.mountcom import MountCom
-from threading import Thread
+from MountTEST.core.mountcom import MountCom, MOUNT_ADDRESS
+from threading import Thread, Lock
 from MountTEST.core.Driver import Chooser
 from .coordinate_correction import CoordinateCorrection
+from .coordinates import signed_components, join_sexagesimal, format_sexagesimal
+from .slew_planner import plan_sequence, DEFAULT_SLEW_RATE
+from MountTEST.core.property_cache import PropertyCache
+from MountTEST.core.dispatcher import ComDispatcher, DriverProxy
+from MountTEST.core.state import read_ascom_state, EMPTY_ASCOM_STATE
+from MountTEST.core.tracing import Tracer, COM, MOUNT, DOME, DEBUG
 from comtypes.client import CreateObject
-try:
-    from comtypes import COMError
-except ImportError:
-    COMError = AttributeError
 from datetime import datetime
+from functools import partial
 
 
 def convert_to_deg_min_sec(dec):
-        dec_deg = int(dec)
-        dec_min = abs(dec-dec_deg)
-        dec_min *= 60
-        dec_sec = dec_min-int(dec_min)
-        dec_sec *= 60
-        dec_min = int(dec_min)
-        return dec_deg, dec_min, dec_sec
+        """
+        Converts degrees to degrees, arcminutes and arcseconds. The sign is carried
+        by the first nonzero component, ex. -0.5 is (0, -30, 0.0).
+        Use :func:`MountTEST.coordinates.signed_components` for arrays.
+        """
+        dec_deg, dec_min, dec_sec = signed_components(dec)
+        return int(dec_deg), int(dec_min), float(dec_sec)
 
 
 def convert_to_hour_min_sec(ra):
-        ra_hour = int(ra)
-        ra_min = ra-ra_hour
-        ra_min *= 60
-        ra_sec = ra_min-int(ra_min)
-        ra_sec *= 60
-        ra_min = int(ra_min)
-        return ra_hour, ra_min, ra_sec
+        """
+        Converts hours to hours, minutes and seconds.
+        Use :func:`MountTEST.coordinates.signed_components` for arrays.
+        """
+        ra_hour, ra_min, ra_sec = signed_components(ra)
+        return int(ra_hour), int(ra_min), float(ra_sec)
 
 
 class Mount(MountCom):
     """
     Main class to communicate with the mount.
+
+    :param telescope_driver: Name of the ASCOM driver, an empty string to choose it, or a function
+        which creates the driver, ex. :class:`MountTEST.simulator.FakeTelescope`
+    :type telescope_driver: str, function
+    :param debug: Debug-object to collect debug information
+    :type debug: :class:`debug.Debug`
+    :param address: Address and port of the mount, ex. of a :class:`MountTEST.simulator.MountSimulator`
+    :type address: tuple
+    :param correction_file: File in which the pointing corrections are stored, None to keep them only in memory
+    :type correction_file: str
+    :param dome_port: Serial port of the lights and the humidifier in the dome
+    :type dome_port: str
     """
-    def __init__(self, telescope_driver='', debug=None):
-        MountCom.__init__(self, debug)
-        self.mount = get_telescope_driver(telescope_driver)
+    # position and status are read from the ASCOM driver by the update-methods
+    poll_fields = (('target_pos', ()),
+                   ('telescope_pos', ()),
+                   ('mount_status', ()),
+                   ('dome_pos', (':GDA#',)),
+                   ('shutter_status', (':GDS#',)),
+                   ('tracking_time', (':Gmte#',)))
+    trace_subsystem = MOUNT
+    # fields, which are computed from the snapshot of the ASCOM driver
+    ascom_poll_fields = ('target_pos', 'telescope_pos', 'mount_status')
+
+    def __init__(self, telescope_driver='', debug=None, address=MOUNT_ADDRESS, correction_file=None,
+                 dome_port='COM4'):
+        MountCom.__init__(self, debug, address)
+        self.dome_port = dome_port
+        # the driver is only used by the thread of the dispatcher and the
+        # status methods are called often, so the driver properties are cached
+        self.dispatcher = ComDispatcher(lambda: get_telescope_driver(telescope_driver))
+        self.dispatcher.start()
+        self.mount = PropertyCache(DriverProxy(self.dispatcher))
+        self.ascom = EMPTY_ASCOM_STATE
+        self.ascom_costs = {}
+        self.ascom_lock = Lock()
         self.debug = debug
         self.add_debug('Mount ini')
 
         self.ser_light = None
-        self.mount_address = ''
-        self.client = None
         self.serialDome = None
-        self.ok = False
         self.outside_command_wait = False
         
         self.connect()
-        self.last_send = time.time()
         self.position_ra = '00:00:00.0'
         self.position_dec = '+00:00:00.0'
         self.target_ra = '00:00:00.0'
@@ -75,10 +105,13 @@ class Mount(MountCom):
         self.status = '0#'
         self.set_time_to_mount()
         time.sleep(1)
-        self.correction = CoordinateCorrection()
+        self.correction = CoordinateCorrection(correction_file)
         self.coordinate_correction = False
 
+        self.update_ascom()
+        self.publish_state()
         self.start()
+        self.start_supervisor()
 
     def get_status(self):
         if not self.is_connected():
@@ -100,18 +133,15 @@ class Mount(MountCom):
         :returns:  True is there is a connection now, else False
         """
         self.add_debug('Connect to mount')
-        try:
-            self.mount_address = ('194.94.209.214', 3490)
-            self.client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.client.settimeout(3)
-            self.client.connect(self.mount_address)
-            self.ok = True
+        if self.open_connection():
             self.add_debug('Connection successful')
-            self.serialDome = SerialDome(self.debug)
-        except socket.error:
-            self.ok = False
+            self.serialDome = SerialDome(self.debug, self.tracer, self.dome_port)
+        else:
             self.add_debug('No connection to mount')
+        # channels which can't be opened now are opened by the supervisor later
+        self.add_debug('own connections for {}', self.open_channels())
         self.mount.Connected = True
+        self.__ascom_changed__(Connected=True)
         return self.ok
 
     def is_connected(self):
@@ -121,7 +151,7 @@ class Mount(MountCom):
         :returns:  True if there is a connection, else False
         """
         self.add_debug('is_connected')
-        return self.mount.Connected
+        return self.ascom.Connected
 
     def close_connection(self):
         """
@@ -131,6 +161,11 @@ class Mount(MountCom):
         """
         self.add_debug('close_connection')
         self.mount.Connected = False
+        self.__ascom_changed__(Connected=False)
+        self.correction.close()
+        self.supervisor.stop()
+        self.close_channels()
+        self.dispatcher.stop()
         try:
             self.active = False
             self.client.close()
@@ -141,7 +176,15 @@ class Mount(MountCom):
             return False
 
     def is_tracking(self):
-        return self.mount.Tracking
+        return self.ascom.Tracking
+
+    def property_cache_stats(self):
+        """
+        :returns: Hits, misses and hit rate of the cached driver properties,
+            see :meth:`MountTEST.core.property_cache.PropertyCache.stats`
+        :rtype: dict
+        """
+        return self.mount.stats()
     
     def send_command_status(self):
         """
@@ -150,23 +193,29 @@ class Mount(MountCom):
         self.add_debug('mount send_command_status')
         if time.time()-self.last_send > 0.1 and self.ok:
             time.sleep(0.1)
-            self.status = self.client.send(':Gstat#')
+            self.status = self.send_command(':Gstat#')
             time.sleep(0.1)
             self.position_ra = self.send_command(':U2#:GR#')
             time.sleep(0.1)
             self.position_dec = self.send_command(':U2#:GD#')
         time.sleep(0.1)
 
-    def send_command_to_mount(self, command):
+    def send_command_to_mount(self, command, channel=None):
         """
         Method sends the command to the mount defined by the address and port via
-        TCP/IP. Returns the received data (if any).
+        TCP/IP. Returns the received data (if any). The answers are framed by
+        :class:`MountTEST.core.protocol.FrameReader`, so the returned data
+        contains exactly the answers of this command.
         
         :param command:
             The command which will send
         :type command: str
+        :param channel: The connection for the command, None for the poll connection
+        :type channel: :class:`MountTEST.core.channel.Channel`
         """
-        self.add_debug('command ' + command)
+        # the poll thread sends through here, so the message is traced as communication
+        self.tracer.trace(COM, DEBUG, 'command {}', command)
+        self.mount.invalidate_command(command)
         if not self.ok:
             if command == ':SDS1#':
                 self.shutter_status = 1
@@ -176,71 +225,142 @@ class Mount(MountCom):
                 
                 self.shutter_status = 2
         if self.ok:
-            try:
-                self.client.send(command)
-                data = self.client.recv(1024)
-                self.last_send = time.time()
-                return data
+            return MountCom.send_command_to_mount(self, command, channel)
 
-            except socket.error:
-                pass
+    def send_commands_to_mount(self, commands, channel=None):
+        """
+        Sends several commands with one write to the mount and splits the answers.
 
-    def update_telescope_pos(self):
+        :param commands:
+            The commands which will send
+        :type commands: list
+        :param channel: The connection for the command, None for the poll connection
+        :type channel: :class:`MountTEST.core.channel.Channel`
+        :returns: The answers of the single commands, None if there is no connection
+        :rtype: list
+        """
+        self.tracer.trace(COM, DEBUG, 'commands {}', commands)
+        if not self.ok:
+            return [self.send_command_to_mount(c) for c in commands]
+        for c in commands:
+            self.mount.invalidate_command(c)
+        return MountCom.send_commands_to_mount(self, commands, channel)
+
+    def send_query_to_mount(self, command, decoder, channel=None):
+        """
+        Sends a query to the mount and decodes the answer.
+
+        :param command:
+            The query which will send
+        :type command: str
+        :param decoder: Decoder of the answer
+        :type decoder: function
+        :param channel: The connection for the command, None for the poll connection
+        :type channel: :class:`MountTEST.core.channel.Channel`
+        :returns: The decoded answer, None if there is no connection
+        """
+        self.tracer.trace(COM, DEBUG, 'query {}', command)
+        if not self.ok:
+            reply = self.send_command_to_mount(command)
+            return decoder(reply) if reply is not None else None
+        return MountCom.send_query_to_mount(self, command, decoder, channel)
+
+    def refresh_state(self, names=None):
+        """
+        Reads the snapshot of the ASCOM driver once, if a field which depends
+        on it must be polled, and updates the fields, see
+        :meth:`MountTEST.core.mountcom.MountCom.refresh_state`.
+        """
+        if names is None or any(name in self.ascom_poll_fields for name in names):
+            self.update_ascom()
+        MountCom.refresh_state(self, names)
+
+    def update_ascom(self):
+        """
+        Reads all needed properties of the ASCOM driver into a new
+        :class:`MountTEST.core.state.AscomState`. The status methods answer from
+        this snapshot, so the number of COM calls doesn't depend on the number
+        of callers.
+
+        :returns: The new snapshot, the previous one if our own changes made the read invalid
+        :rtype: :class:`MountTEST.core.state.AscomState`
+        """
+        generation = self.mount.generation()
         try:
-            ra = self.mount.RightAscension
-            dec = self.mount.Declination
-            
-            ra_hour, ra_min, ra_sec = convert_to_hour_min_sec(ra)
-            
-            dec_deg, dec_min, dec_sec = convert_to_deg_min_sec(dec)
-            self.telescope_ra = [ra_hour, ra_min, round(ra_sec, 2)]
-            self.telescope_dec = [dec_deg, dec_min, round(dec_sec, 2)]
-        except AttributeError:
-            self.telescope_ra = [0, 0, 0.00]
-            self.telescope_dec = [0, 0, 0.00]
+            # all properties are read with one request to the dispatcher
+            ascom = self.dispatcher.execute(self.__read_ascom__, self.ascom)
+        except RuntimeError:
+            # the dispatcher is stopped, the connection is closed
+            return self.ascom
+        with self.ascom_lock:
+            # a write or a change during the read wins, the next cycle reads again
+            if self.mount.store(ascom._asdict(), generation):
+                self.ascom = ascom
+        return self.ascom
+
+    def __read_ascom__(self, driver, previous):
+        return read_ascom_state(partial(getattr, driver), previous, self.ascom_costs)
+
+    def __ascom_changed__(self, **values):
+        """
+        Applies our own changes to the snapshot of the ASCOM driver and
+        polls the status of the mount with the next cycle.
+        """
+        if len(values) > 0:
+            with self.ascom_lock:
+                self.mount.invalidate(*values)
+                self.ascom = self.ascom._replace(**values)
+        self.poll_scheduler.poll_at('mount_status', time.time())
+
+    def ascom_read_costs(self):
+        """
+        :returns: Average duration of a read in seconds of every property in the snapshot
+        :rtype: dict
+        """
+        return dict(self.ascom_costs)
+
+    def update_telescope_pos(self):
+        ra_hour, ra_min, ra_sec = convert_to_hour_min_sec(self.ascom.RightAscension)
+        dec_deg, dec_min, dec_sec = convert_to_deg_min_sec(self.ascom.Declination)
+        self.telescope_ra = [ra_hour, ra_min, round(ra_sec, 2)]
+        self.telescope_dec = [dec_deg, dec_min, round(dec_sec, 2)]
+
+    def telescope_ra_hours(self):
+        return float(join_sexagesimal(*self.telescope_ra))
+
+    def telescope_dec_degrees(self):
+        return float(join_sexagesimal(*self.telescope_dec))
 
     def update_mount_status(self):
         """
         Updates the mount status if there is a connection to the mount.
         If not it will set the default value '-1' which mean_s that there is no connection.
         """
-        if self.mount.Tracking:
-            return '0#'
+        if self.ascom.Slewing:
+            self.status = '6#'
+        elif self.ascom.Tracking:
+            self.status = '0#'
         else:
-            if self.mount.AtPark:
-                return '5#'
+            if self.ascom.AtPark:
+                self.status = '5#'
             else:
-                return '7#'
+                self.status = '7#'
+        return self.status
 
     def update_target_pos(self):
         """
         Updates the target position which is stored in the mount if there is a connection to the mount.
         If not it will set the default values to the target position.
         """
-        err_str = ''
-        try:
-            if self.coordinate_correction:
-                ra = self.mount.TargetRightAscension - self.correction.delta_ra
-                dec = self.mount.Target_declination - self.correction.delta_dec
-            else:
-                err_str += 'read target-pos ra from ascom\n'
-                ra = self.mount.TargetRightAscension
-                err_str += 'read target-pos dec from ascom\n'
-                dec = self.mount.Target_declination
-            err_str += 'convert ra\n'
-            ra_hour, ra_min, ra_sec = convert_to_hour_min_sec(ra)
-            err_str += 'convert dec\n'
-            dec_deg, dec_min, dec_sec = convert_to_deg_min_sec(dec)
-            err_str += 'set ra\n'
-            self.target_ra = [ra_hour, ra_min, round(ra_sec, 2)]
-            err_str += 'set dec'
-            self.target_dec = [dec_deg, dec_min, round(dec_sec, 2)]
-        except COMError:
-            f = open('./error-pos.txt', 'a')
-            f.write(err_str)
-            f.close()
-            self.target_ra = [0, 0, 0.0]
-            self.target_dec = [0, 0, 0.0]
+        ra = self.ascom.TargetRightAscension
+        dec = self.ascom.Target_declination
+        if self.coordinate_correction:
+            ra -= self.correction.delta_ra
+            dec -= self.correction.delta_dec
+        ra_hour, ra_min, ra_sec = convert_to_hour_min_sec(ra)
+        dec_deg, dec_min, dec_sec = convert_to_deg_min_sec(dec)
+        self.target_ra = [ra_hour, ra_min, round(ra_sec, 2)]
+        self.target_dec = [dec_deg, dec_min, round(dec_sec, 2)]
 
     def send_command(self, command):
         """
@@ -254,11 +374,42 @@ class Mount(MountCom):
         :returns:  The return value of mount if there is one, else None
         """
 
-        self.add_debug('mount send_command {}'.format(command))
+        self.add_debug('mount send_command {}', command)
         self.outside_command_wait = True
         output = self.set_command(command)
         return output
 
+    def send_commands(self, commands):
+        """
+        Sends several commands with one write to the mount, so they need only one
+        round trip together. Returns the answers of the single commands.
+
+        :param commands:
+            The commands which will send
+        :type commands: list
+
+        :returns:  The return values of the mount in the same order as the commands
+        :rtype: list
+        """
+        self.add_debug('mount send_commands {}', commands)
+        return self.set_commands(commands)
+
+    def query(self, command):
+        """
+        Sends a query to the mount and returns the typed answer instead of the raw
+        '...#' string, ex. :meth:`get_jd` returns 'JJJJJJJ.JJJJJ#', while
+        query(':GJD#') returns the float. The decoders are listed in
+        :data:`MountTEST.core.decoders.DECODERS`.
+
+        :param command:
+            The query which will send, ex. ':U2#:Gg#'
+        :type command: str
+
+        :returns:  The decoded answer, None if there is no connection
+        """
+        self.add_debug('mount query {}', command)
+        return self.set_query(command)
+
     def shutdown(self):
         """
         Switches off the mount.
@@ -311,6 +462,8 @@ class Mount(MountCom):
             The :MA# command will slew to the alt-azimuth coordinates defined
             by the commands :Sa (Set target altitude) and :Sz (Set target azimuth). 
             After slewing to the target position, the mount will not track the object.
+
+        :returns: The handle of the slew, see :class:`MountTEST.core.mountcom.SlewHandle`
         """
         alt_deg = int(alt_deg)
         alt_min = int(alt_min)
@@ -324,6 +477,9 @@ class Mount(MountCom):
         if self.mount.Tracking:
             self.mount.Tracking = False
         self.mount.SlewToAltAzAsync(az_deg, alt_deg)
+        slew = self.track_slew('SlewToAltAzAsync')
+        self.__ascom_changed__(Tracking=False, Slewing=True)
+        return slew
 
     def __slewAltAz__(self, alt_deg, alt_min, alt_sec, az_deg, az_min, az_sec):
         """
@@ -364,29 +520,26 @@ class Mount(MountCom):
             The :MA# command will slew to the alt-azimuth coordinates defined
             by the commands :Sa (Set target altitude) and :Sz (Set target azimuth). 
             After slewing to the target position, the mount will not track the object.
+            The lights of the dome are switched off, when the slew is finished.
+
+        :returns: The handle of the slew, see :class:`MountTEST.core.mountcom.SlewHandle`,
+            None if the target isn't set
         """
-        self.add_debug('mount slewALTAZ {}:{}:{} {}:{}:{}'.format(alt_deg, alt_min, alt_sec,
-                                                                  az_deg, az_min, az_sec))
+        self.add_debug('mount slewALTAZ {}:{}:{} {}:{}:{}', alt_deg, alt_min, alt_sec,
+                       az_deg, az_min, az_sec)
         alt_ok = self.set_alt(alt_deg, alt_min, alt_sec)
         time.sleep(0.1)
         az_ok = self.set_az(az_deg, az_min, az_sec)
         time.sleep(0.1)
         if alt_ok == '1' and az_ok == '1':
             self.serialDome.lights_on()
-            slew = self.send_command(':MA#')
-            time.sleep(0.1)
-            if slew == '0':
-                stat = self.status
-                counter = 0
-                while stat == '6#':
-                    stat = self.status
-                    self.send_command_status()
-                    time.sleep(0.1)
-                    counter += 1
-                else:
-                    self.serialDome.lights_off()
-
-                return slew
+            slew = self.track_slew(':MA#', self.send_command(':MA#'))
+            slew.add_done_callback(self.__lights_off__)
+            self.__ascom_changed__()
+            return slew
+
+    def __lights_off__(self, slew):
+        self.serialDome.lights_off()
 
     def time_sycro(self):
         """
@@ -399,15 +552,24 @@ class Mount(MountCom):
         self.mount.UTCDate = date
 
     def is_slewing(self):
-        return bool(self.mount.Slewing)
+        return bool(self.ascom.Slewing)
 
     def slew_ra_dec(self, ra_hour, ra_min, ra_sec, dec_deg, dec_min, dec_sec):
-        ra_hour += float(ra_min)/60+float(ra_sec)/3600
-        dec_deg += float(dec_min)/60+float(dec_sec)/3600
+        ra = float(join_sexagesimal(ra_hour, ra_min, ra_sec))
+        dec = float(join_sexagesimal(dec_deg, dec_min, dec_sec))
 
-        self.slew_ra_dec_degree(ra_hour, dec_deg)
+        return self.slew_ra_dec_degree(ra, dec)
 
     def slew_ra_dec_degree(self, ra, dec):
+        """
+        Slews to the coordinates, the mount tracks the object after the slew.
+
+        :param ra: Right ascension in hours
+        :type ra: float
+        :param dec: Declination in degrees
+        :type dec: float
+        :returns: The handle of the slew, see :class:`MountTEST.core.mountcom.SlewHandle`
+        """
         self.unpark()
         if not self.mount.Tracking:
             self.mount.Tracking = True
@@ -419,6 +581,9 @@ class Mount(MountCom):
         self.mount.TargetRightAscension = ra
         self.mount.Target_declination = dec
         self.mount.SlewToCoordinatesAsync(ra, dec)
+        slew = self.track_slew('SlewToCoordinatesAsync')
+        self.__ascom_changed__(Tracking=True, Slewing=True, TargetRightAscension=ra, Target_declination=dec)
+        return slew
 
     def switch_correction(self):
         """
@@ -432,6 +597,76 @@ class Mount(MountCom):
                                 self.mount.Target_declination)
         return self.coordinate_correction
 
+    def plan_slew_sequence(self, targets, min_altitude=0., rate=None):
+        """
+        Orders the targets, so that the total slew time from the current position
+        is minimal. See :func:`MountTEST.slew_planner.plan_sequence`.
+
+        :param targets: Right ascensions in hours and declinations in degrees of the targets
+        :type targets: numpy.ndarray
+        :param min_altitude: Lowest altitude of a target in degrees, lower targets are skipped
+        :type min_altitude: float
+        :param rate: Slew rate of the mount in degrees/s, None to use the maximal rate of the mount
+        :type rate: float
+        :return: The indices of the targets in the order of observation and the estimated total slew time in seconds
+        :rtype: tuple
+        """
+        targets = np.asarray(targets, dtype=float).reshape(-1, 2)
+        if rate is None:
+            rate = self.query(':GMsb#') or DEFAULT_SLEW_RATE
+        self.add_debug('mount plan_slew_sequence {} targets', len(targets))
+        return plan_sequence(targets[:, 0], targets[:, 1], self.mount.SiderealTime, self.mount.SiteLatitude,
+                             start=(self.mount.RightAscension, self.mount.Declination), rate=rate,
+                             min_altitude=min_altitude)
+
+    def slew_sequence(self, targets, min_altitude=0., rate=None):
+        """
+        Slews to the targets in the order of :meth:`plan_slew_sequence`. The target
+        coordinates of all slews are formatted at once, :Sr and :Sd are sent with
+        one write and :MS# follows, if the mount has accepted both coordinates, else
+        the target is skipped. After a slew has finished, the index of the
+        target is yielded, so the caller can observe it before the next slew::
+
+            for index, answer in mount.slew_sequence(targets):
+                take_image(index)
+
+        :param targets: Right ascensions in hours and declinations in degrees of the targets
+        :type targets: numpy.ndarray
+        :param min_altitude: Lowest altitude of a target in degrees, lower targets are skipped
+        :type min_altitude: float
+        :param rate: Slew rate of the mount in degrees/s, None to use the maximal rate of the mount
+        :type rate: float
+        :return: Generator of the index of the target and the answer of :MS#, '0' if the slew was successful,
+            None if the mount rejected the coordinates
+        """
+        targets = np.asarray(targets, dtype=float).reshape(-1, 2)
+        order, total = self.plan_slew_sequence(targets, min_altitude, rate)
+        ra = targets[order, 0]
+        dec = targets[order, 1]
+        if self.coordinate_correction:
+            for i in range(len(order)):
+                delta_ra, delta_dec = self.correction.get_correction(ra[i], dec[i])
+                ra[i] += delta_ra
+                dec[i] += delta_dec
+        # rounded to the hundredths of a second first, so 23:59:59.999 becomes 00:00:00.00 and not 24:00:00.00
+        ra = format_sexagesimal(np.round(ra % 24 * 360000.) / 360000. % 24)
+        dec = format_sexagesimal(dec, sign=True, digits=1, separator='*')
+        self.unpark()
+        if not self.mount.Tracking:
+            self.mount.Tracking = True
+            self.__ascom_changed__(Tracking=True)
+        for i, index in enumerate(order):
+            ra_ok, dec_ok = self.send_commands([':Sr{}#'.format(ra[i]), ':Sd{}#'.format(dec[i])])
+            slew = None
+            if ra_ok == '1' and dec_ok == '1':
+                # else the mount would slew to the previous target
+                slew = self.send_command(':MS#')
+            if slew == '0':
+                handle = self.track_slew(':MS#', slew)
+                self.__ascom_changed__()
+                handle.wait(600.)
+            yield int(index), slew
+
     def __slew_ra_dec__(self, ra_hour, ra_min, ra_sec, dec_deg, dec_min, dec_sec):
         """
         Slew to target object.
@@ -453,29 +688,23 @@ class Mount(MountCom):
             declination). It is assumed that the coordinates are apparent, 
             topo-centric and NOT corrected for refraction. After slewing to the
             target position, the mount will track the object.
+            The lights of the dome are switched off, when the slew is finished.
+
+        :returns: The handle of the slew, see :class:`MountTEST.core.mountcom.SlewHandle`,
+            None if the target isn't set
         """
-        self.add_debug('mount slew_rADEC {}:{}:{} {}:{}:{}'.format(ra_hour, ra_min, ra_sec,
-                                                                   dec_deg, dec_min, dec_sec))
+        self.add_debug('mount slew_rADEC {}:{}:{} {}:{}:{}', ra_hour, ra_min, ra_sec,
+                       dec_deg, dec_min, dec_sec)
 
         ra_ok = self.set_ra(int(ra_hour), int(ra_min), float(ra_sec))
         dec_ok = self.set_dec(int(dec_deg), int(dec_min), float(dec_sec))
 
         if ra_ok == '1' and dec_ok == '1':
             self.serialDome.lights_on()
-            slew = self.send_command(':MS#')
-            if slew == '0':
-                time.sleep(0.5)
-                stat = self.status
-
-                while stat == '6#':
-                    stat_loop = self.status
-                    if len(stat_loop.split(':')) == 1:
-                        stat = stat_loop
-                    time.sleep(0.1)
-                else:
-                    self.serialDome.lights_off()
-
-                return slew
+            slew = self.track_slew(':MS#', self.send_command(':MS#'))
+            slew.add_done_callback(self.__lights_off__)
+            self.__ascom_changed__()
+            return slew
 
     def move_east(self):
         """
@@ -647,6 +876,7 @@ class Mount(MountCom):
         Halt all current slewing.
         """
         self.mount.AbortSlew()
+        self.__ascom_changed__()
 
     def __stopSlew__(self):
         """
@@ -763,7 +993,7 @@ class Mount(MountCom):
         
         :returns:  nothing
         """
-        self.add_debug('mount slew_rate {}'.format(n))
+        self.add_debug('mount slew_rate {}', n)
 
         command = ':RC{}#'.format(n)
         rate = self.send_command(command)
@@ -779,7 +1009,7 @@ class Mount(MountCom):
         
         :returns:  nothing
         """
-        self.add_debug('mount guide_rate {}'.format(n))
+        self.add_debug('mount guide_rate {}', n)
         if n > 2 or n < 0:
             err = "Invalid value for n. Allowed values for n are 0, 1, 2. "
             return err
@@ -798,7 +1028,7 @@ class Mount(MountCom):
         
         :returns:  nothing
         """
-        self.add_debug('mount slew_rate_ra {}'.format(ddd))
+        self.add_debug('mount slew_rate_ra {}', ddd)
         if ddd > 100:
             err = "Rate cannot be higher than 99.9999999. Decrease the value and use \
             the right format DD.DDDDDDD (up to 7 decimal places)."
@@ -819,7 +1049,7 @@ class Mount(MountCom):
         
         :returns:  nothing
         """
-        self.add_debug('mount slew_rate_dec {}'.format(ddd))
+        self.add_debug('mount slew_rate_dec {}', ddd)
         if ddd > 100:
             err = "Rate cannot be higher than 99.9999999. Decrease the value and use \
             the right format DD.DDDDDDD (up to 7 decimal places)."
@@ -921,14 +1151,10 @@ class Mount(MountCom):
         """
         self.add_debug('mount get_telescope_dec ')
 
-        if as_str:
-            dec = self.telescope_dec
-            
-            if type(dec[0]) == int:
-                for i in range(len(dec)):
-                    dec[i] = str(dec[i])
-            return dec
-        return self.telescope_dec
+        dec = self.state.telescope_dec
+        if as_str and type(dec[0]) == int:
+            return tuple([str(d) for d in dec])
+        return dec
 
     def get_target_dec(self):
         """
@@ -939,10 +1165,10 @@ class Mount(MountCom):
         """
         self.add_debug('mount get_target_dec ')
 
-        return self.target_dec
+        return self.state.target_dec
 
     def split_coord_ra(self, coord):
-        self.add_debug('mount split_coord_ra {}'.format(coord))
+        self.add_debug('mount split_coord_ra {}', coord)
         try:
             ra_hour = coord[0:2]
             ra_min = coord[3:5]
@@ -963,7 +1189,7 @@ class Mount(MountCom):
         :returns: Three string with dd, mm, and ss.s
         :rtype: list
         """
-        self.add_debug('mount split_coord_dec {}'.format(coord))
+        self.add_debug('mount split_coord_dec {}', coord)
         try:
             dec_deg = coord[0:3]
             dec_min = coord[4:6]
@@ -1249,14 +1475,10 @@ class Mount(MountCom):
         """
         self.add_debug('mount get_telescope_ra ')
 
-        if as_str:
-            ra = self.telescope_ra
-            
-            if type(ra[0]) == int:
-                for i in range(len(ra)):
-                    ra[i] = str(ra[i])
-            return ra
-        return self.telescope_ra
+        ra = self.state.telescope_ra
+        if as_str and type(ra[0]) == int:
+            return tuple([str(r) for r in ra])
+        return ra
 
     def get_target_ra(self):
         """
@@ -1267,7 +1489,7 @@ class Mount(MountCom):
         """
         self.add_debug('mount get_target_ra ')
         
-        return self.target_ra
+        return self.state.target_ra
 
     def get_pressure_in_model(self):
         """
@@ -1376,7 +1598,7 @@ class Mount(MountCom):
         """
         self.add_debug('mount get_telescope_status ')
 
-        status = self.status
+        status = self.state.status
 
         return status
 
@@ -1452,7 +1674,7 @@ class Mount(MountCom):
         """
         self.add_debug('mount get_estimate_tracking_time ')
 
-        return self.tracking_time
+        return self.state.tracking_time
 
     def get_flip_setting(self):
         """
@@ -1532,7 +1754,7 @@ class Mount(MountCom):
         temperature sensors. 11, 12, 13 are available only if a physical keypad
         version 2 is connected to the mount.
         """
-        self.add_debug('mount get_temperature {}'.format(n))
+        self.add_debug('mount get_temperature {}', n)
 
         temperature = self.send_command(':GTMPn#')
 
@@ -1546,7 +1768,7 @@ class Mount(MountCom):
         """
         self.add_debug('mount get_tracking_status ')
 
-        return self.mount.Tracking
+        return self.ascom.Tracking
 
     def get_park_status(self):
         """
@@ -1555,10 +1777,7 @@ class Mount(MountCom):
         :return: True if the mount is parked, else False
         :rtype: bool
         """
-        try:
-            return self.mount.AtPark
-        except AttributeError:
-            return True
+        return self.ascom.AtPark
 
     def get_obj_tracking_status(self):
         """
@@ -1739,6 +1958,7 @@ class Mount(MountCom):
         else:
             self.send_command(':hP#')
             self.mount.Park()
+            self.__ascom_changed__(Tracking=False)
     
     def unpark(self):
         th = Thread(target=self.__unpark__)
@@ -1754,6 +1974,7 @@ class Mount(MountCom):
             self.add_debug('mount unpark ')
             if self.is_parked():
                 self.mount.Unpark()
+                self.__ascom_changed__(AtPark=False)
                 return 0
             else:
                 return 1
@@ -1762,7 +1983,7 @@ class Mount(MountCom):
         return -1
 
     def is_parked(self):
-        return self.mount.AtPark
+        return self.ascom.AtPark
 
     # ******************************************************************************
     # ******************************************************************************
@@ -1783,7 +2004,7 @@ class Mount(MountCom):
         
         :returns: 0 if the input is invalid or 1 if the input is valid
         """
-        self.add_debug('mount set_alt {}:{}:{}'.format(alt_deg, alt_min, alt_sec))
+        self.add_debug('mount set_alt {}:{}:{}', alt_deg, alt_min, alt_sec)
         # =======================================================
         #   Creating the correct format for Alt
 
@@ -1802,7 +2023,7 @@ class Mount(MountCom):
         :returns: 0 if the input is invalid or 1 if the input is valid
         """
         
-        self.add_debug('mount set_az {}:{}:{}'.format(az_deg, az_min, az_sec))
+        self.add_debug('mount set_az {}:{}:{}', az_deg, az_min, az_sec)
 
         # final command for Az
         az = ':Sz{:03d}*{:02d}:{:02d}#'.format(az_deg, az_min, az_sec)
@@ -1819,7 +2040,7 @@ class Mount(MountCom):
         
         :returns: 0 if the input is invalid or 1 if the input is valid
         """
-        self.add_debug('mount set_ra {}:{}:{}'.format(ra_hour, ra_min, ra_sec))
+        self.add_debug('mount set_ra {}:{}:{}', ra_hour, ra_min, ra_sec)
         # =======================================================
         #   Creating the correct format for RA
 
@@ -1836,12 +2057,13 @@ class Mount(MountCom):
         
         :returns: 0 if the input is invalid or 1 if the input is valid
         """
-        self.add_debug('mount set_dec {}:{}:{}'.format(dec_deg, dec_min, dec_sec))
+        self.add_debug('mount set_dec {}:{}:{}', dec_deg, dec_min, dec_sec)
         # =======================================================
         #   Creating the correct format for DEC
 
-        # final command for DEC
-        dec = ':Sd{:02d}:{:02d}:{:05.2f}#'.format(dec_deg, dec_min, dec_sec)
+        # final command for DEC, the sign can be carried by any component
+        dec = join_sexagesimal(dec_deg, dec_min, dec_sec)
+        dec = ':Sd{}#'.format(format_sexagesimal(dec, sign=True, digits=1, separator='*'))
         dec_ok = self.send_command(dec)
 
         return dec_ok
@@ -1854,7 +2076,7 @@ class Mount(MountCom):
         :returns: 0 if the input is invalid or 1 if the input is valid
         """
         
-        self.add_debug('mount set_date {}-{}-{}'.format(yyyy, mm, dd))
+        self.add_debug('mount set_date {}-{}-{}', yyyy, mm, dd)
 
         command = ':SC{:04d}-{:02d}-{:02d}#'.format(yyyy, mm, dd)
         date = self.send_command(command)
@@ -1868,7 +2090,7 @@ class Mount(MountCom):
         :returns: 0 if the input is invalid or 1 if the input is valid
         """
 
-        self.add_debug('mount set_elev {}'.format(xxxxx))
+        self.add_debug('mount set_elev {}', xxxxx)
         if xxxxx < -1000 or xxxxx > 9999.9:
             err = "Value for elevation is invalid. This number has to be \
             in the range of -1000.0 and 9999.9"
@@ -1891,7 +2113,7 @@ class Mount(MountCom):
         :returns: 0 if the input is invalid or 1 if the input is valid
         """
 
-        self.add_debug('mount set_long {}:{}:{}'.format(dd, mm, ss))
+        self.add_debug('mount set_long {}:{}:{}', dd, mm, ss)
 
         long = self.send_command(':Sg{:+04d}*{:02d}:{:04.1f}#'.format(dd, mm, ss))
 
@@ -1904,7 +2126,7 @@ class Mount(MountCom):
         :returns: 0 if the input is invalid or 1 if the input is valid
         """
 
-        self.add_debug('mount set_local_offset {}'.format(hh))
+        self.add_debug('mount set_local_offset {}', hh)
 
         offset = self.send_command(':SG{:+4.1f}#'.format(hh))
 
@@ -1917,7 +2139,7 @@ class Mount(MountCom):
         :returns: 0 if the input is invalid or 1 if the input is valid
         """
 
-        self.add_debug('mount set_high_alt_limit {}'.format(dd))
+        self.add_debug('mount set_high_alt_limit {}', dd)
 
         alt = self.send_command(':Sh{:+03d}#'.format(dd))
 
@@ -1934,7 +2156,7 @@ class Mount(MountCom):
         seconds, there is no valid value for the Julian Date, so you cannot
         use this command to set time during leap seconds.
         """
-        self.add_debug('mount setJd {}'.format(jd))
+        self.add_debug('mount setJd {}', jd)
 
         if jd < 1000000:
             err = "Type the julian date in format jjjjjjj.jjjjjjjj"
@@ -1948,12 +2170,28 @@ class Mount(MountCom):
         Uses the local time on the computer the set a new local time to
         the mount.
         """
+        self.set_local_time(*self.__local_time__())
+
+    @staticmethod
+    def __local_time__():
+        """
+        :returns: Hour, minute and seconds of the local time on the computer
+        :rtype: tuple
+        """
         date = datetime.now()
         date = date.strftime("%Y,%m,%d,%H,%M,%S,%f")
         date = date.split(',')
         seconds = int(date[-2])+float(date[-1])/1000000
         seconds = round(seconds, 2)
-        self.set_local_time(int(date[3]), int(date[4]), seconds)
+        return int(date[3]), int(date[4]), seconds
+
+    def session_commands(self):
+        """
+        :returns: The commands which set up a new connection: the high precision
+            mode and the local time of the computer
+        :rtype: list
+        """
+        return MountCom.session_commands(self) + [':SL{:02d}:{:02d}:{:05.2f}#'.format(*self.__local_time__())]
 
     def set_local_time(self, hh, mm, ss):
         """
@@ -1971,7 +2209,7 @@ class Mount(MountCom):
 
         BEWARE of the leap seconds.
         """
-        self.add_debug('mount set_local_time {}:{}:{}'.format(hh, mm, ss))
+        self.add_debug('mount set_local_time {}:{}:{}', hh, mm, ss)
 
         self.send_command(':SL{:02d}:{:02d}:{:05.2f}#'.format(hh, mm, ss))
 
@@ -1997,8 +2235,8 @@ class Mount(MountCom):
         
         BEWARE of the leap second.
         """
-        self.add_debug('mount set_local_date_time {}-{}-{} {}:{}:{}'.format(yyyy, mm, dd,
-                                                                            hh, m, ss))
+        self.add_debug('mount set_local_date_time {}-{}-{} {}:{}:{}', yyyy, mm, dd,
+                       hh, m, ss)
 
         full_date = self.send_command(':SLDT{:04d}-{:02d}-{:02d},{:02d}:{:02d}:{:05.2f}'.format(yyyy, mm, dd,
                                                                                                 hh, m, ss))
@@ -2013,7 +2251,7 @@ class Mount(MountCom):
         
         BEWARE of the leap second.
         """
-        self.add_debug('mount set_utc_date_time {}-{}-{} {}:{}:{}'.format(yyyy, mm, dd, hh, mm, ss))
+        self.add_debug('mount set_utc_date_time {}-{}-{} {}:{}:{}', yyyy, mm, dd, hh, mm, ss)
 
         utc_date = self.send_command(':SUDT{:04d}-{:02d}-{:02d},{:02d}:{:02d}:{:05.2f}'.format(yyyy, mm, dd,
                                                                                                hh, m, ss))
@@ -2032,7 +2270,7 @@ class Mount(MountCom):
         
         :returns: 0 if the input is invalid or 1 if the input is valid
         """
-        self.add_debug('mount set_meridian_side {}'.format(n))
+        self.add_debug('mount set_meridian_side {}', n)
 
         command = self.send_command(':SMF{}'.format(n))
 
@@ -2044,7 +2282,7 @@ class Mount(MountCom):
         
         :returns: 0 if the input is invalid or 1 if the input is valid
         """
-        self.add_debug('mount setLewAltLimit {}'.format(dd))
+        self.add_debug('mount setLewAltLimit {}', dd)
 
         command = self.send_command(':So{:+02d}#'.format(dd))
         return command
@@ -2057,7 +2295,7 @@ class Mount(MountCom):
             
         :returns: 0 if the input is invalid or 1 if the input is valid
         """
-        self.add_debug('mount set_refraction {}'.format(n))
+        self.add_debug('mount set_refraction {}', n)
 
         refraction = self.send_command(':SREF{}#'.format(n))
 
@@ -2070,7 +2308,7 @@ class Mount(MountCom):
         
         :returns: 0 if the input is invalid or 1 if the input is valid
         """
-        self.add_debug('mount set_pressure_in_model {}'.format(p))
+        self.add_debug('mount set_pressure_in_model {}', p)
 
         command = self.send_command(":SRPRS{:06.1f}#".format(p))
 
@@ -2083,7 +2321,7 @@ class Mount(MountCom):
         
         :returns: 0 if the input is invalid or 1 if the input is valid
         """
-        self.add_debug('mount set_temp_in_model {}'.format(temperature))
+        self.add_debug('mount set_temp_in_model {}', temperature)
 
         command = self.send_command(':SRTMP{:+06.1f}#'.format(temperature))
 
@@ -2112,7 +2350,7 @@ class Mount(MountCom):
         
         :returns: 0 if the input is invalid or 1 if the input is valid
         """
-        self.add_debug('mount set_meridian_track_limit {}'.format(dd))
+        self.add_debug('mount set_meridian_track_limit {}', dd)
 
         degree = str(dd)
 
@@ -2131,7 +2369,7 @@ class Mount(MountCom):
         
         :returns: 0 if the input is invalid or 1 if the input is valid
         """
-        self.add_debug('mount set_meridian_slew_limit {}'.format(dd))
+        self.add_debug('mount set_meridian_slew_limit {}', dd)
 
         degree = str(dd)
 
@@ -2146,7 +2384,7 @@ class Mount(MountCom):
         
         :returns: nothing
         """
-        self.add_debug('mount setUnattenedFlip {}'.format(n))
+        self.add_debug('mount setUnattenedFlip {}', n)
 
         command = self.send_command(':Suaf{}#'.format(n))
 
@@ -2166,7 +2404,7 @@ class Mount(MountCom):
         
         :returns: 0 if the input is invalid or 1 if the input is valid
         """
-        self.add_debug('mount set_lat {}:{}:{}'.format(dd, mm, ss))
+        self.add_debug('mount set_lat {}:{}:{}', dd, mm, ss)
 
         command = self.send_command(':St{:+03d}*{:02d}:{:04.1f}#'.format(dd, mm, ss))
 
@@ -2217,7 +2455,7 @@ class Mount(MountCom):
             connection is lost afterwards.
         """
 
-        self.add_debug('mount setLanConfig {}'.format(string))
+        self.add_debug('mount setLanConfig {}', string)
 
         lan = self.send_command(':SIP{}#'.format(string))
 
@@ -2395,7 +2633,7 @@ class Mount(MountCom):
         :returns: 1 valid
         """
 
-        self.add_debug('mount track_custom_ra {}'.format(x))
+        self.add_debug('mount track_custom_ra {}', x)
 
         command = self.send_command(':RR{:+09.4f}#'.format(x))
 
@@ -2408,7 +2646,7 @@ class Mount(MountCom):
         :returns: 1 valid
         """
 
-        self.add_debug('mount track_custom DEC {}'.format(x))
+        self.add_debug('mount track_custom DEC {}', x)
 
         command = self.send_command(':RR{:+09.4f}#'.format(x))
 
@@ -2534,7 +2772,7 @@ class Mount(MountCom):
         
         :returns: "0#" if the command failed or "1#" if the command succeeded.
         """
-        self.add_debug('mount adjustDimeTime {}'.format(x))
+        self.add_debug('mount adjustDimeTime {}', x)
 
         command = self.send_command(':NUtim{:+04d}#'.format(x))
 
@@ -2548,10 +2786,9 @@ class SerialDummy:
     def __init__(self, debug):
         self.debug = debug
 
-    def write(self, text):
-        text = text + ''
+    def write(self, data):
         self.dummy()
-        return text
+        return len(data)
 
     def open(self):
         self.dummy()
@@ -2566,11 +2803,23 @@ class SerialDummy:
 class SerialDome:
     """
     Class to interact with devices which are connected via a serial port.
+
+    :param debug: Debug-object to collect debug information
+    :type debug: :class:`debug.Debug`
+    :param tracer: Tracer of the debug messages, None for an own tracer
+    :type tracer: :class:`MountTEST.core.tracing.Tracer`
+    :param port: The serial port, ex. 'COM4' or '/dev/ttyUSB0'
+    :type port: str
+    :param baudrate: Baud rate of the port
+    :type baudrate: int
     """
-    def __init__(self, debug=None):
+    def __init__(self, debug=None, tracer=None, port='COM4', baudrate=19200):
 
         self.ser_light = None
+        self.port = port
+        self.baudrate = baudrate
         self.debug = debug
+        self.tracer = tracer if tracer is not None else Tracer(debug)
         if self.debug is not None:
             self.add_debug('init SerialDome')
         self.connect()
@@ -2584,8 +2833,8 @@ class SerialDome:
         try:
             self.ser_light = serial.Serial()
     
-            self.ser_light.port = 'COM4'
-            self.ser_light.baudrate = 19200
+            self.ser_light.port = self.port
+            self.ser_light.baudrate = self.baudrate
             self.ser_light.parity = serial.PARITY_NONE
             self.ser_light.stopbits = serial.STOPBITS_ONE
             self.ser_light.bytesize = serial.EIGHTBITS
@@ -2597,18 +2846,14 @@ class SerialDome:
                 self.add_debug('name error connect SerialDome')
             self.ser_light = SerialDummy(self.debug)
 
-    def add_debug(self, text):
+    def add_debug(self, text, *args):
         """
         Adds the text to the debug-file.
         
-        :param text: the text
+        :param text: the text or a template for the arguments
         :type text: str
         """
-        try:
-            if self.debug is not None:
-                self.debug.add(text)
-        except ValueError:
-            pass
+        self.tracer.trace(DOME, DEBUG, text, *args)
 
     def close_connection(self):
         """
@@ -2630,9 +2875,9 @@ class SerialDome:
             # dome lights ON
             self.ser_light.open()
             # self.ser_light.isOpen()
-            self.ser_light.write('SE15\r\n')
+            self.ser_light.write(b'SE15\r\n')
             time.sleep(.100)
-            self.ser_light.write('SO1\r\n')
+            self.ser_light.write(b'SO1\r\n')
             time.sleep(.100)
             #        self.ser_light.close()
     
@@ -2649,9 +2894,9 @@ class SerialDome:
             # dome lights OFF
             self.ser_light.open()
             # self.ser_light.isOpen()
-            self.ser_light.write('SE15\r\n')
+            self.ser_light.write(b'SE15\r\n')
             time.sleep(.100)
-            self.ser_light.write('SO0\r\n')
+            self.ser_light.write(b'SO0\r\n')
             time.sleep(.100)
             #        self.ser_light.close()
     
@@ -2666,9 +2911,9 @@ class SerialDome:
         Turns the humidifier on.
         """
         self.ser_light.open()
-        self.ser_light.write('SE15\r\n')
+        self.ser_light.write(b'SE15\r\n')
         time.sleep(.100)
-        self.ser_light.write('SO2\r\n')
+        self.ser_light.write(b'SO2\r\n')
         time.sleep(.100)
         self.ser_light.close()
         self.humidifier_on = True
@@ -2678,9 +2923,10 @@ class TcpDome:
     """
     Class to interact with the dome.
     """
-    def __init__(self, mount, debug=None):
+    def __init__(self, mount, debug=None, tracer=None):
         self.mount = mount
         self.debug = debug
+        self.tracer = tracer if tracer is not None else Tracer(debug)
 
     def open_shutter(self):
         th = Thread(target=self.__open_shutter__)
@@ -2732,7 +2978,7 @@ class TcpDome:
 
         self.add_debug('TcpDome get_az ')
 
-        az = self.mount.dome_pos
+        az = self.mount.get_state().dome_pos
         try:
             az = az.split('#')[0]
             try:
@@ -2823,7 +3069,7 @@ class TcpDome:
         :returns: nothing
         """
 
-        self.add_debug('TcpDome get_domeUpdateInt {}'.format(s))
+        self.add_debug('TcpDome get_domeUpdateInt {}', s)
 
         command = self.mount.send_command(':SDU{:02d}'.format(s))
 
@@ -2839,7 +3085,7 @@ class TcpDome:
         
         :returns: 0 if the argument is invalid (angle out of ammissible range) or 1 if the argument is valid
         """
-        self.add_debug('TcpDome slew_dome {}'.format(x))
+        self.add_debug('TcpDome slew_dome {}', x)
 
         self.mount.send_command(':SDA{:04d}#'.format(x))
 
@@ -2863,20 +3109,18 @@ class TcpDome:
 
         return command
 
-    def add_debug(self, text):
+    def add_debug(self, text, *args):
         """
         Adds a the text to the debug file.
-        :param text: new text for the debug file
+        :param text: new text or a template for the arguments
         :type text: str
         """
-        try:
-            if self.debug is not None:
-                self.debug.add(text)
-        except ValueError:
-            pass
+        self.tracer.trace(DOME, DEBUG, text, *args)
 
 
 def get_telescope_driver(telescope_driver=''):
+    if callable(telescope_driver):
+        return telescope_driver()
     if telescope_driver != '':
         return CreateObject(telescope_driver)
     c = Chooser(device_type='telescope')
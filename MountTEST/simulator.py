@@ -0,0 +1,635 @@
+"""
+Local simulator of a 10Micron mount for tests and benchmarks.
+
+The simulator implements the LX200/10Micron commands which are used by this
+package and simulates the slews of the mount with a finite slew rate. The
+network can be made worse with the latency, jitter, partial frame and drop
+knobs.
+
+Example::
+
+    simulator = MountSimulator(latency=0.002)
+    simulator.start()
+    com = MountCom(address=simulator.address)
+    com.open_connection()
+    com.start()
+
+or from the command line::
+
+    python -m MountTEST.simulator --port 3490 --latency 0.005
+
+:class:`FakeTelescope` is an ASCOM telescope driver without COM for the same
+simulated mount.
+"""
+import math
+import random
+import socket
+import time
+from threading import Thread, Lock, current_thread
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+from MountTEST.core.protocol import split_command, reply_kinds, FRAME_REPLY, SLEW_REPLY, DATE_REPLY
+from MountTEST.coordinates import format_sexagesimal, parse_sexagesimal
+
+SIDEREAL_RATE = 1.00273790935
+# answer of the mount to a valid date
+DATE_ANSWER = '1Updating Planetary Data#' + ' ' * 32 + '#'
+
+
+def julian_date(t=None):
+    """
+    Returns the Julian date of the unix time t.
+
+    :param t: Unix time, None for the current time
+    :type t: float
+    :rtype: float
+    """
+    if t is None:
+        t = time.time()
+    return t / 86400. + 2440587.5
+
+
+def local_sidereal_time(longitude, t=None):
+    """
+    Returns the local sidereal time.
+
+    :param longitude: Longitude of the site in degrees, east positive
+    :type longitude: float
+    :param t: Unix time, None for the current time
+    :type t: float
+    :returns: The local sidereal time in hours
+    :rtype: float
+    """
+    gmst = 18.697374558 + 24.06570982441908 * (julian_date(t) - 2451545.0)
+    return (gmst + longitude / 15.) % 24
+
+
+class SimulatedMount:
+    """
+    State of the simulated mount and the execution of the commands.
+
+    :param latitude: Latitude of the site in degrees
+    :type latitude: float
+    :param longitude: Longitude of the site in degrees, east positive
+    :type longitude: float
+    :param slew_rate: Slew rate of the axes in degrees per second
+    :type slew_rate: float
+    :param dome: True if the mount controls a dome, else False
+    :type dome: bool
+    """
+    def __init__(self, latitude=51.5, longitude=7.5, slew_rate=5., dome=True):
+        self.lock = Lock()
+        self.latitude = latitude
+        self.longitude = longitude
+        self.elevation = 100.
+        self.slew_rate = slew_rate
+        self.max_slew_rate = 15.
+        self.dome = dome
+        self.last_update = time.time()
+        # start three hours east of the meridian, far away from the tracking limit
+        self.ra = (local_sidereal_time(longitude) + 3) % 24
+        self.dec = latitude
+        self.target_ra = self.ra
+        self.target_dec = self.dec
+        self.target_alt = 0.
+        self.target_az = 0.
+        self.status = '0#'
+        self.after_slew = '0#'
+        self.shutter_status = 1
+        self.meridian_track_limit = 15
+        self.meridian_slew_limit = 10
+        self.high_limit = 90
+        self.low_limit = 0
+        self.unattended_flip = 0
+        self.logging = False
+        self.log = []
+        self.commands = 0
+
+    def lst(self, t=None):
+        return local_sidereal_time(self.longitude, t)
+
+    def hour_angle(self):
+        """
+        :returns: The hour angle of the telescope in hours from -12 to 12
+        :rtype: float
+        """
+        return (self.lst() - self.ra + 12) % 24 - 12
+
+    def alt_az(self):
+        """
+        :returns: Altitude and azimuth of the telescope in degrees
+        :rtype: tuple
+        """
+        ha = math.radians(self.hour_angle() * 15)
+        dec = math.radians(self.dec)
+        lat = math.radians(self.latitude)
+        alt = math.asin(math.sin(dec) * math.sin(lat) + math.cos(dec) * math.cos(lat) * math.cos(ha))
+        az = math.atan2(-math.cos(dec) * math.sin(ha),
+                        math.sin(dec) * math.cos(lat) - math.cos(dec) * math.sin(lat) * math.cos(ha))
+        return math.degrees(alt), math.degrees(az) % 360
+
+    def update(self, now=None):
+        """
+        Moves the axes of the mount up to the time now.
+
+        :param now: Unix time, None for the current time
+        :type now: float
+        """
+        if now is None:
+            now = time.time()
+        dt = now - self.last_update
+        self.last_update = now
+        if self.status in ('7#', '1#', '5#'):
+            # tracking is off, the hour angle stays constant
+            self.ra = (self.ra + dt * SIDEREAL_RATE / 3600.) % 24
+        if self.status in ('6#', '2#'):
+            step = self.slew_rate * dt
+            d_ra = ((self.target_ra - self.ra + 12) % 24 - 12) * 15
+            d_dec = self.target_dec - self.dec
+            if abs(d_ra) <= step and abs(d_dec) <= step:
+                self.ra = self.target_ra
+                self.dec = self.target_dec
+                self.status = self.after_slew
+            else:
+                self.ra = (self.ra + math.copysign(min(step, abs(d_ra)), d_ra) / 15) % 24
+                self.dec += math.copysign(min(step, abs(d_dec)), d_dec)
+
+    def start_slew(self, ra, dec, after_slew='0#'):
+        """
+        Starts a slew to the coordinates.
+
+        :returns: '0' if the slew starts, else the error message of the mount
+        :rtype: str
+        """
+        if self.status == '5#':
+            return '4Mount Parked                #'
+        self.target_ra = ra % 24
+        self.target_dec = dec
+        self.after_slew = after_slew
+        self.status = '6#'
+        return '0'
+
+    def tracking_time(self):
+        """
+        :returns: The minutes until the meridian tracking limit is reached
+        :rtype: int
+        """
+        limit = self.meridian_track_limit / 15.
+        return max(int((limit - self.hour_angle()) * 60 / SIDEREAL_RATE), 0)
+
+    def execute(self, command):
+        """
+        Executes a single command.
+
+        :param command: The command, ex. ':GR#'
+        :type command: str
+        :returns: The answer of the mount, an empty string if the command has no answer
+        :rtype: str
+        """
+        with self.lock:
+            self.update()
+            self.commands += 1
+            if self.logging:
+                self.log.append(command)
+            return self.__execute__(command.rstrip('#')[1:])
+
+    def __execute__(self, c):
+        if c.startswith('U') or c in ('EMUAP', 'EMULX', 'RT9', 'RT0', 'RT1', 'TM', 'T+', 'T-'):
+            return ''
+        elif c == 'GR':
+            return format_sexagesimal(self.ra) + '#'
+        elif c == 'GD':
+            return format_sexagesimal(self.dec, sign=True, digits=1) + '#'
+        elif c == 'Gr':
+            return format_sexagesimal(self.target_ra) + '#'
+        elif c == 'Gd':
+            return format_sexagesimal(self.target_dec, sign=True, digits=1) + '#'
+        elif c == 'GA':
+            return format_sexagesimal(self.alt_az()[0], sign=True, digits=1) + '#'
+        elif c == 'GZ':
+            return format_sexagesimal(self.alt_az()[1], digits=1, width=3) + '#'
+        elif c == 'Gstat':
+            return self.status
+        elif c == 'GS':
+            return format_sexagesimal(self.lst()) + '#'
+        elif c in ('GJD', 'GJD1', 'GJD2'):
+            return '{:.8f}#'.format(julian_date())
+        elif c == 'Gg':
+            return format_sexagesimal(-self.longitude, sign=True, digits=1, width=3) + '#'
+        elif c == 'Gt':
+            return format_sexagesimal(self.latitude, sign=True, digits=1) + '#'
+        elif c == 'Gev':
+            return '{:+07.1f}#'.format(self.elevation)
+        elif c == 'Gh':
+            return '{:+03d}#'.format(self.high_limit)
+        elif c == 'Go':
+            return '{:+03d}#'.format(self.low_limit)
+        elif c == 'Glmt':
+            return '{:02d}#'.format(self.meridian_track_limit)
+        elif c == 'Glms':
+            return '{:02d}#'.format(self.meridian_slew_limit)
+        elif c == 'Gmte':
+            return '{:04d}#'.format(self.tracking_time())
+        elif c == 'GMsb':
+            return '{:02d}#'.format(int(self.max_slew_rate))
+        elif c in ('GMs', 'GMsa'):
+            return '{:02d}#'.format(int(self.slew_rate))
+        elif c == 'Guaf':
+            return '{}#'.format(self.unattended_flip)
+        elif c == 'GTRK':
+            return '1#' if self.status == '0#' else '0#'
+        elif c == 'GVP':
+            return '10micron GM2000HPS#'
+        elif c == 'GVN':
+            return '2.15.1#'
+        elif c == 'GVD':
+            return 'Jan 01 2018#'
+        elif c == 'GVT':
+            return '12:00:00#'
+        elif c == 'GVZ':
+            return 'Q-TYPE2012#'
+        elif c == 'GETID':
+            return '00000000000000000001#'
+        elif c == 'pS':
+            return 'West#' if self.hour_angle() < 0 else 'East#'
+        elif c == 'GDA':
+            if not self.dome:
+                return '9999#'
+            return '{:04d}#'.format(int(self.alt_az()[1] * 10) % 3600)
+        elif c == 'GDS':
+            return '{}#'.format(self.shutter_status if self.dome else 0)
+        elif c in ('SDS1', 'SDS2'):
+            self.shutter_status = int(c[-1])
+            return '1'
+        elif c.startswith('Sr'):
+            return self.__set_value__('target_ra', c[2:])
+        elif c.startswith('Sd'):
+            return self.__set_value__('target_dec', c[2:])
+        elif c.startswith('Sa'):
+            return self.__set_value__('target_alt', c[2:])
+        elif c.startswith('Sz'):
+            return self.__set_value__('target_az', c[2:])
+        elif c.startswith('Slmt'):
+            self.meridian_track_limit = int(float(c[4:]))
+            return '1'
+        elif c.startswith('Slms'):
+            self.meridian_slew_limit = int(float(c[4:]))
+            self.meridian_track_limit = max(self.meridian_track_limit, self.meridian_slew_limit)
+            return '1'
+        elif c.startswith('Sw'):
+            self.slew_rate = min(float(c[2:]), self.max_slew_rate)
+            return '1'
+        elif c.startswith('Suaf'):
+            self.unattended_flip = int(c[4:])
+            return '1'
+        elif c.startswith('MSfs') or c == 'MS':
+            return self.start_slew(self.target_ra, self.target_dec)
+        elif c == 'MA':
+            alt = math.radians(self.target_alt)
+            az = math.radians(self.target_az)
+            lat = math.radians(self.latitude)
+            dec = math.asin(math.sin(alt) * math.sin(lat) + math.cos(alt) * math.cos(lat) * math.cos(az))
+            ha = math.atan2(-math.sin(az) * math.cos(alt),
+                            math.sin(alt) * math.cos(lat) - math.cos(alt) * math.sin(lat) * math.cos(az))
+            return self.start_slew(self.lst() - math.degrees(ha) / 15, math.degrees(dec), '7#')
+        elif c == 'FLIP':
+            if self.status != '0#':
+                return '0'
+            self.start_slew(self.ra, self.dec)
+            return '1'
+        elif c in ('Q', 'STOP') or c.startswith('Q'):
+            if self.status == '6#':
+                self.status = '7#' if c != 'STOP' else '1#'
+            elif c == 'STOP':
+                self.status = '1#'
+            return ''
+        elif c == 'hP':
+            self.start_slew(self.lst() - 0., self.latitude, '5#')
+            self.status = '2#'
+            return ''
+        elif c in ('PO', 'AP'):
+            if self.status in ('5#', '7#', '1#'):
+                self.status = '0#'
+            return ''
+        elif c == 'startlog':
+            self.logging = True
+            self.log = []
+            return '1'
+        elif c == 'stoplog':
+            self.logging = False
+            return '1'
+        elif c == 'getlog':
+            return '\n'.join(self.log) + '#'
+        elif c == 'shutdown':
+            return '1'
+        # answer unknown commands with the kind of answer the mount would send
+        kinds = reply_kinds(':' + c + '#')
+        if len(kinds) == 0:
+            return ''
+        elif kinds[0] == FRAME_REPLY:
+            return '0#'
+        elif kinds[0] == SLEW_REPLY:
+            return '3Cannot Perform Slew         #'
+        elif kinds[0] == DATE_REPLY:
+            return DATE_ANSWER
+        return '1'
+
+    def __set_value__(self, name, text):
+        try:
+            setattr(self, name, parse_sexagesimal(text.strip()))
+            return '1'
+        except ValueError:
+            return '0'
+
+
+class FakeTelescope:
+    """
+    Pure Python stand-in for an ASCOM telescope driver, for tests and
+    benchmarks without COM. The telescope moves like the :class:`SimulatedMount`,
+    which can be shared with a :class:`MountSimulator`.
+
+    Like a COM object of a single threaded apartment, it may only be used by
+    the thread which created it, and every access can take a configured time.
+
+    :param mount: The simulated mount, None for a default mount
+    :type mount: :class:`SimulatedMount`
+    :param call_latency: Duration of every property access or method call in seconds
+    :type call_latency: float
+    :param apartment: True if an access from another thread raises a RuntimeError
+    :type apartment: bool
+    """
+    def __init__(self, mount=None, call_latency=0., apartment=True):
+        self.mount = mount if mount is not None else SimulatedMount()
+        self.call_latency = call_latency
+        self.apartment = apartment
+        self.owner = current_thread()
+        self.calls = 0
+        self.connected = False
+        self.utc_date = None
+
+    def __access__(self):
+        if self.apartment and current_thread() is not self.owner:
+            raise RuntimeError('The application called an interface that was marshalled for a different thread')
+        self.calls += 1
+        if self.call_latency > 0:
+            time.sleep(self.call_latency)
+
+    def __read__(self, name):
+        self.__access__()
+        with self.mount.lock:
+            self.mount.update()
+            return getattr(self.mount, name)
+
+    @property
+    def Connected(self):
+        self.__access__()
+        return self.connected
+
+    @Connected.setter
+    def Connected(self, value):
+        self.__access__()
+        self.connected = bool(value)
+
+    @property
+    def Tracking(self):
+        status = self.__read__('status')
+        return status == '0#' or (status == '6#' and self.mount.after_slew == '0#')
+
+    @Tracking.setter
+    def Tracking(self, value):
+        self.__access__()
+        if value:
+            self.mount.execute(':AP#')
+        else:
+            with self.mount.lock:
+                if self.mount.status == '0#':
+                    self.mount.status = '7#'
+
+    @property
+    def AtPark(self):
+        return self.__read__('status') == '5#'
+
+    @property
+    def Slewing(self):
+        return self.__read__('status') in ('6#', '2#')
+
+    @property
+    def RightAscension(self):
+        return self.__read__('ra')
+
+    @property
+    def Declination(self):
+        return self.__read__('dec')
+
+    @property
+    def TargetRightAscension(self):
+        return self.__read__('target_ra')
+
+    @TargetRightAscension.setter
+    def TargetRightAscension(self, value):
+        self.__access__()
+        self.mount.target_ra = value % 24
+
+    @property
+    def TargetDeclination(self):
+        return self.__read__('target_dec')
+
+    @TargetDeclination.setter
+    def TargetDeclination(self, value):
+        self.__access__()
+        self.mount.target_dec = value
+
+    # name of the target declination, which is used by :class:`MountTEST.mount.Mount`
+    Target_declination = TargetDeclination
+
+    @property
+    def SiderealTime(self):
+        self.__access__()
+        return self.mount.lst()
+
+    @property
+    def SiteLatitude(self):
+        return self.__read__('latitude')
+
+    @property
+    def UTCDate(self):
+        self.__access__()
+        return self.utc_date
+
+    @UTCDate.setter
+    def UTCDate(self, value):
+        self.__access__()
+        self.utc_date = value
+
+    def Park(self):
+        self.__access__()
+        self.mount.execute(':hP#')
+
+    def Unpark(self):
+        self.__access__()
+        self.mount.execute(':PO#')
+
+    def SlewToCoordinatesAsync(self, ra, dec):
+        self.__access__()
+        with self.mount.lock:
+            self.mount.update()
+            answer = self.mount.start_slew(ra, dec)
+        if answer != '0':
+            raise ValueError(answer[1:].strip('# '))
+
+    def SlewToAltAzAsync(self, az, alt):
+        self.__access__()
+        with self.mount.lock:
+            self.mount.target_az = az
+            self.mount.target_alt = alt
+        self.mount.execute(':MA#')
+
+    def AbortSlew(self):
+        self.__access__()
+        self.mount.execute(':Q#')
+
+
+class SimulatorHandler(socketserver.BaseRequestHandler):
+    """
+    Handles one connection to the simulator.
+    """
+    def handle(self):
+        simulator = self.server.simulator
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        data = ''
+        while simulator.active:
+            try:
+                chunk = self.request.recv(4096)
+            except socket.error:
+                return
+            if not chunk:
+                return
+            data += chunk.decode('latin-1')
+            # keep an incomplete command for the next read
+            cut = data.rfind('#') + 1
+            commands, data = data[:cut], data[cut:]
+            if commands == '':
+                continue
+            reply = ''.join([simulator.reply(c) for c in split_command(commands)])
+            if reply != '':
+                try:
+                    simulator.send(self.request, reply.encode('latin-1'))
+                except socket.error:
+                    return
+
+
+class SimulatorServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class MountSimulator(Thread):
+    """
+    TCP server which simulates a 10Micron mount.
+
+    :param host: Host name of the server
+    :type host: str
+    :param port: Port of the server, 0 for a free port
+    :type port: int
+    :param latency: Delay of every answer in seconds
+    :type latency: float
+    :param jitter: Maximal additional random delay of every answer in seconds
+    :type jitter: float
+    :param partial_frames: Probability that an answer is sent in several small parts
+    :type partial_frames: float
+    :param drop_rate: Probability that an answer is not sent
+    :type drop_rate: float
+    :param mount: The simulated mount, None for a default mount
+    :type mount: :class:`SimulatedMount`
+    :param seed: Seed of the random numbers
+    :type seed: int
+    """
+    def __init__(self, host='127.0.0.1', port=0, latency=0., jitter=0., partial_frames=0.,
+                 drop_rate=0., mount=None, seed=None):
+        Thread.__init__(self)
+        self.daemon = True
+        if mount is None:
+            mount = SimulatedMount()
+        self.mount = mount
+        self.latency = latency
+        self.jitter = jitter
+        self.partial_frames = partial_frames
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+        self.active = True
+        self.server = SimulatorServer((host, port), SimulatorHandler)
+        self.server.simulator = self
+        self.address = self.server.server_address
+
+    def reply(self, command):
+        """
+        Executes the command and returns the answer, which can be dropped.
+
+        :param command: A single command
+        :type command: str
+        :rtype: str
+        """
+        reply = self.mount.execute(command)
+        if reply != '' and self.drop_rate > 0 and self.random.random() < self.drop_rate:
+            return ''
+        return reply
+
+    def send(self, client, reply):
+        """
+        Sends the answer to the client with the configured latency and splits it
+        into several parts if partial frames are enabled.
+
+        :param client: The connection to the client
+        :type client: socket.socket
+        :param reply: The answer
+        :type reply: bytes
+        """
+        delay = self.latency
+        if self.jitter > 0:
+            delay += self.random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if self.partial_frames > 0 and len(reply) > 1 and self.random.random() < self.partial_frames:
+            pos = 0
+            while pos < len(reply):
+                size = self.random.randint(1, max(len(reply) // 2, 1))
+                client.sendall(reply[pos:pos + size])
+                pos += size
+                time.sleep(0.0005)
+        else:
+            client.sendall(reply)
+
+    def run(self):
+        self.server.serve_forever(poll_interval=0.1)
+
+    def stop(self):
+        """
+        Stops the server.
+        """
+        self.active = False
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Simulator of a 10Micron mount')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=3490)
+    parser.add_argument('--latency', type=float, default=0.)
+    parser.add_argument('--jitter', type=float, default=0.)
+    parser.add_argument('--partial-frames', type=float, default=0.)
+    parser.add_argument('--drop-rate', type=float, default=0.)
+    parser.add_argument('--no-dome', action='store_true')
+    args = parser.parse_args()
+    sim = MountSimulator(args.host, args.port, args.latency, args.jitter, args.partial_frames,
+                         args.drop_rate, SimulatedMount(dome=not args.no_dome))
+    print('Mount simulator at {}:{}'.format(*sim.address))
+    sim.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        sim.stop()
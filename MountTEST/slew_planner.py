@@ -0,0 +1,213 @@
+"""
+Ordering of a list of targets, so that the total slew time is minimal.
+
+The slew time between two targets is estimated from the mechanical axes of
+the German equatorial mount: both axes move at the same time with the
+maximal slew rate, so the time is the larger angle of both axes divided by
+the rate. A target on the other side of the meridian needs a different pier
+side, the declination axis then moves through the pole and the slew is
+correspondingly longer, so unnecessary meridian flips are avoided by the
+metric itself.
+
+The order is a nearest neighbour tour from the current position, which is
+improved with 2-opt moves. All positions and slew times are computed with
+NumPy for the whole target list.
+"""
+import numpy as np
+
+PIER_EAST = 0
+PIER_WEST = 1
+
+DEFAULT_SLEW_RATE = 2.
+SETTLE_TIME = 2.
+
+
+def horizontal_coordinates(ra, dec, lst, latitude):
+    """
+    Converts equatorial coordinates to altitude and azimuth.
+
+    :param ra: Right ascensions in hours
+    :type ra: numpy.ndarray
+    :param dec: Declinations in degrees
+    :type dec: numpy.ndarray
+    :param lst: Local sidereal time in hours
+    :type lst: float
+    :param latitude: Latitude of the site in degrees
+    :type latitude: float
+    :returns: Altitudes and azimuths (north over east) in degrees
+    :rtype: tuple
+    """
+    ha = np.radians(hour_angle(ra, lst) * 15)
+    dec = np.radians(np.asarray(dec, dtype=float))
+    lat = np.radians(latitude)
+    alt = np.arcsin(np.sin(dec) * np.sin(lat) + np.cos(dec) * np.cos(lat) * np.cos(ha))
+    az = np.arctan2(-np.cos(dec) * np.sin(ha),
+                    np.sin(dec) * np.cos(lat) - np.cos(dec) * np.sin(lat) * np.cos(ha))
+    return np.degrees(alt), np.degrees(az) % 360
+
+
+def hour_angle(ra, lst):
+    """
+    :returns: The hour angles in hours between -12 and 12, positive west of the meridian
+    :rtype: numpy.ndarray
+    """
+    return (lst - np.asarray(ra, dtype=float) + 12) % 24 - 12
+
+
+def pier_side(ra, lst):
+    """
+    Predicts the pier side of the mount for the targets. Targets west of the
+    meridian are observed from the east side of the pier and vice versa.
+
+    :param ra: Right ascensions in hours
+    :type ra: numpy.ndarray
+    :param lst: Local sidereal time in hours
+    :type lst: float
+    :returns: PIER_EAST or PIER_WEST for every target
+    :rtype: numpy.ndarray
+    """
+    return np.where(hour_angle(ra, lst) >= 0, PIER_EAST, PIER_WEST)
+
+
+def axis_angles(ra, dec, lst):
+    """
+    Returns the angles of the mechanical axes of the mount for the targets.
+
+    :param ra: Right ascensions in hours
+    :type ra: numpy.ndarray
+    :param dec: Declinations in degrees
+    :type dec: numpy.ndarray
+    :param lst: Local sidereal time in hours
+    :type lst: float
+    :returns: Angles of the right ascension and of the declination axis in degrees
+    :rtype: tuple
+    """
+    ha = hour_angle(ra, lst) * 15
+    dec = np.asarray(dec, dtype=float)
+    west = pier_side(ra, lst) == PIER_WEST
+    return np.where(west, ha + 90, ha - 90), np.where(west, 180 - dec, dec)
+
+
+def slew_times(ra, dec, lst, rate=DEFAULT_SLEW_RATE, settle_time=SETTLE_TIME):
+    """
+    Estimates the slew times between all targets.
+
+    :param ra: Right ascensions in hours
+    :type ra: numpy.ndarray
+    :param dec: Declinations in degrees
+    :type dec: numpy.ndarray
+    :param lst: Local sidereal time in hours
+    :type lst: float
+    :param rate: Slew rate of the mount in degrees per second
+    :type rate: float
+    :param settle_time: Time to settle after a slew in seconds
+    :type settle_time: float
+    :returns: Matrix of the slew times in seconds
+    :rtype: numpy.ndarray
+    """
+    axis1, axis2 = axis_angles(ra, dec, lst)
+    times = np.maximum(np.abs(axis1[:, None] - axis1[None, :]),
+                       np.abs(axis2[:, None] - axis2[None, :])) / rate + settle_time
+    np.fill_diagonal(times, 0)
+    return times
+
+
+def nearest_neighbour(times):
+    """
+    Builds a tour from the first position, which always moves to the nearest
+    position which isn't visited yet.
+
+    :param times: Matrix of the slew times
+    :type times: numpy.ndarray
+    :returns: The order of the positions, starting with 0
+    :rtype: numpy.ndarray
+    """
+    n = len(times)
+    visited = np.zeros(n, dtype=bool)
+    order = np.zeros(n, dtype=int)
+    visited[0] = True
+    for i in range(1, n):
+        row = np.where(visited, np.inf, times[order[i - 1]])
+        order[i] = np.argmin(row)
+        visited[order[i]] = True
+    return order
+
+
+def two_opt(order, times, max_passes=50):
+    """
+    Improves an open tour with a fixed start by reversing parts of it, as long
+    as a reversal shortens the tour.
+
+    :param order: The tour, the first position isn't moved
+    :type order: numpy.ndarray
+    :param times: Matrix of the slew times
+    :type times: numpy.ndarray
+    :param max_passes: Maximal number of passes over the tour
+    :type max_passes: int
+    :returns: The improved tour
+    :rtype: numpy.ndarray
+    """
+    order = np.array(order)
+    n = len(order)
+    for p in range(max_passes):
+        improved = False
+        for i in range(1, n - 1):
+            # reverse order[i:j + 1] for all j > i at once
+            a = order[i - 1]
+            b = order[i]
+            c = order[i + 1:]
+            d = np.append(order[i + 2:], -1)
+            old = times[a, b] + np.where(d >= 0, times[c, d], 0)
+            new = times[a, c] + np.where(d >= 0, times[b, d], 0)
+            delta = new - old
+            k = np.argmin(delta)
+            if delta[k] < -1e-9:
+                j = i + 1 + k
+                order[i:j + 1] = order[i:j + 1][::-1]
+                improved = True
+        if not improved:
+            break
+    return order
+
+
+def plan_sequence(ra, dec, lst, latitude, start=None, rate=DEFAULT_SLEW_RATE,
+                  settle_time=SETTLE_TIME, min_altitude=0.):
+    """
+    Orders the targets, so that the total slew time from the start position
+    is minimal. Targets below min_altitude are skipped.
+
+    :param ra: Right ascensions of the targets in hours
+    :type ra: numpy.ndarray
+    :param dec: Declinations of the targets in degrees
+    :type dec: numpy.ndarray
+    :param lst: Local sidereal time in hours
+    :type lst: float
+    :param latitude: Latitude of the site in degrees
+    :type latitude: float
+    :param start: Right ascension and declination of the current position, None to start at the first target
+    :type start: tuple
+    :param rate: Slew rate of the mount in degrees per second
+    :type rate: float
+    :param settle_time: Time to settle after a slew in seconds
+    :type settle_time: float
+    :param min_altitude: Lowest altitude of a target in degrees
+    :type min_altitude: float
+    :returns: The indices of the targets in the order of observation and the estimated total slew time in seconds
+    :rtype: tuple
+    """
+    ra = np.atleast_1d(np.asarray(ra, dtype=float))
+    dec = np.atleast_1d(np.asarray(dec, dtype=float))
+    alt, az = horizontal_coordinates(ra, dec, lst, latitude)
+    visible = np.flatnonzero(alt >= min_altitude)
+    if len(visible) == 0:
+        return visible, 0.
+    if start is None:
+        # start at the most eastern target, it sets last
+        first = visible[np.argmin(hour_angle(ra[visible], lst))]
+        start = (ra[first], dec[first])
+    points_ra = np.concatenate(([start[0]], ra[visible]))
+    points_dec = np.concatenate(([start[1]], dec[visible]))
+    times = slew_times(points_ra, points_dec, lst, rate, settle_time)
+    order = two_opt(nearest_neighbour(times), times)
+    total = float(times[order[:-1], order[1:]].sum())
+    return visible[order[1:] - 1], total
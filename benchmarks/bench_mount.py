@@ -0,0 +1,295 @@
+"""
+Benchmarks of the communication with the mount.
+
+The benchmarks run against the local :class:`MountTEST.simulator.MountSimulator`
+and measure
+
+* the round trip of a single command through the command queue of the poll
+  thread (the path of :meth:`MountTEST.mount.Mount.send_command`),
+* a full state refresh and the number of poll cycles per second,
+* N concurrent caller threads which are sending commands,
+* lookups with :meth:`MountTEST.core.mountcom.MountCom.get_command_output`,
+* N concurrent caller threads which are reading properties of a
+  :class:`MountTEST.simulator.FakeTelescope` through the
+  :class:`MountTEST.core.dispatcher.ComDispatcher`.
+
+The results are written as JSON to benchmarks/results, so the results of
+different versions can be compared::
+
+    python benchmarks/bench_mount.py --latency 0.001 --threads 8
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from threading import Thread
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from MountTEST.core.mountcom import MountCom, Command
+from MountTEST.core.dispatcher import ComDispatcher, DriverProxy
+from MountTEST.simulator import MountSimulator, FakeTelescope
+
+RESULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def percentile(values, p):
+    """
+    Returns the p-th percentile of the sorted values.
+
+    :param values: Sorted values
+    :type values: list
+    :param p: Percentile from 0 to 100
+    :type p: float
+    :rtype: float
+    """
+    if len(values) == 0:
+        return float('nan')
+    k = (len(values) - 1) * p / 100.
+    low = int(k)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (k - low)
+
+
+def summary(latencies, duration):
+    """
+    Summarizes the latencies of a benchmark.
+
+    :param latencies: The latencies of the single operations in seconds
+    :type latencies: list
+    :param duration: Wall clock time of the benchmark in seconds
+    :type duration: float
+    :returns: Count, throughput and the percentiles in milliseconds
+    :rtype: dict
+    """
+    values = sorted(latencies)
+    return {'count': len(values),
+            'duration_s': duration,
+            'throughput_per_s': len(values) / duration if duration > 0 else float('nan'),
+            'mean_ms': 1000 * sum(values) / len(values) if values else float('nan'),
+            'p50_ms': 1000 * percentile(values, 50),
+            'p95_ms': 1000 * percentile(values, 95),
+            'p99_ms': 1000 * percentile(values, 99),
+            'max_ms': 1000 * values[-1] if values else float('nan')}
+
+
+def new_mount_com(simulator, channels=False):
+    """
+    Creates a connected :class:`MountCom` with a running poll thread.
+
+    :param channels: True if the commands should use their own connections
+    :type channels: bool
+    """
+    com = MountCom(address=simulator.address)
+    if not com.open_connection():
+        raise RuntimeError('no connection to the simulator at {}:{}'.format(*simulator.address))
+    if channels:
+        com.open_channels()
+    com.start()
+    return com
+
+
+def stop_mount_com(com):
+    com.active = False
+    com.join()
+    com.close_channels()
+    com.client.close()
+
+
+def bench_single_command(simulator, n, command=':Gstat#', channels=False):
+    """
+    Round trip of single commands through the command queue of the poll thread
+    or with the own connection for the commands. The default query isn't
+    answered from :class:`MountTEST.core.response_cache.ResponseCache`.
+    """
+    com = new_mount_com(simulator, channels)
+    latencies = []
+    start = time.time()
+    for i in range(n):
+        t = time.time()
+        com.set_command(command)
+        latencies.append(time.time() - t)
+    duration = time.time() - start
+    stop_mount_com(com)
+    return summary(latencies, duration)
+
+
+def bench_state_refresh(simulator, n):
+    """
+    Latency of a full state refresh without the poll thread.
+    """
+    com = MountCom(address=simulator.address)
+    com.open_connection()
+    latencies = []
+    start = time.time()
+    for i in range(n):
+        t = time.time()
+        com.refresh_state()
+        latencies.append(time.time() - t)
+    duration = time.time() - start
+    com.client.close()
+    return summary(latencies, duration)
+
+
+def bench_poll_cycles(simulator, duration):
+    """
+    Number of full poll cycles per second of the poll thread, if every field
+    is polled in every cycle.
+    """
+    com = MountCom(address=simulator.address)
+    com.open_connection()
+    com.time_dif = 0
+    for name, queries in com.poll_fields:
+        for state in com.poll_scheduler.intervals:
+            com.poll_scheduler.set_interval(name, 0, state)
+    com.poll_scheduler.no_dome_interval = 0
+    cycles = []
+    refresh_state = com.refresh_state
+
+    def counted_refresh(names=None):
+        t = time.time()
+        refresh_state(names)
+        cycles.append(time.time() - t)
+    com.refresh_state = counted_refresh
+    com.start()
+    time.sleep(duration)
+    stop_mount_com(com)
+    return summary(cycles, duration)
+
+
+def bench_concurrent_callers(simulator, threads, n, command=':Gstat#', channels=False):
+    """
+    Latencies of N threads which are sending commands at the same time, the
+    default query isn't answered from the response cache.
+    """
+    com = new_mount_com(simulator, channels)
+    latencies = [[] for i in range(threads)]
+
+    def caller(out):
+        for i in range(n):
+            t = time.time()
+            com.set_command(command)
+            out.append(time.time() - t)
+    workers = [Thread(target=caller, args=(latencies[i],)) for i in range(threads)]
+    start = time.time()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    duration = time.time() - start
+    stop_mount_com(com)
+    return summary([t for out in latencies for t in out], duration)
+
+
+def bench_command_output(queue_size, n):
+    """
+    Lookups of command outputs with get_command_output.
+    """
+    com = MountCom()
+    com.command_output_queue = [Command(i, ':GVP#', '10micron GM2000HPS#') for i in range(queue_size)]
+    ids = [random.randrange(queue_size) for i in range(n)]
+    latencies = []
+    start = time.time()
+    for command_id in ids:
+        t = time.time()
+        com.get_command_output(command_id)
+        latencies.append(time.time() - t)
+    duration = time.time() - start
+    return summary(latencies, duration)
+
+
+def bench_com_dispatcher(threads, n, call_latency, name='AtPark'):
+    """
+    Latencies of N threads which are reading a property of the ASCOM driver
+    through the dispatcher.
+    """
+    dispatcher = ComDispatcher(lambda: FakeTelescope(call_latency=call_latency))
+    dispatcher.start()
+    driver = DriverProxy(dispatcher)
+    latencies = [[] for i in range(threads)]
+
+    def caller(out):
+        for i in range(n):
+            t = time.time()
+            getattr(driver, name)
+            out.append(time.time() - t)
+    workers = [Thread(target=caller, args=(latencies[i],)) for i in range(threads)]
+    start = time.time()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    duration = time.time() - start
+    dispatcher.stop()
+    result = summary([t for out in latencies for t in out], duration)
+    result.update(dispatcher.stats())
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.STDOUT).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks of the mount communication')
+    parser.add_argument('-n', type=int, default=1000, help='operations per benchmark')
+    parser.add_argument('--threads', type=int, default=8, help='number of concurrent callers')
+    parser.add_argument('--latency', type=float, default=0., help='latency of the simulator in seconds')
+    parser.add_argument('--jitter', type=float, default=0., help='jitter of the simulator in seconds')
+    parser.add_argument('--duration', type=float, default=3., help='duration of the poll cycle benchmark')
+    parser.add_argument('--queue-size', type=int, default=1000, help='size of the command output queue')
+    parser.add_argument('--com-latency', type=float, default=0.0005,
+                        help='duration of a call of the fake ASCOM driver in seconds')
+    parser.add_argument('--output', default='', help='result file, default benchmarks/results/<time>.json')
+    args = parser.parse_args()
+
+    simulator = MountSimulator(latency=args.latency, jitter=args.jitter, seed=1)
+    simulator.start()
+    results = {'single_command': bench_single_command(simulator, args.n),
+               'single_command_channels': bench_single_command(simulator, args.n, channels=True),
+               'state_refresh': bench_state_refresh(simulator, args.n),
+               'poll_cycles': bench_poll_cycles(simulator, args.duration),
+               'concurrent_callers': bench_concurrent_callers(simulator, args.threads,
+                                                              max(args.n // args.threads, 1)),
+               'concurrent_callers_channels': bench_concurrent_callers(simulator, args.threads,
+                                                                       max(args.n // args.threads, 1),
+                                                                       channels=True),
+               'command_output': bench_command_output(args.queue_size, args.n),
+               'com_dispatcher': bench_com_dispatcher(args.threads, max(args.n // args.threads, 1),
+                                                      args.com_latency)}
+    simulator.stop()
+
+    report = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'revision': git_revision(),
+              'python': platform.python_version(),
+              'platform': platform.platform(),
+              'parameters': vars(args),
+              'results': results}
+    output = args.output
+    if output == '':
+        if not os.path.exists(RESULT_DIR):
+            os.makedirs(RESULT_DIR)
+        output = os.path.join(RESULT_DIR, 'bench_{}.json'.format(time.strftime('%Y%m%d_%H%M%S')))
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+    print('{:<30}{:>10}{:>12}{:>10}{:>10}{:>10}'.format('benchmark', 'count', 'ops/s',
+                                                        'p50 ms', 'p95 ms', 'p99 ms'))
+    for name in sorted(results):
+        r = results[name]
+        print('{:<30}{:>10d}{:>12.1f}{:>10.3f}{:>10.3f}{:>10.3f}'.format(name, r['count'], r['throughput_per_s'],
+                                                                        r['p50_ms'], r['p95_ms'], r['p99_ms']))
+    print('results written to {}'.format(output))
+
+
+if __name__ == '__main__':
+    main()
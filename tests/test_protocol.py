@@ -0,0 +1,52 @@
+"""
+Framing of the answers of the mount, see :mod:`MountTEST.core.protocol`.
+"""
+import socket
+
+from MountTEST.core.protocol import FrameReader, reply_kinds, DATE_REPLY, CHAR_REPLY, FRAME_REPLY
+from MountTEST.simulator import DATE_ANSWER
+
+
+class ScriptedClient:
+    """
+    Connection, which answers every write with the next prepared answer. The
+    answer is received in chunks of the given size.
+    """
+    def __init__(self, answers, chunk=3):
+        self.answers = list(answers)
+        self.chunk = chunk
+        self.pending = b''
+
+    def sendall(self, data):
+        self.pending += self.answers.pop(0).encode('latin-1')
+
+    def recv_into(self, buffer):
+        if len(self.pending) == 0:
+            raise socket.timeout('no answer')
+        n = min(len(buffer), len(self.pending), self.chunk)
+        buffer[:n] = self.pending[:n]
+        self.pending = self.pending[n:]
+        return n
+
+
+def test_date_reply_kind():
+    assert reply_kinds(':SC2024-05-01#') == (DATE_REPLY,)
+    assert reply_kinds(':Sr10:00:00.00#') == (CHAR_REPLY,)
+    assert reply_kinds(':U2#:SC2024-05-01#:GR#') == (DATE_REPLY, FRAME_REPLY)
+
+
+def test_date_frames_are_consumed():
+    reader = FrameReader(ScriptedClient([DATE_ANSWER, '10:00:00.00#']))
+    assert reader.send_command(':SC2024-05-01#') == '1'
+    assert reader.send_command(':GR#') == '10:00:00.00#'
+
+
+def test_invalid_date_has_no_frames():
+    reader = FrameReader(ScriptedClient(['0', '10:00:00.00#']))
+    assert reader.send_command(':SC2024-13-01#') == '0'
+    assert reader.send_command(':GR#') == '10:00:00.00#'
+
+
+def test_date_in_pipelined_commands():
+    reader = FrameReader(ScriptedClient([DATE_ANSWER + '1' + '0#']))
+    assert reader.send_commands([':SC2024-05-01#', ':Sr10:00:00.00#', ':Gstat#']) == ['1', '1', '0#']
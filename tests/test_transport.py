@@ -0,0 +1,82 @@
+"""
+Transports of the LX200 commands, see :mod:`MountTEST.core.transport`.
+"""
+import socket
+import time
+
+import pytest
+
+from MountTEST.core.protocol import FrameReader
+from MountTEST.core.transport import SerialTransport
+
+
+class FakeSerial:
+    """
+    Serial port like pyserial: readinto blocks until the buffer is full or the
+    timeout has passed, the data arrives in short pieces.
+
+    :param pieces: The received data, one piece per write of the mount
+    :type pieces: list
+    """
+    def __init__(self, pieces, timeout=0.5):
+        self.pieces = list(pieces)
+        self.timeout = timeout
+        self.received = b''
+        self.written = b''
+
+    @property
+    def in_waiting(self):
+        return len(self.received)
+
+    def write(self, data):
+        self.written += bytes(data)
+        if len(self.pieces) > 0:
+            self.received += self.pieces.pop(0)
+        return len(data)
+
+    def readinto(self, buffer):
+        if len(self.received) < len(buffer):
+            # pyserial waits for the missing bytes until the timeout
+            time.sleep(self.timeout)
+        n = min(len(buffer), len(self.received))
+        buffer[:n] = self.received[:n]
+        self.received = self.received[n:]
+        return n
+
+
+def transport(pieces):
+    port = SerialTransport('COM3', timeout=0.5)
+    port.serial = FakeSerial(pieces)
+    return port
+
+
+def test_short_read_returns_at_once():
+    port = transport([b'1'])
+    port.sendall(b':Sr10:00:00.00#')
+    buffer = bytearray(4096)
+    start = time.time()
+    assert port.recv_into(memoryview(buffer)) == 1
+    assert time.time() - start < 0.1
+    assert buffer[:1] == b'1'
+
+
+def test_waiting_bytes_are_taken_together():
+    port = transport([b'10:00:00.00#'])
+    port.sendall(b':GR#')
+    buffer = bytearray(4096)
+    assert port.recv_into(buffer) == 12
+    assert bytes(buffer[:12]) == b'10:00:00.00#'
+
+
+def test_frame_reader_over_serial():
+    reader = FrameReader(transport([b'1', b'+45*00:00.0#']))
+    start = time.time()
+    assert reader.send_command(':Sr10:00:00.00#') == '1'
+    assert reader.send_command(':GD#') == '+45*00:00.0#'
+    assert time.time() - start < 0.1
+
+
+def test_no_answer_is_a_timeout():
+    port = transport([])
+    with pytest.raises(socket.timeout):
+        port.recv_into(bytearray(16))